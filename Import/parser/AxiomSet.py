@@ -0,0 +1,146 @@
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from json.encoder import encode_basestring
+
+from OntologyDiff import OntologyDiff, UNORDERED
+from OntologySnapshot import OntologySnapshot
+from OntologyStream import RenderedAxiom
+from OwlReader import OwlReader
+
+MAGIC = b'COMFOCUS-AXIOMS-1'
+HASH_SIZE = 16
+
+# values put in the slots of a template to find where they end up in its canonical form
+SLOT = 'urn:slot:{}'
+SLOT_PATTERN = re.compile(r'<urn:slot:(\d+)>|"urn:slot:(\d+)"')
+
+# top-level elements that are never deduplicated
+KEPT = {'Prefix'}
+
+
+class AxiomSet:
+    # Canonical hashes (see OntologyDiff) of the axioms already in the target ontology and of
+    # those written in this run. add() tells whether an axiom is new, so every axiom is written
+    # at most once. Axioms written from a template are hashed from the template's canonical form
+    # with the values filled in, without building their elements.
+    extension = '.axioms'
+
+    def __init__(self, hashes: set = None):
+        self.hashes = hashes if hashes is not None else set()
+        self.seeded = len(self.hashes)
+        self.skipped = Counter()  # duplicates by tag
+        self.reader = OwlReader()
+        # the axioms of an entity are written together, so the same IRIs come up again and again
+        self.expand = lru_cache(maxsize=4096)(self.reader.expand)
+        self.templates = dict()
+
+    @classmethod
+    def path(cls, file: str):
+        return file + cls.extension
+
+    @classmethod
+    def load(cls, file: str):
+        # the hashes of the target ontology are cached next to it, like its snapshot
+        digest = OntologySnapshot.digest(file)
+        path = cls.path(file)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            offset = len(MAGIC) + len(digest)
+            # a cache cut short would leave out hashes and let duplicates through, it is rebuilt
+            if data[:offset] == MAGIC + digest and (len(data) - offset) % HASH_SIZE == 0:
+                return cls({data[index:index + HASH_SIZE] for index in range(offset, len(data), HASH_SIZE)})
+
+        hashes = OntologyDiff(file, file).hashes(file)
+        # batch workers load the cache concurrently, so it is moved into place once complete
+        temporary = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(MAGIC + digest + b''.join(hashes))
+            os.replace(temporary, path)
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return cls(hashes)
+
+    def copy(self):
+        # the base hashes for another import, without what this one wrote
+        return AxiomSet(set(self.hashes))
+
+    def compile(self, template):
+        # canonical form of the template split at its slots, or None when the canonical form
+        # depends on the values (sorted operands)
+        element = template.element([SLOT.format(index) for index in range(len(template.slots))])
+        if any(child.tag in UNORDERED or child.tag == 'Annotation' for child in element.iter()):
+            return None
+
+        # IRIs given as element text are stripped, those in attributes are not
+        texts = {child.text for child in element.iter()}
+        parts = SLOT_PATTERN.split(OntologyDiff.canonical(self.reader, element))
+        # split() gives [text, iri slot, literal slot, text, ...]; the brackets of the IRI
+        # slots are moved into the text around them
+        head = parts[0]
+        slots = []
+        for iri, literal, text in zip(parts[1::3], parts[2::3], parts[3::3]):
+            index = int(iri or literal)
+            if iri is not None:
+                if slots:
+                    slots[-1][3] += '<'
+                else:
+                    head += '<'
+                text = '>' + text
+            slots.append([index, iri is not None, SLOT.format(index) in texts, text])
+        return head, [tuple(slot) for slot in slots]
+
+    def key(self, element):
+        if isinstance(element, RenderedAxiom):
+            template = element.template
+            if template not in self.templates:
+                self.templates[template] = self.compile(template)
+            compiled = self.templates[template]
+            if compiled is not None:
+                canonical = self.fill(compiled, element.values)
+                if canonical is not None:
+                    return OntologyDiff.hash(canonical)
+            element = element.element()
+
+        return OntologyDiff.hash(OntologyDiff.canonical(self.reader, element))
+
+    def fill(self, compiled, values):
+        [head, slots] = compiled
+        expand = self.expand
+        pieces = [head]
+        for index, iri, strip, text in slots:
+            value = values[index]
+            if iri:
+                if strip:
+                    value = value.strip()
+                pieces.append(expand(value))
+            elif value:
+                pieces.append(encode_basestring(value))
+            else:
+                # an empty literal drops out of the canonical form, see OntologyDiff.canonical
+                return None
+            pieces.append(text)
+        return ''.join(pieces)
+
+    def add_key(self, key: bytes, tag: str):
+        if key in self.hashes:
+            self.skipped[tag] += 1
+            return False
+        self.hashes.add(key)
+        return True
+
+    def add(self, element):
+        # True when the axiom is new and has to be written
+        if element.tag in KEPT:
+            return True
+        return self.add_key(self.key(element), element.tag)
+
+    def stats(self):
+        return {'seeded': self.seeded,
+                'written': len(self.hashes) - self.seeded,
+                'skipped': sum(self.skipped.values()),
+                'skipped_by_kind': dict(self.skipped)}
@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+from AxiomSet import AxiomSet
+from Entities import Ontology, Entity, start_run
+from IdAllocator import IdAllocator, SharedIdAllocator
+from ImportManifest import ImportManifest
+from OntologyIndex import OntologyIndex
+from Pipeline import import_files
+
+# keys of a job in the job manifest, and the options it takes from "defaults" unless it sets them
+FILES = ('metadata', 'components', 'classifications', 'items', 'output')
+OPTIONS = {'manifest': None, 'metrics': None, 'deduplicate': False, 'stream': False, 'share_instances': False}
+
+# the base ontology of the process, loaded once and shared by every job it runs
+BASE = None
+
+
+class WarmBase:
+    # What every import needs from the base ontology: its label index, the hashes of its axioms
+    # and the id allocator. Jobs get their own Ontology around it, so nothing one job writes
+    # shows up in the next one, except for the ids it used.
+
+    def __init__(self, file: str, allocator: IdAllocator):
+        self.file = file
+        self.index = OntologyIndex.load(file)
+        self.allocator = allocator
+        self.axioms = None
+
+    def ontology(self, manifest: str = None):
+        base = Ontology()
+        base.index = self.index
+        base.allocator = self.allocator
+        base.manifest = ImportManifest.load(manifest) if manifest is not None else None
+        return base
+
+    def base_axioms(self):
+        if self.axioms is None:
+            self.axioms = AxiomSet.load(self.file)
+        return self.axioms.copy()
+
+
+def load_jobs(file: str, base: str = None):
+    # the job manifest: {"base": ..., "defaults": {...}, "jobs": [{"name": ..., "metadata": ..., ...}]};
+    # paths are relative to the manifest
+    with open(file, encoding='utf-8') as f:
+        manifest = json.load(f)
+    folder = os.path.dirname(os.path.abspath(file))
+
+    def path(value):
+        return None if value is None else os.path.join(folder, value)
+
+    defaults = {**OPTIONS, **manifest.get('defaults', dict())}
+    jobs = []
+    for number, entry in enumerate(manifest['jobs']):
+        missing = [key for key in FILES if key not in entry]
+        if missing:
+            raise ValueError(f'job {entry.get("name", number)!r} has no {", ".join(missing)}')
+        job = {'name': entry.get('name', os.path.splitext(os.path.basename(entry['output']))[0])}
+        job.update({key: path(entry[key]) for key in FILES})
+        job.update({key: entry.get(key, value) for key, value in defaults.items()})
+        for key in ('manifest', 'metrics'):
+            job[key] = path(job[key])
+        jobs.append(job)
+
+    base = os.path.abspath(base) if base is not None else path(manifest['base'])
+    # jobs write their files on their own, so two of them must not write the same file
+    written = [job[key] for job in jobs for key in ('output', 'manifest', 'metrics') if job[key] is not None]
+    for file_ in set(written):
+        if written.count(file_) > 1:
+            raise ValueError(f'{file_} is written by more than one job')
+    if base in written:
+        raise ValueError('a job writes the base ontology, merge imports one at a time with Pipeline.py')
+
+    return base, jobs
+
+
+def run_job(job: dict):
+    # runs a job against BASE; returns (name, seconds, error)
+    start = time.perf_counter()
+    try:
+        base = BASE.ontology(job['manifest'])
+        import_files(base, job['output'], job['metadata'], job['components'], job['classifications'], job['items'],
+                     axioms=BASE.base_axioms if job['deduplicate'] else None, stream=job['stream'],
+                     shared_instances=job['share_instances'], metrics_file=job['metrics'])
+        if base.manifest is not None:
+            base.manifest.save()
+    except Exception:
+        return job['name'], time.perf_counter() - start, traceback.format_exc()
+    return job['name'], time.perf_counter() - start, None
+
+
+def start_worker(file: str, counter, date: str):
+    # every worker loads the base once (from its snapshot) and keeps it for the jobs it gets
+    global BASE
+    start_run(date)
+    BASE = WarmBase(file, SharedIdAllocator(counter))
+
+
+def run_jobs(file: str, jobs: list, workers: int = 0):
+    # yields (name, seconds, error) of every job, in the order of the jobs; with workers, they run in that
+    # many processes and their ids come from one shared counter, so they depend on the order in
+    # which the jobs happen to lease them
+    global BASE
+    allocator = IdAllocator.load(file)
+    if workers <= 0:
+        BASE = WarmBase(file, allocator)
+        for job in jobs:
+            yield run_job(job)
+        allocator.save()
+        return
+
+    shared = SharedIdAllocator(SharedIdAllocator.shared(allocator), file)
+    with ProcessPoolExecutor(workers, initializer=start_worker,
+                             initargs=(file, shared.counter, Entity.date)) as executor:
+        yield from executor.map(run_job, jobs)
+    shared.save()
+
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(
+        description='Run the imports listed in a job manifest against one base ontology.')
+    arguments.add_argument('jobs', help='JSON job manifest')
+    arguments.add_argument('--base', help='base ontology, instead of the one in the job manifest')
+    arguments.add_argument('--workers', type=int, default=0, help='number of processes running jobs in parallel')
+    arguments.add_argument('--only', nargs='+', help='names of the jobs to run')
+    args = arguments.parse_args()
+
+    [base_file, jobs] = load_jobs(args.jobs, args.base)
+    if args.only:
+        jobs = [job for job in jobs if job['name'] in args.only]
+
+    start = time.perf_counter()
+    failed = 0
+    for name, seconds, error in run_jobs(base_file, jobs, args.workers):
+        if error is None:
+            print(f'{name}: done in {seconds:.2f} s')
+        else:
+            failed += 1
+            print(f'{name}: failed after {seconds:.2f} s\n{error}', file=sys.stderr)
+    print(f'{len(jobs) - failed} of {len(jobs)} jobs done in {time.perf_counter() - start:.2f} s')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,23 @@
+import argparse
+import glob
+import os
+
+from OntologyIndex import OntologyIndex
+from OntologySnapshot import OntologySnapshot
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+FOLDERS = [os.path.join(ROOT, 'Current ontology version'), os.path.join(ROOT, 'Old versions')]
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description='Build snapshots for the .owl files in the given folders.')
+    arguments.add_argument('folders', nargs='*', default=FOLDERS)
+    arguments.add_argument('--force', action='store_true', help='rebuild snapshots that are up to date')
+    args = arguments.parse_args()
+
+    for folder in args.folders:
+        for file in sorted(glob.glob(os.path.join(folder, '*.owl'))):
+            if not args.force and OntologySnapshot.read(file) is not None:
+                print(f'up to date: {file}')
+                continue
+            OntologySnapshot.write(file, OntologyIndex.parse(file).tables())
+            print(f'built: {file}')
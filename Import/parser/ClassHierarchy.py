@@ -0,0 +1,110 @@
+import argparse
+
+
+class ClassHierarchy:
+    # Transitive closure of the named SubClassOf axioms. Every class gets a bit, and the ancestors
+    # and descendants of a class are ints with the bits of all its (strict) super and sub classes,
+    # so is_subclass() is a single bit test. The closure is computed once when the ontology is
+    # indexed and stored in its snapshot (see OntologyIndex.tables). IRIs are full IRIs.
+
+    def __init__(self):
+        self.iris = []  # bit -> IRI
+        self.bits = dict()  # IRI -> bit
+        self.ancestor_bits = dict()  # IRI -> bitset of its ancestors
+        self.descendant_bits = dict()  # IRI -> bitset of its descendants
+
+    def bit(self, iri: str):
+        if iri not in self.bits:
+            self.bits[iri] = len(self.iris)
+            self.iris.append(iri)
+        return self.bits[iri]
+
+    @classmethod
+    def from_parents(cls, parents: dict):
+        # parents: IRI -> direct named super classes. Every class is walked up to its roots once,
+        # depth first without recursion; a cycle (classes declared subclasses of each other) is
+        # cut where the walk finds it
+        hierarchy = cls()
+        ancestors = hierarchy.ancestor_bits
+        for start in parents:
+            if start in ancestors:
+                continue
+
+            path = {start}
+            stack = [(start, iter(parents[start]))]
+            while stack:
+                [iri, remaining] = stack[-1]
+                for parent in remaining:
+                    if parent not in ancestors and parent not in path:
+                        path.add(parent)
+                        stack.append((parent, iter(parents.get(parent, ()))))
+                        break
+                else:
+                    stack.pop()
+                    path.discard(iri)
+                    bits = 0
+                    for parent in parents.get(iri, ()):
+                        bits |= ancestors.get(parent, 0) | 1 << hierarchy.bit(parent)
+                    ancestors[iri] = bits
+
+        hierarchy.index_descendants()
+        return hierarchy
+
+    @classmethod
+    def from_closure(cls, pairs: list):
+        # pairs: (IRI, ancestor) of the whole closure, as given by closure()
+        hierarchy = cls()
+        ancestors = hierarchy.ancestor_bits
+        descendants = hierarchy.descendant_bits
+        for iri, ancestor in pairs:
+            ancestors[iri] = ancestors.get(iri, 0) | 1 << hierarchy.bit(ancestor)
+            descendants[ancestor] = descendants.get(ancestor, 0) | 1 << hierarchy.bit(iri)
+        return hierarchy
+
+    def index_descendants(self):
+        for iri, bits in self.ancestor_bits.items():
+            bit = 1 << self.bit(iri)
+            for ancestor in self.members(bits):
+                self.descendant_bits[ancestor] = self.descendant_bits.get(ancestor, 0) | bit
+
+    def members(self, bits: int):
+        # IRIs of the bits set in a bitset
+        iris = []
+        while bits:
+            lowest = bits & -bits
+            iris.append(self.iris[lowest.bit_length() - 1])
+            bits ^= lowest
+        return iris
+
+    def closure(self):
+        return [(iri, ancestor) for iri, bits in self.ancestor_bits.items() for ancestor in self.members(bits)]
+
+    def ancestors(self, iri: str):
+        return self.members(self.ancestor_bits.get(iri, 0))
+
+    def descendants(self, iri: str):
+        return self.members(self.descendant_bits.get(iri, 0))
+
+    def is_subclass(self, iri: str, ancestor: str):
+        # every class is a subclass of itself
+        if iri == ancestor:
+            return True
+        bit = self.bits.get(ancestor)
+        return bit is not None and self.ancestor_bits.get(iri, 0) >> bit & 1 == 1
+
+
+if __name__ == '__main__':
+    from OntologyIndex import OntologyIndex
+
+    arguments = argparse.ArgumentParser(description='List the super and sub classes of a class.')
+    arguments.add_argument('ontology')
+    arguments.add_argument('iri', help='full IRI, or #... relative to the base of the ontology')
+    args = arguments.parse_args()
+
+    index = OntologyIndex.load(args.ontology)
+    iri = index.base + args.iri if args.iri.startswith('#') else args.iri
+    for name, iris in (('ancestors', index.hierarchy.ancestors(iri)),
+                       ('descendants', index.hierarchy.descendants(iri))):
+        print(f'{len(iris)} {name}')
+        for member in sorted(iris):
+            print(f'  {member}')
@@ -1,279 +1,478 @@
 import csv
-from abc import ABC, abstractmethod
+from abc import ABC
+from itertools import islice
 
+from ImportManifest import ImportManifest, ChangedRowsError
+from OntologyIndex import OntologyIndex
 from Entities import HarmonisedQuestionarieComponent, Quality, HarmonisedMeasure, Classification, \
     SingleChoiceQuestion, \
     QuestionType, Ontology, ClassificationInstance, OpenQuestion, MatrixQuestion, MatrixStatement
 
 
+class Column:
+    def __init__(self, name: str, strip: bool = True, lower: bool = False, convert=None):
+        self.name = name
+        self.strip = strip
+        self.lower = lower
+        self.convert = convert
+
+    def normalizer(self):
+        # picks the normalization once instead of testing the options for every value
+        if self.convert is not None:
+            return self.convert
+        if self.strip and self.lower:
+            return lambda value: value.strip().lower()
+        if self.strip:
+            return str.strip
+        if self.lower:
+            return str.lower
+        return None
+
+
 class CsvParser(ABC):
+    # Each parser declares how CSV columns map onto the constructor arguments of its entity
+    # (fields), fixed constructor arguments (constants) and which field values keep (include)
+    # or drop (exclude) a row. compile() turns this into column indices for a given header,
+    # so rows are handled as plain lists.
+    entity_class = None
+    fields = dict()
+    constants = dict()
+    include = dict()
+    exclude = dict()
+
     def __init__(self, id_columns: list, ontology: Ontology):
         self.id_columns = id_columns
         self.ontology = ontology
+        self.entities = dict()
+        self.pending = []
+        self.hashes = dict()
+        self.existing = set()  # keys of the entities found in the base ontology
+        self.filtered = 0
+        self.key_indices = []
+        self.getters = dict()
+        self.rules = []
+
+    def compile(self, header: list):
+        position = {name: index for index, name in enumerate(header)}
+        self.key_indices = [position[column] for column in self.id_columns]
+        self.getters = {name: (position[column.name], column.normalizer()) for name, column in self.fields.items()}
+        # include/exclude rules are checked on the raw row, before any entity field is built
+        self.rules = [self.getters[name] + (values, True) for name, values in self.include.items()] + \
+                     [self.getters[name] + (values, False) for name, values in self.exclude.items()]
+
+    def get_id(self, row: list):
+        return '_'.join([row[index].strip() for index in self.key_indices])
+
+    def value(self, row: list, name: str):
+        index, normalize = self.getters[name]
+        return row[index] if normalize is None else normalize(row[index])
+
+    def values(self, row: list):
+        return {name: row[index] if normalize is None else normalize(row[index])
+                for name, (index, normalize) in self.getters.items()}
+
+    def accept(self, row: list):
+        for index, normalize, values, included in self.rules:
+            value = row[index] if normalize is None else normalize(row[index])
+            if (value in values) != included:
+                return False
+        return True
 
-    def get_id(self, row: dict):
-        ids = []
-        for key in self.id_columns:
-            ids.append(row[key].strip())
-        return '_'.join(ids)
-
-    @abstractmethod
     def read(self, file: str):
-        raise NotImplementedError()
-
-    @abstractmethod
-    def filter(self, entities: dict):
-        raise NotImplementedError()
-
-    def add(self, entities: dict):
-        raise NotImplementedError()
-
+        [entities] = CsvDispatcher([self]).read(file)
+        return entities
 
-class HarmonisedMeasureParser(CsvParser):
-    def read(self, file: str):
-        entities = dict()
-        with open(file, encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if self.get_id(row) not in entities.keys():
-                    entity = HarmonisedMeasure(self.ontology.get_counter(), row['Harmonised measure'].strip())
-                    if not self.filter(entity):
-                        entities[self.get_id(row)] = entity
-                        self.ontology.update_counter()
+    def parse(self, row: list):
+        self.parse_batch([row])
+
+    def parse_batch(self, rows: list):
+        entities = self.entities
+        key_indices = self.key_indices
+        for row in rows:
+            key = '_'.join([row[index].strip() for index in key_indices])
+            entity = entities.get(key)
+            if entity is not None:
+                self.update(entity, row)
+                continue
+
+            if not self.accept(row):
+                self.filtered += 1
+                self.reject(row)
+                continue
+
+            values = self.values(row)
+            self.prepare(values)
+            hash_ = self.hash(values)
+            entity = self.create(values)
+            if not self.filter(entity):
+                entities[key] = entity
+                self.hashes[key] = hash_
+                self.keep(entity)
+            else:
+                self.filtered += 1
+
+    def hash(self, values, previous: str = ''):
+        if self.ontology.manifest is None:
+            return None
+        return ImportManifest.hash(values, previous)
+
+    def reject(self, row: list):
+        pass
 
-        self.add(entities)
+    def prepare(self, values: dict):
+        pass
 
-        return entities
+    def create(self, values: dict):
+        return self.entity_class(id_=None, **values, **self.constants)
 
-    def filter(self, entity: HarmonisedMeasure):
-        return entity.label in ['InformedConsent']
+    def keep(self, entity):
+        self.reserve(entity)
 
-    def add(self, entities: dict):
+    def update(self, entity, row: list):
         pass
 
+    def reserve(self, item):
+        # ids are handed out in finish(), so several parsers can share one pass over a file
+        # and still number their entities in the same order as separate passes would
+        self.pending.append(item)
 
-class HarmonisedQuestionareComponentParser(CsvParser):
-    def read(self, file: str):
-        entities = dict()
+    def assign_ids(self):
+        items = [item for item in self.pending if not item.added and not item.has_iri]
+        for item, id_ in zip(items, self.ontology.lease(len(items))):
+            item.id_ = id_
+
+    def stream(self, file: str):
+        # yields the entities of a file in batches, each finished like read() finishes them, without
+        # keeping the earlier batches: only their keys are kept, to leave out later rows with the same
+        # key. This is for the parsers whose update() does nothing, so not for classifications.
         with open(file, encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if self.get_id(row) not in entities.keys():
-                    entity = HarmonisedQuestionarieComponent(
-                        id_=self.ontology.get_counter(),
-                        label=row['harmonised questionare Component'].strip(),
-                        theoretical_background=row['Theoretical background'].strip(),
-                        definition=row['Definition'].strip(),
-                        harmonised_measure=row['Harmonised measure'].strip(),
-                        quality=row['Quality'].strip())
-
-                    if not self.filter(entity):
-                        entities[self.get_id(row)] = entity
-                        self.ontology.update_counter()
-
-        self.add(entities)
+            reader = csv.reader(f)
+            self.compile(next(reader, []))
+            rows = (row for row in reader if row)
+            done = set()
+            metrics = self.ontology.metrics
+            while True:
+                batch = list(islice(rows, CsvDispatcher.batch_size))
+                if not batch:
+                    break
+                if metrics is not None:
+                    metrics.count_rows(len(batch))
+                self.parse_batch([row for row in batch if self.get_id(row) not in done])
+                done.update(self.entities)
+                yield self.finish_batch()
+
+        self.finish()
+
+    def finish(self):
+        # end of the file; parsers that count across rows start over here
+        return self.finish_batch()
+
+    def finish_batch(self):
+        # add() runs before ids are handed out so entities already in the ontology don't use one up
+        self.apply_manifest(self.entities)
+        self.add(self.entities)
+        self.assign_ids()
+        self.record_manifest(self.entities)
+        self.record_metrics(self.entities)
+        entities = self.entities
+        self.entities = dict()
+        self.pending = []
+        self.hashes = dict()
+        self.existing = set()
+        self.filtered = 0
 
         return entities
 
-    def filter(self, entity: HarmonisedQuestionarieComponent):
-        return entity.harmonised_measure in ['InformedConsent']
+    def apply_manifest(self, entities: dict):
+        # entities imported by an earlier run keep their IRI; the unchanged ones are not written again.
+        # Those that were found in the base ontology are left to the base index, see mark_added()
+        manifest = self.ontology.manifest
+        if manifest is None:
+            return
+
+        changed = []
+        for key, entity in entities.items():
+            entry = manifest.get(type(self).__name__, key)
+            if entry is not None and not ImportManifest.in_base(entry):
+                entity.iri = entry[1]
+                entity.added = entry[0] == self.hashes[key]
+                if not entity.added:
+                    changed.append(f'{type(self).__name__} {key!r}')
+
+        # a changed row is written again whole, which a merge would add next to its old axioms
+        if changed and self.ontology.additive:
+            raise ChangedRowsError(changed)
+
+    def record_manifest(self, entities: dict):
+        manifest = self.ontology.manifest
+        if manifest is None:
+            return
+
+        for key, entity in entities.items():
+            manifest.set(type(self).__name__, key, self.hashes[key], entity.iri, key in self.existing)
+
+    def record_metrics(self, entities: dict):
+        metrics = self.ontology.metrics
+        if metrics is None:
+            return
+
+        metrics.add(type(self).__name__, {
+            'entities': len(entities),
+            'filtered': self.filtered,
+            'existing': sum(1 for entity in entities.values() if entity.added)})
+
+    def filter(self, entity):
+        return False
 
     def add(self, entities: dict):
-        pass
-
+        self.mark_added(entities)
+
+    def mark_added(self, entities: dict):
+        # entities whose label already exists under the same parent in the base ontology
+        # keep the existing IRI and are not written again. Entities the manifest knows were
+        # imported before (and maybe merged into the base since), so the manifest decides for
+        # them: a changed one is written again even though its label is in the base. Only those
+        # it recorded as found in the base are looked up again.
+        if self.ontology.index is None:
+            return
+
+        manifest = self.ontology.manifest
+        for key, entity in entities.items():
+            if manifest is not None:
+                entry = manifest.get(type(self).__name__, key)
+                if entry is not None and not ImportManifest.in_base(entry):
+                    continue
+            iri = self.ontology.index.find(entity.label, entity.parent_iri or None)
+            if iri is not None:
+                entity.added = True
+                entity.iri = iri
+                self.existing.add(key)
+
+
+class CsvDispatcher:
+    batch_size = 1024
+
+    def __init__(self, parsers: list):
+        self.parsers = parsers
 
-class QualityParser(CsvParser):
     def read(self, file: str):
-        entities = dict()
         with open(file, encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if self.get_id(row) not in entities.keys():
-                    entity = Quality(id_=self.ontology.get_counter(),
-                                     label=row['Quality'].strip().lower(),
-                                     harmonised_measure=row['Harmonised measure'].strip())
+            reader = csv.reader(f)
+            header = next(reader, [])
+            for parser in self.parsers:
+                parser.compile(header)
 
-                    if not self.filter(entity):
-                        entities[self.get_id(row)] = entity
-                        self.ontology.update_counter()
+            # blank lines are skipped like csv.DictReader does
+            rows = (row for row in reader if row)
+            count = 0
+            while True:
+                batch = list(islice(rows, self.batch_size))
+                if not batch:
+                    break
+                count += len(batch)
+                for parser in self.parsers:
+                    parser.parse_batch(batch)
 
-        self.add(entities)
+        metrics = self.parsers[0].ontology.metrics if self.parsers else None
+        if metrics is not None:
+            metrics.count_rows(count)
 
-        return entities
+        return [parser.finish() for parser in self.parsers]
 
-    def filter(self, entity: Quality):
-        return entity.harmonised_measure in ['InformedConsent']
-
-    def add(self, entities: dict):
-        pass
 
+class HarmonisedMeasureParser(CsvParser):
+    entity_class = HarmonisedMeasure
+    fields = {'label': Column('Harmonised measure')}
+    exclude = {'label': {'InformedConsent'}}
 
-class ClassificationParser(CsvParser):
-    def read(self, file: str):
-        entities = dict()
-        with open(file, encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if self.get_id(row) not in entities.keys():
-                    entity = Classification(
-                        id_=self.ontology.get_counter(),
-                        label=row['Classification'].strip().lower(),
-                        definition=row['Definiton within a specific classification'].strip())
-
-                    if not self.filter(entity):
-                        entities[self.get_id(row)] = entity
-                        self.ontology.update_counter()
-
-                        entity.add_individual(ClassificationInstance(
-                            id_=self.ontology.get_counter(),
-                            label=row['Instances: '].strip().lower(),
-                            parent_iri=entity.iri))
-                        self.ontology.update_counter()
-
-                else:
-                    entity = entities[self.get_id(row)]
-                    entity.add_individual(ClassificationInstance(
-                        self.ontology.get_counter(),
-                        row['Instances: '].strip().lower(),
-                        entity.iri))
-                    self.ontology.update_counter()
-
-        self.add(entities)
 
-        return entities
+class HarmonisedQuestionareComponentParser(CsvParser):
+    entity_class = HarmonisedQuestionarieComponent
+    fields = {'label': Column('harmonised questionare Component'),
+              'theoretical_background': Column('Theoretical background'),
+              'definition': Column('Definition'),
+              'harmonised_measure': Column('Harmonised measure'),
+              'quality': Column('Quality')}
+    exclude = {'harmonised_measure': {'InformedConsent'}}
 
-    def filter(self, entity: Classification):
-        return entity.label in []
 
-    def add(self, entities: dict):
-        pass
+class QualityParser(CsvParser):
+    entity_class = Quality
+    fields = {'label': Column('Quality', lower=True),
+              'harmonised_measure': Column('Harmonised measure')}
+    exclude = {'harmonised_measure': {'InformedConsent'}}
 
 
-class SingleChoiceQuestionParser(CsvParser):
-    def read(self, file: str):
-        entities = dict()
-        with open(file, encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if self.get_id(row) not in entities.keys():
-                    entity = SingleChoiceQuestion(
-                        self.ontology.get_counter(),
-                        row['Annotation: Label'].strip().lower(),
-                        QuestionType.get_id(row['Question']),
-                        row['Annotation: hadQuestion'].strip(),
-                        row['Linked classification ID'],
-                        row['ComponentId'])
-
-                    if not self.filter(entity):
-                        entities[self.get_id(row)] = entity
-                        self.ontology.update_counter()
-
-        self.add(entities)
+class ClassificationParser(CsvParser):
+    # With shared=True an instance label (e.g. "agree") gives one individual for the whole import,
+    # asserted into every classification that lists it, instead of one individual per classification.
+    # An individual with that label in the base ontology is reused.
+    entity_class = Classification
+    fields = {'label': Column('Classification', lower=True),
+              'definition': Column('Definiton within a specific classification'),
+              'individual': Column('Instances: ', lower=True)}
+
+    def __init__(self, id_columns: list, ontology: Ontology, shared: bool = False):
+        super().__init__(id_columns, ontology)
+        self.shared = shared
+        self.instances = dict()  # normalized label -> shared ClassificationInstance
+        self.reserved = set()  # normalized labels of the shared instances given to reserve()
+
+    def instance(self, label: str):
+        if not self.shared:
+            return ClassificationInstance(id_=None, label=label, parent_iri=None)
+
+        key = OntologyIndex.normalize(label)
+        if key not in self.instances:
+            self.instances[key] = ClassificationInstance(id_=None, label=label, parent_iri=None)
+        return self.instances[key]
+
+    def reserve_instance(self, individual: ClassificationInstance):
+        if self.shared:
+            key = OntologyIndex.normalize(individual.label)
+            if key in self.reserved:
+                return
+            self.reserved.add(key)
+        self.reserve(individual)
+
+    def create(self, values: dict):
+        individual = self.instance(values.pop('individual'))
+        entity = Classification(id_=None, **values)
+        entity.add_individual(individual)
+        return entity
+
+    def keep(self, entity: Classification):
+        self.reserve(entity)
+        self.reserve_instance(entity.individuals[0])
+
+    def update(self, entity: Classification, row: list):
+        individual = self.instance(self.value(row, 'individual'))
+        if not self.shared or individual not in entity.individuals:
+            entity.add_individual(individual)
+        self.reserve_instance(individual)
+        # a classification changes when its instances change
+        key = self.get_id(row)
+        self.hashes[key] = self.hash(individual.label, self.hashes[key])
+
+    def apply_manifest(self, entities: dict):
+        super().apply_manifest(entities)
+        manifest = self.ontology.manifest
+        if manifest is None:
+            return
+
+        # instances of a changed classification keep the IRI they had under the same label
+        for key, entity in entities.items():
+            for individual in entity.individuals:
+                entry = manifest.get(*self.manifest_key(key, individual))
+                if entry is not None:
+                    individual.iri = entry[1]
+
+    def record_manifest(self, entities: dict):
+        super().record_manifest(entities)
+        manifest = self.ontology.manifest
+        if manifest is None:
+            return
+
+        for key, entity in entities.items():
+            for individual in entity.individuals:
+                # instances of a classification found in the base ontology never got an id
+                if individual.has_iri or individual.id_ is not None:
+                    manifest.set(*self.manifest_key(key, individual), None, individual.iri)
+
+    def manifest_key(self, key: str, individual: ClassificationInstance):
+        if self.shared:
+            return 'Shared' + ClassificationInstance.__name__, OntologyIndex.normalize(individual.label)
+        return ClassificationInstance.__name__, key + '/' + individual.label
+
+    def assign_ids(self):
+        super().assign_ids()
+        for entity in self.entities.values():
+            for individual in entity.individuals:
+                # a shared instance keeps the first classification it was found in
+                if individual.parent_iri is None or not self.shared:
+                    individual.parent_iri = entity.iri
 
+    def add(self, entities: dict):
+        self.mark_added(entities)
+        if not self.shared:
+            for entity in entities.values():
+                for individual in entity.individuals:
+                    individual.added = entity.added
+            return
+
+        # a shared instance is only declared when it is not in the base ontology and one of
+        # its classifications is written
+        written = {id(individual) for entity in entities.values() if not entity.added
+                   for individual in entity.individuals}
+        index = self.ontology.index
+        for individual in self.instances.values():
+            iri = None
+            if index is not None:
+                iri = index.find(individual.label, type_='NamedIndividual')
+            if iri is not None:
+                individual.iri = iri
+            individual.added = iri is not None or id(individual) not in written
+
+    def finish(self):
+        entities = super().finish()
+        self.instances = dict()
+        self.reserved = set()
         return entities
 
-    def filter(self, entity: SingleChoiceQuestion):
-        return (entity.question_type not in [QuestionType.SINGLE_CHOICE] or
-                entity.harmonised_component in ['209'])
 
-    def add(self, entities: dict):
-        pass
+QUESTION_FIELDS = {'label': Column('Annotation: Label', lower=True),
+                   'question_type': Column('Question', convert=QuestionType.get_id),
+                   'has_question': Column('Annotation: hadQuestion'),
+                   'linked_classification': Column('Linked classification ID', strip=False),
+                   'harmonised_component': Column('ComponentId', strip=False)}
 
 
-class OpenQuestionParser(CsvParser):
-    def read(self, file: str):
-        entities = dict()
-        with open(file, encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if self.get_id(row) not in entities.keys():
-                    entity = OpenQuestion(
-                        self.ontology.get_counter(),
-                        row['Annotation: Label'].strip().lower(),
-                        QuestionType.get_id(row['Question']),
-                        row['Annotation: hadQuestion'].strip(),
-                        'open',
-                        row['ComponentId'])
-
-                    if not self.filter(entity):
-                        entities[self.get_id(row)] = entity
-                        self.ontology.update_counter()
-
-        self.add(entities)
-
-        return entities
+class SingleChoiceQuestionParser(CsvParser):
+    entity_class = SingleChoiceQuestion
+    fields = QUESTION_FIELDS
+    include = {'question_type': {QuestionType.SINGLE_CHOICE}}
+    exclude = {'harmonised_component': {'209'}}
 
-    def filter(self, entity: OpenQuestion):
-        return (entity.question_type not in [QuestionType.OPEN] or
-                entity.harmonised_component in ['209'])
 
-    def add(self, entities: dict):
-        pass
+class OpenQuestionParser(CsvParser):
+    entity_class = OpenQuestion
+    fields = {name: column for name, column in QUESTION_FIELDS.items() if name != 'linked_classification'}
+    constants = {'linked_classification': 'open'}
+    include = {'question_type': {QuestionType.OPEN}}
+    exclude = {'harmonised_component': {'209'}}
 
 
 class MatrixQuestionParser(CsvParser):
-    def read(self, file: str):
-        entities = dict()
-        with open(file, encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if self.get_id(row) not in entities.keys():
-                    entity = MatrixQuestion(
-                        self.ontology.get_counter(),
-                        row['Annotation: Label'].strip().lower(),
-                        QuestionType.get_id(row['Question']),
-                        row['Annotation: hadQuestion'].strip(),
-                        row['Linked classification ID'],
-                        row['ComponentId'])
-
-                    if not self.filter(entity):
-                        entities[self.get_id(row)] = entity
-                        self.ontology.update_counter()
-
-        self.add(entities)
-
-        return entities
-
-    def filter(self, entity: MatrixQuestion):
-        return (entity.question_type not in [QuestionType.MATRIX] or
-                entity.harmonised_component in ['209'])
-
-    def add(self, entities: dict):
-        pass
+    entity_class = MatrixQuestion
+    fields = QUESTION_FIELDS
+    include = {'question_type': {QuestionType.MATRIX}}
+    exclude = {'harmonised_component': {'209'}}
 
 
 class MatrixStatementParser(CsvParser):
-    def read(self, file: str):
-        entities = dict()
-        counters = dict()
-        with open(file, encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if self.get_id(row) not in entities.keys():
-                    counter = 1
-                    question_name = row['Question name']  # .strip().lower()
-
-                    if question_name in counters.keys():
-                        counter = counters[question_name] + 1
-                    counters[question_name] = counter
-
-                    entity = MatrixStatement(
-                        id_=self.ontology.get_counter(),
-                        label=question_name.strip().lower() + '_' + str(counter),
-                        description=row['Item name'].strip(),
-                        matrix_question=question_name,
-                        harmonised_component=row['ComponentId'])
+    entity_class = MatrixStatement
+    fields = {'matrix_question': Column('Question name', strip=False),  # .strip().lower()
+              'description': Column('Item name'),
+              'harmonised_component': Column('ComponentId', strip=False)}
+    exclude = {'harmonised_component': {'209'}}
 
-                    if not self.filter(entity):
-                        entities[self.get_id(row)] = entity
-                        self.ontology.update_counter()
+    def __init__(self, id_columns: list, ontology: Ontology):
+        super().__init__(id_columns, ontology)
+        self.counters = dict()
 
-        self.add(entities)
+    def count(self, question_name: str):
+        # statements are numbered per question, counting filtered rows as well
+        counter = self.counters.get(question_name, 0) + 1
+        self.counters[question_name] = counter
+        return counter
 
-        return entities
+    def reject(self, row: list):
+        self.count(self.value(row, 'matrix_question'))
 
-    def filter(self, entity: MatrixStatement):
-        return entity.harmonised_component in ['209']
+    def prepare(self, values: dict):
+        question_name = values['matrix_question']
+        values['label'] = question_name.strip().lower() + '_' + str(self.count(question_name))
 
-    def add(self, entities: dict):
-        pass
+    def finish(self):
+        self.counters = dict()
+        return super().finish()
@@ -3,6 +3,20 @@ import xml.etree.ElementTree as ET
 from abc import ABC
 from enum import Enum
 
+from IdAllocator import IdAllocator
+from OntologyStream import OntologyTree, OntologyStream, OntologyMerge
+
+BASE_IRI = r'http://www.semanticweb.org/bkorousicseljak/ontologies/2023/5/Comfocus_v1/COMFOCUS_'
+CONTEXT_IRI = r'http://www.semanticweb.org/bkorousicseljak/ontologies/2023/5/Comfocus_Contextv4#COMFOCUS_'
+
+# one timestamp per run, shared by every entity written in it
+RUN_DATE = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def start_run(date: str = None):
+    # sets the dc:date shared by all entities written from now on
+    Entity.date = Instance.date = date or datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+
 
 class Ontology:
     NAMESPACES = {'xmlns': "http://www.w3.org/2002/07/owl#",
@@ -33,12 +47,17 @@ class Ontology:
 
     ontology = None
     tree = None
-    counter = 701
+    index = None
+    allocator = None
+    manifest = None
+    metrics = None
+    # set when the axioms are merged into an existing file, which can only grow
+    additive = False
 
     def get_ontology(self):
         if self.ontology is None:
             self.ontology = ET.Element('Ontology', self.NAMESPACES)
-            self.tree = ET.ElementTree(self.ontology)
+            self.tree = OntologyTree(self.ontology)
 
             for key in self.PREFIXES.keys():
                 if key == 'base':
@@ -48,58 +67,128 @@ class Ontology:
 
         return [self.ontology, self.tree]
 
-    def get_counter(self):
-        return self.counter
+    def open(self, file: str, stream=OntologyStream):
+        # stream axioms to file as the writers flush them instead of keeping the whole tree
+        # (stream=RdfStream writes them as N-Triples or Turtle)
+        [ontology, _] = self.get_ontology()
+        self.tree = stream(ontology, file)
+
+        return [self.ontology, self.tree]
+
+    def merge(self, file: str):
+        # stream axioms into an existing ontology file, see OntologyMerge
+        [ontology, _] = self.get_ontology()
+        self.tree = OntologyMerge(ontology, file)
+        self.additive = True
+
+        return [self.ontology, self.tree]
+
+    def close(self):
+        self.tree.close()
 
-    def update_counter(self):
-        self.counter += 1
+    def lease(self, size: int):
+        if self.allocator is None:
+            self.allocator = IdAllocator()
+        if self.manifest is not None:
+            self.allocator.reserve(self.manifest.high_water_mark)
+        return self.allocator.lease(size)
 
     def write(self, file: str):
+        # indent once for the whole document instead of after every written entity
+        self.tree.expand()
+        ET.indent(self.ontology, '    ')
         self.tree.write(file)
 
 
 class Entity(ABC):
-    base_iri = r'http://www.semanticweb.org/bkorousicseljak/ontologies/2023/5/Comfocus_v1/COMFOCUS_'
-    context_iri = r'http://www.semanticweb.org/bkorousicseljak/ontologies/2023/5/Comfocus_Contextv4#COMFOCUS_'
+    # entities are slotted and share their class-level constants, so large imports
+    # only pay for the per-entity fields
+    __slots__ = ('id_', 'parent_iri', 'label', 'added', '_iri')
+
+    base_iri = BASE_IRI
+    context_iri = CONTEXT_IRI
     creator = r'http://orcid.org/0000-0001-7597-2590'
+    date = RUN_DATE
 
     def __init__(self, parent_iri: str, id_: int, label: str, added: bool):
-        self.iri = self.base_iri + f'{id_:020d}'
+        self.id_ = id_
         self.parent_iri = parent_iri
         self.label = label
-        self.date = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
         self.added = added
+        self._iri = None
+
+    @property
+    def iri(self):
+        # built on first use, after the parser assigned the id
+        if self._iri is None:
+            self._iri = self.base_iri + f'{self.id_:020d}'
+        return self._iri
+
+    @iri.setter
+    def iri(self, iri: str):
+        self._iri = iri
+
+    @property
+    def has_iri(self):
+        return self._iri is not None
 
 
 class Instance(ABC):
+    __slots__ = ('id_', 'parent_iri', 'label', 'added', '_iri')
+
     base_iri = r'#OWLNamedIndividual_'
     creator = r'http://orcid.org/0000-0001-7597-2590'
+    date = RUN_DATE
 
     def __init__(self, parent_iri: str, id_: int, label: str):
-        self.iri = self.base_iri + str(id_)
+        self.id_ = id_
         self.parent_iri = parent_iri
         self.label = label  # .lower()
-        self.date = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%SZ")
+        self.added = False
+        self._iri = None
+
+    @property
+    def iri(self):
+        if self._iri is None:
+            self._iri = self.base_iri + str(self.id_)
+        return self._iri
+
+    @iri.setter
+    def iri(self, iri: str):
+        self._iri = iri
+
+    @property
+    def has_iri(self):
+        return self._iri is not None
 
 
 class HarmonisedMeasure(Entity):
+    __slots__ = ()
 
     def __init__(self, id_: int, label: str, added: bool = False):
         super().__init__(parent_iri=r'#OWLClass_832ab481_6bdd_49e2_86dd_6042773f6aef', id_=id_, label=label, added=added)
 
 
 class Quality(Entity):
+    __slots__ = ('harmonised_measure',)
+
+    parent = BASE_IRI + '00000000000000000610'
+
     def __init__(self, id_: int, label: str,
                  harmonised_measure: str, added: bool = False):
-        super().__init__(parent_iri=self.base_iri + '00000000000000000610', id_=id_, label=label, added=added)
+        super().__init__(parent_iri=self.parent, id_=id_, label=label, added=added)
         self.harmonised_measure = harmonised_measure
 
 
 class HarmonisedQuestionarieComponent(Entity):
+    __slots__ = ('theoretical_background', 'definition', 'harmonised_measure', 'quality')
+
+    parent = BASE_IRI + '00000000000000000549'
+
     def __init__(self, id_: int, label: str,
                  theoretical_background: str, definition: str,
                  harmonised_measure: str, quality: str, added: bool = False):
-        super().__init__(parent_iri=self.base_iri + '00000000000000000549', id_=id_, label=label, added=added)
+        super().__init__(parent_iri=self.parent, id_=id_, label=label, added=added)
         self.theoretical_background = theoretical_background
         self.definition = definition
         self.harmonised_measure = harmonised_measure
@@ -107,15 +196,21 @@ class HarmonisedQuestionarieComponent(Entity):
 
 
 class ClassificationInstance(Instance):
+    __slots__ = ()
+
     def __init__(self, id_: int, label: str,
                  parent_iri: str):
         super().__init__(parent_iri=parent_iri, id_=id_, label=label)
 
 
 class Classification(Entity):
+    __slots__ = ('definition', 'individuals')
+
+    parent = CONTEXT_IRI + '00000000000000000002'
+
     def __init__(self, id_: int, label: str,
                  definition: str, added: bool = False):
-        super().__init__(parent_iri=self.context_iri + '00000000000000000002', id_=id_, label=label, added=added)
+        super().__init__(parent_iri=self.parent, id_=id_, label=label, added=added)
         self.definition = definition
         self.individuals = []
 
@@ -132,52 +227,68 @@ class QuestionType(Enum):
 
     @staticmethod
     def get_id(value: str):
-        if value == 'Bipolar':
-            return QuestionType.BIPOLAR
-        elif value == 'Matrix':
-            return QuestionType.MATRIX
-        elif value == 'Multiple choice':
-            return QuestionType.MULTIPLE_CHOICE
-        elif value == 'Open':
-            return QuestionType.OPEN
-        elif value == 'Single choice':
-            return QuestionType.SINGLE_CHOICE
-
-
-class SingleChoiceQuestion(Entity):
-    def __init__(self, id_: int, label: str, question_type: QuestionType,
+        return QUESTION_TYPES.get(value)
+
+
+QUESTION_TYPES = {'Bipolar': QuestionType.BIPOLAR,
+                  'Matrix': QuestionType.MATRIX,
+                  'Multiple choice': QuestionType.MULTIPLE_CHOICE,
+                  'Open': QuestionType.OPEN,
+                  'Single choice': QuestionType.SINGLE_CHOICE}
+
+
+class Question(Entity):
+    __slots__ = ('question_type', 'has_question', 'linked_classification', 'harmonised_component')
+
+    def __init__(self, parent_iri: str, id_: int, label: str, question_type: QuestionType,
                  has_question: str, linked_classification: str,
-                 harmonised_component: str, added: bool = False):
-        super().__init__(parent_iri=self.base_iri + '00000000000000000388', id_=id_, label=label, added=added)
+                 harmonised_component: str, added: bool):
+        super().__init__(parent_iri=parent_iri, id_=id_, label=label, added=added)
         self.question_type = question_type
         self.has_question = has_question
         self.linked_classification = linked_classification
         self.harmonised_component = harmonised_component
 
 
-class OpenQuestion(Entity):
+class SingleChoiceQuestion(Question):
+    __slots__ = ()
+
+    parent = BASE_IRI + '00000000000000000388'
+
     def __init__(self, id_: int, label: str, question_type: QuestionType,
                  has_question: str, linked_classification: str,
                  harmonised_component: str, added: bool = False):
-        super().__init__(parent_iri=self.base_iri + '00000000000000000358', id_=id_, label=label, added=added)
-        self.question_type = question_type
-        self.has_question = has_question
-        self.linked_classification = linked_classification
-        self.harmonised_component = harmonised_component
+        super().__init__(self.parent, id_, label, question_type,
+                         has_question, linked_classification, harmonised_component, added)
+
 
+class OpenQuestion(Question):
+    __slots__ = ()
+
+    parent = BASE_IRI + '00000000000000000358'
 
-class MatrixQuestion(Entity):
     def __init__(self, id_: int, label: str, question_type: QuestionType,
                  has_question: str, linked_classification: str,
                  harmonised_component: str, added: bool = False):
-        super().__init__(parent_iri=self.base_iri + '00000000000000000533', id_=id_, label=label, added=added)
-        self.question_type = question_type
-        self.has_question = has_question
-        self.linked_classification = linked_classification
-        self.harmonised_component = harmonised_component
+        super().__init__(self.parent, id_, label, question_type,
+                         has_question, linked_classification, harmonised_component, added)
+
+
+class MatrixQuestion(Question):
+    __slots__ = ()
+
+    parent = BASE_IRI + '00000000000000000533'
+
+    def __init__(self, id_: int, label: str, question_type: QuestionType,
+                 has_question: str, linked_classification: str,
+                 harmonised_component: str, added: bool = False):
+        super().__init__(self.parent, id_, label, question_type,
+                         has_question, linked_classification, harmonised_component, added)
 
 
 class MatrixStatement(Entity):
+    __slots__ = ('description', 'matrix_question', 'harmonised_component')
+
     def __init__(self, id_: int, label: str, description: str,
                  matrix_question: str, harmonised_component: str, added: bool = False):
         super().__init__(parent_iri='', id_=id_, label=label, added=added)
@@ -0,0 +1,105 @@
+import json
+import mmap
+import multiprocessing
+import os
+import re
+
+# numeric ids of classes (COMFOCUS_<20 digits>) and of classification instances (OWLNamedIndividual_<n>)
+# are drawn from the same counter
+ID_PATTERN = re.compile(rb'COMFOCUS_(\d{20})|OWLNamedIndividual_(\d+)\b')
+# ids up to this one belong to the classes and properties the parsers and writers refer to (such as
+# COMFOCUS_...0549, harmonised questionarie component), so they are never handed out, even against
+# an ontology that does not declare them
+RESERVED = 700
+
+
+class IdAllocator:
+    extension = '.ids'
+
+    def __init__(self, high_water_mark: int = RESERVED, file: str = None):
+        self.high_water_mark = high_water_mark
+        self.file = file
+
+    @classmethod
+    def path(cls, file: str):
+        return file + cls.extension
+
+    @staticmethod
+    def highest(data) -> int:
+        # the highest id in bytes (or an mmap) holding IRIs
+        high_water_mark = 0
+        for match in ID_PATTERN.finditer(data):
+            high_water_mark = max(high_water_mark, int(match.group(1) or match.group(2)))
+        return high_water_mark
+
+    @classmethod
+    def scan(cls, file: str):
+        with open(file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return cls.highest(data)
+
+    @classmethod
+    def load(cls, file: str):
+        # the high-water mark is persisted next to the ontology and only rescanned when the file changed
+        stat = os.stat(file)
+        stored = dict()
+        if os.path.exists(cls.path(file)):
+            with open(cls.path(file), encoding='utf-8') as f:
+                stored = json.load(f)
+
+        if stored.get('size') == stat.st_size and stored.get('mtime_ns') == stat.st_mtime_ns:
+            return cls(max(stored['high_water_mark'], RESERVED), file)
+
+        # never go below ids already handed out by earlier runs against an older version of the file
+        return cls(max(cls.scan(file), stored.get('high_water_mark', 0), RESERVED), file)
+
+    def save(self):
+        if self.file is None:
+            return
+
+        stat = os.stat(self.file)
+        with open(self.path(self.file), 'w', encoding='utf-8') as f:
+            json.dump({'size': stat.st_size,
+                       'mtime_ns': stat.st_mtime_ns,
+                       'high_water_mark': self.high_water_mark}, f)
+
+    def reserve(self, high_water_mark: int):
+        # ids up to high_water_mark are used elsewhere (see ImportManifest) and are not handed out
+        self.high_water_mark = max(self.high_water_mark, high_water_mark)
+
+    def lease(self, size: int):
+        # hands out a block of consecutive unused ids; blocks never overlap, so each parser
+        # (or worker) numbers its own entities without sharing a counter
+        block = range(self.high_water_mark + 1, self.high_water_mark + 1 + size)
+        self.high_water_mark += size
+        return block
+
+
+class SharedIdAllocator(IdAllocator):
+    # Leases ids from a multiprocessing.Value shared by several processes, so imports running in
+    # parallel (see BatchImport) never hand out the same id. Create the value with shared(), before
+    # the processes are started.
+
+    def __init__(self, counter, file: str = None):
+        self.counter = counter
+        self.file = file
+
+    @staticmethod
+    def shared(allocator: IdAllocator):
+        return multiprocessing.Value('q', allocator.high_water_mark)
+
+    @property
+    def high_water_mark(self):
+        return self.counter.value
+
+    def reserve(self, high_water_mark: int):
+        with self.counter.get_lock():
+            self.counter.value = max(self.counter.value, high_water_mark)
+
+    def lease(self, size: int):
+        with self.counter.get_lock():
+            block = range(self.counter.value + 1, self.counter.value + 1 + size)
+            self.counter.value += size
+        return block
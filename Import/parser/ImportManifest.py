@@ -0,0 +1,63 @@
+import hashlib
+import json
+import os
+
+from IdAllocator import IdAllocator
+
+
+class ChangedRowsError(ValueError):
+    # rows imported before that changed since; a merge can only add axioms, so it cannot take back
+    # the ones written for their old values
+    def __init__(self, changed: list):
+        super().__init__(f'{len(changed)} changed row(s) cannot be merged, import them into a new file:\n'
+                         + '\n'.join(changed))
+        self.changed = changed
+
+
+class ImportManifest:
+    # Remembers, per parser and key (CsvParser.get_id()), a hash of the values an entity was
+    # built from and the IRI it was written with. On the next run an unchanged entity keeps
+    # its IRI and is not written again; a changed one keeps its IRI and is written again, whole:
+    # the axioms of its old values are not taken back, so it is refused in a merge (see
+    # Ontology.additive).
+
+    def __init__(self, file: str = None):
+        self.file = file
+        self.entries = dict()
+        # highest id of the IRIs in the manifest; the allocator may not know of them (its .ids file
+        # missing or not saved), so Ontology.lease() never hands out ids below it
+        self.high_water_mark = 0
+
+    @classmethod
+    def load(cls, file: str):
+        manifest = cls(file)
+        if os.path.exists(file):
+            with open(file, encoding='utf-8') as f:
+                manifest.entries = json.load(f)
+            iris = ' '.join(entry[1] for entries in manifest.entries.values() for entry in entries.values() if entry[1])
+            manifest.high_water_mark = IdAllocator.highest(iris.encode('utf-8'))
+        return manifest
+
+    def save(self):
+        if self.file is None:
+            return
+
+        with open(self.file, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=1, sort_keys=True)
+
+    @staticmethod
+    def hash(values, previous: str = ''):
+        content = previous + json.dumps(values, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+    def get(self, namespace: str, key: str):
+        return self.entries.get(namespace, dict()).get(key)
+
+    def set(self, namespace: str, key: str, hash_: str, iri: str, base: bool = False):
+        # base: the IRI is that of an entity found in the base ontology, which the next run looks up
+        # there again instead of writing it when it changed
+        self.entries.setdefault(namespace, dict())[key] = [hash_, iri, True] if base else [hash_, iri]
+
+    @staticmethod
+    def in_base(entry: list):
+        return len(entry) > 2 and entry[2]
@@ -0,0 +1,215 @@
+import argparse
+import asyncio
+import json
+import re
+from bisect import bisect_left
+from urllib.parse import urlsplit, parse_qs
+
+from OntologyIndex import OntologyIndex
+
+WORD = re.compile(r'\w+')
+LIMIT = 10
+# words in more labels than this also get a set of their positions, to intersect them quickly
+FREQUENT = 64
+# checking one label for a word prefix costs about as much as this many set lookups
+SCAN_COST = 8
+# labels of the rarest word of a query intersected with the other words at a time
+CHUNK = 256
+MAX_LIMIT = 100
+
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class LabelIndex:
+    # Looks up the declared entities of an ontology (classes, classification instances, ...) by
+    # their rdfs:label, as normalized by OntologyIndex. The labels are kept sorted, so the labels
+    # starting with a prefix are one run of the list found with bisect, which does the job of a
+    # prefix trie without a node per character. Every word of a label is indexed as well (word ->
+    # positions of its labels), so a query also matches labels that contain its words anywhere.
+
+    def __init__(self, index: OntologyIndex):
+        self.entries = dict()  # label -> [(IRI, entity type)]
+        for label, iris in index.labels.items():
+            entries = [(iri, index.types[iri]) for iri in iris if iri in index.types]
+            if entries:
+                self.entries[label] = entries
+
+        self.labels = sorted(self.entries)
+        self.postings = dict()  # word -> ascending positions in self.labels
+        for position, label in enumerate(self.labels):
+            for word in set(WORD.findall(label)):
+                self.postings.setdefault(word, []).append(position)
+        self.words = sorted(self.postings)
+        self.frequent = {word: set(positions) for word, positions in self.postings.items()
+                         if len(positions) > FREQUENT}
+
+    @classmethod
+    def load(cls, file: str):
+        return cls(OntologyIndex.load(file))
+
+    def __len__(self):
+        return len(self.labels)
+
+    @staticmethod
+    def starting(items: list, prefix: str):
+        # positions of the items of a sorted list that start with prefix
+        position = bisect_left(items, prefix)
+        while position < len(items) and items[position].startswith(prefix):
+            yield position
+            position += 1
+
+    def results(self, labels):
+        return [{'label': label, 'iri': iri, 'type': type_}
+                for label in labels for iri, type_ in self.entries[label]]
+
+    def exact(self, label: str):
+        label = OntologyIndex.normalize(label)
+        return self.results([label] if label in self.entries else [])
+
+    def complete(self, query: str, limit: int = LIMIT):
+        # labels starting with the query first, then labels containing all its words, where the
+        # last word may be the beginning of a word
+        query = OntologyIndex.normalize(query)
+        found = []
+        for position in self.starting(self.labels, query):
+            if len(found) == limit:
+                return self.results(self.labels[position] for position in found)[:limit]
+            found.append(position)
+
+        words = WORD.findall(query)
+        if words:
+            seen = set(found)
+            for position in self.matching(words[:-1], words[-1]):
+                if len(found) == limit:
+                    break
+                if position not in seen:
+                    seen.add(position)
+                    found.append(position)
+
+        # a label can belong to several entities
+        return self.results(self.labels[position] for position in found)[:limit]
+
+    def matching(self, words: list, prefix: str):
+        # positions of the labels with all the words and a word starting with prefix, found as they
+        # are taken, so complete() stops the search once it has its limit
+        if not words:
+            # a single word: labels in the order of the word they start with
+            for index in self.starting(self.words, prefix):
+                yield from self.postings[self.words[index]]
+            return
+
+        if any(word not in self.postings for word in words):
+            return
+        words = sorted(set(words), key=lambda word: len(self.postings[word]))
+        # the labels of the rarest word are taken CHUNK at a time, in order, and intersected
+        # with those of the other words
+        rarest = self.postings[words[0]]
+        others = [self.frequent.get(word, self.postings[word]) for word in words[1:]]
+
+        # Each label with all the words is checked for a word starting with prefix, and for every
+        # label checked as much work goes into collecting the labels of the words starting with
+        # prefix. Once they are all collected the rest is one set intersection, so a common prefix
+        # costs a few checks and a rare one little more than its labels.
+        starts = re.compile(r'(?<!\w)' + re.escape(prefix)).search
+        prefixed = set()
+        postings = (self.postings[self.words[index]] for index in self.starting(self.words, prefix))
+        credit = 0
+        for start in range(0, len(rarest), CHUNK):
+            chunk = rarest[start:start + CHUNK]
+            for position in sorted(set(chunk).intersection(*others)) if others else chunk:
+                if starts(self.labels[position]):
+                    yield position
+
+                credit += SCAN_COST
+                while credit > 0:
+                    positions = next(postings, None)
+                    if positions is None:
+                        rest = prefixed.intersection(self.frequent.get(words[0], rarest), *others)
+                        yield from sorted(position_ for position_ in rest if position_ > position)
+                        return
+                    # taking the next word costs about as much as checking a label
+                    prefixed.update(positions)
+                    credit -= SCAN_COST + len(positions)
+
+
+def route(index: LabelIndex, method: str, target: str):
+    # (status, JSON body) of a request to /complete?q=...&limit=... or /exact?q=...
+    if method != 'GET':
+        return 405, {'error': 'only GET is supported'}
+
+    url = urlsplit(target)
+    parameters = parse_qs(url.query, keep_blank_values=True)
+    if url.path not in ('/complete', '/exact'):
+        return 404, {'error': f'unknown endpoint {url.path}, use /complete or /exact'}
+    if 'q' not in parameters:
+        return 400, {'error': 'missing query parameter q'}
+
+    query = parameters['q'][0]
+    if url.path == '/exact':
+        return 200, {'query': query, 'results': index.exact(query)}
+
+    try:
+        limit = max(1, min(int(parameters.get('limit', [LIMIT])[0]), MAX_LIMIT))
+    except ValueError:
+        return 400, {'error': 'limit must be a number'}
+    return 200, {'query': query, 'results': index.complete(query, limit)}
+
+
+async def handle(index: LabelIndex, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    # a minimal HTTP/1.1 server: GET requests without a body, kept alive unless the client closes
+    try:
+        while True:
+            request = await reader.readline()
+            if not request:
+                break
+            headers = dict()
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                [name, _, value] = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request.decode('latin-1').split()
+            if len(parts) == 3:
+                [method, target, version] = parts
+                [status, body] = route(index, method, target)
+            else:
+                [method, version] = ['', 'HTTP/1.0']
+                [status, body] = [400, {'error': 'malformed request line'}]
+
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close' \
+                and method == 'GET'
+            writer.write(f'HTTP/1.1 {status} {STATUS[status]}\r\n'
+                         f'Content-Type: application/json; charset=utf-8\r\n'
+                         f'Content-Length: {len(data)}\r\n'
+                         f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode('latin-1') + data)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(index: LabelIndex, host: str, port: int):
+    server = await asyncio.start_server(lambda reader, writer: handle(index, reader, writer), host, port)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description='Serve label lookups of an ontology on localhost.')
+    arguments.add_argument('ontology', help='OWL/XML file whose labels are served')
+    arguments.add_argument('--host', default='127.0.0.1')
+    arguments.add_argument('--port', type=int, default=8765)
+    args = arguments.parse_args()
+
+    index = LabelIndex.load(args.ontology)
+    print(f'{len(index)} labels, serving http://{args.host}:{args.port}/complete?q=... and /exact?q=...')
+    try:
+        asyncio.run(serve(index, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
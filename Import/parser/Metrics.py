@@ -0,0 +1,89 @@
+import cProfile
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from Entities import Entity
+
+
+class Metrics:
+    # Collects per-stage counters of an import run. Stages are opened with stage(name) (see
+    # Pipeline.run); parsers add their row and entity counts with add(), the axioms and bytes
+    # written are taken from the output tree. Without a Metrics object none of this runs.
+
+    def __init__(self, tree=None, profile: bool = False):
+        self.tree = tree
+        self.profile = profile
+        self.stages = []
+        self.current = None
+        self.slowest = None  # (seconds, stage name, profile) of the slowest profiled stage
+        if tree is not None:
+            tree.count()
+
+    @contextmanager
+    def stage(self, name: str):
+        stage = {'name': name, 'seconds': 0.0, 'rows': 0, 'parsers': dict()}
+        self.stages.append(stage)
+        self.current = stage
+
+        axioms = Counter(self.tree.counts) if self.tree is not None else None
+        duplicates = Counter(self.deduplication.skipped) if self.deduplication is not None else None
+        size = self.tree.tell() if self.tree is not None else 0
+        profile = cProfile.Profile() if self.profile else None
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield stage
+        finally:
+            if profile is not None:
+                profile.disable()
+            stage['seconds'] = round(time.perf_counter() - start, 6)
+            if self.tree is not None:
+                stage['axioms'] = dict(self.tree.counts - axioms)
+                stage['bytes'] = self.tree.tell() - size
+            if duplicates is not None:
+                stage['duplicates'] = dict(self.deduplication.skipped - duplicates)
+            if profile is not None and (self.slowest is None or stage['seconds'] > self.slowest[0]):
+                self.slowest = (stage['seconds'], name, profile)
+            self.current = None
+
+    @property
+    def deduplication(self):
+        return self.tree.axioms if self.tree is not None else None
+
+    def add(self, parser: str, counts: dict):
+        if self.current is None:
+            return
+
+        # a streamed parser adds the counts of every batch
+        totals = self.current['parsers'].setdefault(parser, dict())
+        for name, count in counts.items():
+            totals[name] = totals.get(name, 0) + count
+
+    def count_rows(self, rows: int):
+        if self.current is not None:
+            self.current['rows'] += rows
+
+    def report(self):
+        axioms = Counter()
+        for stage in self.stages:
+            axioms.update(stage.get('axioms', dict()))
+
+        return {'date': Entity.date,
+                'seconds': round(sum(stage['seconds'] for stage in self.stages), 6),
+                'rows': sum(stage['rows'] for stage in self.stages),
+                'axioms': dict(axioms),
+                'bytes': sum(stage.get('bytes', 0) for stage in self.stages),
+                'deduplication': self.deduplication.stats() if self.deduplication is not None else None,
+                'profiled_stage': self.slowest[1] if self.slowest is not None else None,
+                'stages': self.stages}
+
+    def save(self, file: str, profile_file: str = None):
+        with open(file, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=1)
+
+        # only the slowest stage is kept, the others are usually not worth looking at
+        if profile_file is not None and self.slowest is not None:
+            self.slowest[2].dump_stats(profile_file)
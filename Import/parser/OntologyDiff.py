@@ -0,0 +1,136 @@
+import argparse
+import hashlib
+import json
+import xml.etree.ElementTree as ET
+from json.encoder import encode_basestring
+
+from OwlReader import OwlReader, OWL
+
+XML_NAMESPACE = '{http://www.w3.org/XML/1998/namespace}'
+
+# n-ary constructs whose operands form a set, so their order does not change the axiom
+UNORDERED = {'DisjointClasses', 'EquivalentClasses', 'DisjointUnion', 'ObjectIntersectionOf', 'ObjectUnionOf',
+             'ObjectOneOf', 'DataIntersectionOf', 'DataUnionOf', 'DataOneOf', 'SameIndividual',
+             'DifferentIndividuals', 'EquivalentObjectProperties', 'DisjointObjectProperties',
+             'EquivalentDataProperties', 'DisjointDataProperties', 'HasKey'}
+
+# top-level elements that only affect how the file is written, not what it says
+IGNORED = {OWL + 'Prefix'}
+
+
+class OntologyDiff:
+    # Compares two OWL/XML files axiom by axiom. Every top-level axiom is canonicalized (full IRIs,
+    # sorted operands of set-like constructs and axiom annotations) and hashed; only the hashes are
+    # kept in memory. The axioms whose hash is in one file only are then read again from their
+    # files to report them, grouped by the entity they are about.
+
+    def __init__(self, old_file: str, new_file: str):
+        self.old_file = old_file
+        self.new_file = new_file
+
+    @classmethod
+    def canonical(cls, reader: OwlReader, element: ET.Element):
+        # also accepts the elements the writers build, which have no namespace
+        name = reader.name(element)
+        if name in ('IRI', 'AbbreviatedIRI'):
+            return f'<{reader.iri(element)}>'
+
+        attributes = []
+        for key, value in element.attrib.items():
+            if key in ('IRI', 'abbreviatedIRI'):
+                continue
+            if key.startswith(XML_NAMESPACE):
+                key = 'xml:' + key[len(XML_NAMESPACE):]
+            attributes.append(f'{key}={encode_basestring(value)}')
+        iri = reader.iri(element) if 'IRI' in element.attrib or 'abbreviatedIRI' in element.attrib else None
+
+        operands = [cls.canonical(reader, child) for child in element]
+        if name in UNORDERED:
+            operands.sort()
+        else:
+            # axiom annotations come first and are a set as well
+            annotations = sorted(operand for operand in operands if operand.startswith('Annotation('))
+            operands = annotations + [operand for operand in operands if not operand.startswith('Annotation(')]
+
+        if iri is not None:
+            operands.insert(0, f'<{iri}>')
+        # an empty text is the same as no text, ElementTree writes both as <tag />
+        if not len(element) and element.text and iri is None:
+            operands.append(encode_basestring(element.text))
+
+        head = name + (f'[{" ".join(sorted(attributes))}]' if attributes else '')
+        return f'{head}({" ".join(operands)})'
+
+    @staticmethod
+    def subject(reader: OwlReader, element: ET.Element):
+        # the entity an axiom is about: the annotated IRI, the asserted individual or the
+        # first named entity in the axiom
+        name = reader.name(element)
+        if name in ('AnnotationAssertion', 'ClassAssertion') and len(element) > 1:
+            return reader.iri(element[1]) or ''
+        for child in element.iter():
+            if child is not element and ('IRI' in child.attrib or 'abbreviatedIRI' in child.attrib):
+                return reader.iri(child)
+        return ''
+
+    @staticmethod
+    def hash(canonical: str):
+        return hashlib.blake2b(canonical.encode('utf-8'), digest_size=16).digest()
+
+    def axioms(self, file: str):
+        # (hash, canonical form, reader, element) of every axiom in file; the element is only valid
+        # until the next one is read
+        reader = OwlReader(file)
+        for element in reader.axioms():
+            if element.tag in IGNORED:
+                continue
+            canonical = self.canonical(reader, element)
+            yield self.hash(canonical), canonical, reader, element
+
+    def hashes(self, file: str):
+        return {hash_ for hash_, _, _, _ in self.axioms(file)}
+
+    def changes(self, file: str, hashes: set, change: str, changes: dict):
+        for hash_, canonical, reader, element in self.axioms(file):
+            if hash_ in hashes:
+                subject = self.subject(reader, element)
+                changes.setdefault(subject, {'added': [], 'removed': []})[change].append(canonical)
+                # an axiom repeated in the file is reported once
+                hashes.discard(hash_)
+
+    def diff(self):
+        old = self.hashes(self.old_file)
+        new = self.hashes(self.new_file)
+        removed = old - new
+        added = new - old
+        del old, new
+
+        changes = dict()
+        self.changes(self.old_file, removed, 'removed', changes)
+        self.changes(self.new_file, added, 'added', changes)
+
+        return dict(sorted(changes.items()))
+
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description='List the axioms added and removed between two OWL/XML files.')
+    arguments.add_argument('old')
+    arguments.add_argument('new')
+    arguments.add_argument('--json', help='write the changes to this JSON file instead of printing them')
+    args = arguments.parse_args()
+
+    changes = OntologyDiff(args.old, args.new).diff()
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(changes, f, ensure_ascii=False, indent=1)
+    else:
+        for subject, change in changes.items():
+            print(subject or '(ontology)')
+            for axiom in change['removed']:
+                print(f'  - {axiom}')
+            for axiom in change['added']:
+                print(f'  + {axiom}')
+
+    added = sum(len(change['added']) for change in changes.values())
+    removed = sum(len(change['removed']) for change in changes.values())
+    print(f'{added} axioms added, {removed} removed, {len(changes)} entities changed')
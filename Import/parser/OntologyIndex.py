@@ -0,0 +1,90 @@
+from ClassHierarchy import ClassHierarchy
+from OntologySnapshot import OntologySnapshot
+from OwlReader import OwlReader, OWL
+
+RDFS_LABEL = 'http://www.w3.org/2000/01/rdf-schema#label'
+
+
+class OntologyIndex:
+    def __init__(self, base: str = ''):
+        self.base = base
+        self.labels = dict()  # normalized label -> IRIs carrying that label
+        self.types = dict()  # IRI -> declared entity type (Class, NamedIndividual, ...)
+        self.parents = dict()  # IRI -> named super classes
+        self.hierarchy = ClassHierarchy()  # transitive closure of parents
+
+    @staticmethod
+    def normalize(label: str):
+        return label.strip().lower()
+
+    @classmethod
+    def load(cls, file: str, snapshot: bool = True):
+        # uses the snapshot next to the file when it is up to date and (re)builds it otherwise
+        if snapshot:
+            tables = OntologySnapshot.read(file)
+            if tables is not None:
+                return cls.from_tables(tables)
+
+        index = cls.parse(file)
+        if snapshot:
+            try:
+                OntologySnapshot.write(file, index.tables())
+            except OSError:
+                pass
+
+        return index
+
+    @classmethod
+    def parse(cls, file: str):
+        reader = OwlReader(file)
+        index = cls()
+        for axiom in reader.axioms():
+            if axiom.tag == OWL + 'Declaration':
+                index.types[reader.iri(axiom[0])] = reader.name(axiom[0])
+
+            elif axiom.tag == OWL + 'AnnotationAssertion':
+                if reader.iri(axiom[0]) != RDFS_LABEL or axiom[2].tag != OWL + 'Literal':
+                    continue
+                iri = reader.iri(axiom[1])
+                if iri is not None and axiom[2].text:
+                    index.labels.setdefault(cls.normalize(axiom[2].text), []).append(iri)
+
+            elif axiom.tag == OWL + 'SubClassOf':
+                if axiom[0].tag == OWL + 'Class' and axiom[1].tag == OWL + 'Class':
+                    index.parents.setdefault(reader.iri(axiom[0]), []).append(reader.iri(axiom[1]))
+
+        index.base = reader.base
+        index.hierarchy = ClassHierarchy.from_parents(index.parents)
+        return index
+
+    def tables(self):
+        return {
+            'base': [('base', self.base)],
+            'types': list(self.types.items()),
+            'labels': [(label, iri) for label, iris in self.labels.items() for iri in iris],
+            'parents': [(iri, parent) for iri, parents in self.parents.items() for parent in parents],
+            'closure': self.hierarchy.closure()}
+
+    @classmethod
+    def from_tables(cls, tables: dict):
+        index = cls(dict(tables['base'])['base'])
+        index.types = dict(tables['types'])
+        for label, iri in tables['labels']:
+            index.labels.setdefault(label, []).append(iri)
+        for iri, parent in tables['parents']:
+            index.parents.setdefault(iri, []).append(parent)
+        index.hierarchy = ClassHierarchy.from_closure(tables['closure'])
+        return index
+
+    def find(self, label: str, parent_iri: str = None, type_: str = 'Class'):
+        if parent_iri is not None and parent_iri.startswith('#'):
+            parent_iri = self.base + parent_iri
+
+        for iri in self.labels.get(self.normalize(label), []):
+            if self.types.get(iri) != type_:
+                continue
+            if parent_iri is not None and parent_iri not in self.parents.get(iri, []):
+                continue
+            return iri
+
+        return None
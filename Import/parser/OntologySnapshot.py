@@ -0,0 +1,114 @@
+import hashlib
+import os
+import struct
+from array import array
+
+MAGIC = b'COMFOCUS-SNAPSHOT-3'
+
+
+class OntologySnapshot:
+    # Binary cache of tables of string pairs loaded from an .owl file. Every distinct string is
+    # stored once in a string table and the tables hold pairs of string ids in flat arrays.
+    # The snapshot sits next to the source file and records its sha256, so a changed source
+    # invalidates it.
+
+    extension = '.snapshot'
+
+    @classmethod
+    def path(cls, file: str):
+        return file + cls.extension
+
+    @staticmethod
+    def digest(file: str):
+        with open(file, 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').digest()
+
+    @classmethod
+    def write(cls, file: str, tables: dict):
+        strings = dict()
+        packed = []
+        for name, pairs in tables.items():
+            ids = array('I')
+            for pair in pairs:
+                for value in pair:
+                    ids.append(strings.setdefault(value, len(strings)))
+            packed.append((name.encode(), ids))
+
+        string_table = '\0'.join(strings).encode('utf-8')
+
+        # written next to the snapshot and moved over it once complete, so a run that stops halfway
+        # never leaves a partial snapshot behind
+        temporary = f'{cls.path(file)}.{os.getpid()}.tmp'
+        try:
+            with open(temporary, 'wb') as f:
+                f.write(MAGIC)
+                f.write(cls.digest(file))
+                f.write(struct.pack('<II', len(strings), len(string_table)))
+                f.write(string_table)
+                f.write(struct.pack('<I', len(packed)))
+                for name, ids in packed:
+                    f.write(struct.pack('<HI', len(name), len(ids)))
+                    f.write(name)
+                    f.write(ids.tobytes())
+            os.replace(temporary, cls.path(file))
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    @classmethod
+    def read(cls, file: str):
+        # returns None if there is no snapshot or the source changed since it was written
+        path = cls.path(file)
+        if not os.path.exists(path):
+            return None
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        offset = len(MAGIC)
+        if data[:offset] != MAGIC or data[offset:offset + 32] != cls.digest(file):
+            return None
+        offset += 32
+
+        # a short or malformed snapshot is stale as well, the index is rebuilt from the source
+        if offset + 8 > len(data):
+            return None
+        count, size = struct.unpack_from('<II', data, offset)
+        offset += 8
+        if offset + size + 4 > len(data):
+            return None
+        try:
+            strings = data[offset:offset + size].decode('utf-8').split('\0') if count else []
+        except UnicodeDecodeError:
+            return None
+        if len(strings) != count:
+            return None
+        offset += size
+
+        tables = dict()
+        [table_count] = struct.unpack_from('<I', data, offset)
+        offset += 4
+        for _ in range(table_count):
+            if offset + 6 > len(data):
+                return None
+            name_size, id_count = struct.unpack_from('<HI', data, offset)
+            offset += 6
+            ids = array('I')
+            if id_count % 2 or offset + name_size + id_count * ids.itemsize > len(data):
+                return None
+            try:
+                name = data[offset:offset + name_size].decode()
+            except UnicodeDecodeError:
+                return None
+            offset += name_size
+            ids.frombytes(data[offset:offset + id_count * ids.itemsize])
+            offset += id_count * ids.itemsize
+            if ids and max(ids) >= count:
+                return None
+            tables[name] = [(strings[ids[i]], strings[ids[i + 1]]) for i in range(0, len(ids), 2)]
+
+        if offset != len(data):
+            return None
+
+        return tables
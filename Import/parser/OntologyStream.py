@@ -0,0 +1,305 @@
+import io
+import mmap
+import os
+import re
+import struct
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+INDENT = '    '
+SLOT = 'AXIOM-TEMPLATE-SLOT-{}'
+SLOT_PATTERN = re.compile(SLOT.format(r'(\d+)'))
+
+
+def escape_text(text: str):
+    # escapes element text the way ElementTree.tostring() does (its own helpers are private)
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def escape_attribute(value: str):
+    # escapes an attribute value the way ElementTree.tostring() does
+    return escape_text(value).replace('"', '&quot;') \
+        .replace('\r', '&#13;').replace('\n', '&#10;').replace('\t', '&#09;')
+
+
+class AxiomTemplate:
+    # An axiom serialized once, with markers in place of its values, exactly as AxiomSink writes
+    # it. render() only escapes the values (as ElementTree escapes them) and fills them in.
+    # build(parent, *values) adds the axiom as ElementTree elements, it is also used for the
+    # cases the pre-serialized form cannot express.
+
+    def __init__(self, build, slots: int):
+        self.build = build
+        element = self.element([SLOT.format(index) for index in range(slots)])
+        self.tag = element.tag
+
+        ET.indent(element, INDENT, level=1)
+        element.tail = None
+        parts = SLOT_PATTERN.split(ET.tostring(element).decode('ascii'))
+        self.parts = parts[::2]
+        self.slots = []
+        for index, before in zip(parts[1::2], self.parts):
+            # a marker inside a start tag is an attribute value, anywhere else it is text
+            text = before.rfind('>') > before.rfind('<')
+            self.slots.append((int(index), escape_text if text else escape_attribute, text))
+
+    def element(self, values):
+        return self.build(ET.Element('Ontology'), *values)
+
+    def render(self, values):
+        pieces = [self.parts[0]]
+        for (index, escape, text), part in zip(self.slots, self.parts[1:]):
+            value = values[index]
+            if text and not value:
+                # ElementTree writes an element without text as <tag />
+                return self.render_element(values)
+            pieces.append(escape(value))
+            pieces.append(part)
+        return ''.join(pieces).encode('ascii', 'xmlcharrefreplace')
+
+    def render_element(self, values):
+        element = self.element(values)
+        ET.indent(element, INDENT, level=1)
+        element.tail = None
+        return ET.tostring(element)
+
+
+class RenderedAxiom(ET.Element):
+    # a top-level axiom kept as its template and values until it is written
+    def __init__(self, template: AxiomTemplate, values: tuple):
+        super().__init__(template.tag)
+        self.template = template
+        self.values = values
+
+    def render(self):
+        return self.template.render(self.values)
+
+    def element(self):
+        return self.template.element(self.values)
+
+
+def pending(file: str):
+    # streams write their output next to it and move it over the output once it is complete, so a
+    # failed run leaves the previous output as it was
+    return file + '.tmp'
+
+
+class OntologyTree(ET.ElementTree):
+    # top-level elements written so far by tag, only counted once count() was called
+    counts = None
+    size = 0
+    # AxiomSet of the axioms in the target ontology and those written so far, see deduplicate()
+    axioms = None
+
+    def count(self):
+        self.counts = Counter()
+
+    def deduplicate(self, axioms):
+        self.axioms = axioms
+
+    def new_axioms(self, elements):
+        # leaves out the axioms that are already in the target ontology or were written before
+        if self.axioms is None:
+            return elements
+        return [element for element in elements if self.axioms.add(element)]
+
+    def tell(self):
+        # bytes written so far
+        return self.size
+
+    def flush(self):
+        pass
+
+    def expand(self):
+        # replaces template axioms by the elements they stand for, before the whole tree is written
+        root = self.getroot()
+        root[:] = [element.element() if isinstance(element, RenderedAxiom) else element
+                   for element in self.new_axioms(list(root))]
+
+    def write_fragment(self, fragment, counts: Counter = None):
+        raise NotImplementedError('serialized axioms can only be added to an OntologyStream')
+
+    def rollback(self):
+        # drops what a failed run wrote; nothing was written to a file yet
+        pass
+
+    def write(self, file, *args, **kwargs):
+        if self.counts is not None:
+            self.counts.update(element.tag for element in self.getroot())
+        super().write(file, *args, **kwargs)
+        if isinstance(file, str):
+            self.size = os.path.getsize(file)
+
+
+class AxiomSink(OntologyTree):
+    indent = INDENT
+
+    def __init__(self, element: ET.Element, file):
+        super().__init__(element)
+        self.file = file
+
+    def write_axiom(self, element: ET.Element):
+        if isinstance(element, RenderedAxiom):
+            self.file.write(b'\n' + self.indent.encode() + element.render())
+            return
+
+        ET.indent(element, self.indent, level=1)
+        element.tail = None
+        self.file.write(b'\n' + self.indent.encode() + ET.tostring(element))
+
+    def tell(self):
+        return self.file.tell()
+
+    def flush(self):
+        # write the top-level axioms added since the last flush and drop them from the tree
+        root = self.getroot()
+        elements = self.new_axioms(root)
+        if self.counts is not None:
+            self.counts.update(element.tag for element in elements)
+        for element in elements:
+            self.write_axiom(element)
+        del root[:]
+
+
+class OntologyStream(AxiomSink):
+    def __init__(self, element: ET.Element, file: str):
+        self.target = file
+        super().__init__(element, open(pending(file), 'wb'))
+
+        # start tag of the root, serialized the same way ElementTree writes it
+        start = ET.tostring(ET.Element(element.tag, element.attrib))
+        self.file.write(start[:-len(b' />')] + b'>')
+
+    def tell(self):
+        return self.size if self.file.closed else self.file.tell()
+
+    def write_fragment(self, fragment, counts: Counter = None):
+        # axioms serialized elsewhere (see OntologyFragment) go after everything flushed so far
+        self.flush()
+        if isinstance(fragment, list):
+            # (key, tag, bytes) of every axiom, only the new ones are written
+            counts = Counter()
+            for key, tag, data in fragment:
+                if self.axioms.add_key(key, tag):
+                    self.file.write(data)
+                    counts[tag] += 1
+        else:
+            self.file.write(fragment)
+        if self.counts is not None and counts is not None:
+            self.counts.update(counts)
+
+    def close(self):
+        self.flush()
+        self.file.write(b'\n</' + self.getroot().tag.encode() + b'>')
+        self.size = self.file.tell()
+        self.file.close()
+        os.replace(pending(self.target), self.target)
+
+    def rollback(self):
+        self.file.close()
+        if os.path.exists(pending(self.target)):
+            os.remove(pending(self.target))
+
+
+class OntologyMerge(OntologyStream):
+    # Adds axioms to an existing OWL/XML file in place. Only the end of the file is searched (through
+    # mmap) for the closing </Ontology> tag; the new axioms are written over it and close() writes
+    # the tag again after them, so a merge costs the size of the new axioms, not of the file. Until
+    # the file is synced, a journal next to it (<file>.merge) holds where the axioms start and the
+    # tail they replaced: rollback() puts the file back as it was, and so does the next merge into
+    # a file whose run failed without rolling back.
+    extension = '.merge'
+
+    def __init__(self, element: ET.Element, file: str):
+        self.target = file
+        self.journal = file + self.extension
+        if os.path.exists(self.journal):
+            self.restore(file, self.journal)
+        [self.offset, self.tail] = self.find_end(file)
+
+        # the journal is complete before the file is touched
+        temporary = self.journal + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(struct.pack('<Q', self.offset) + self.tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.journal)
+
+        AxiomSink.__init__(self, element, open(file, 'r+b'))
+        self.file.seek(self.offset)
+
+    @staticmethod
+    def find_end(file: str):
+        # offset right after the last axiom and the bytes from there to the end of the file
+        # (whitespace, the closing tag and anything after it, such as a comment)
+        with open(file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            end = data.rfind(b'</Ontology>')
+            if end < 0:
+                raise ValueError(f'{file} has no closing </Ontology> tag')
+            while end > 0 and data[end - 1] in b' \t\r\n':
+                end -= 1
+            return end, data[end:]
+
+    @staticmethod
+    def restore(file: str, journal: str):
+        # cuts the file where the merge started and writes the tail it had back
+        with open(journal, 'rb') as f:
+            data = f.read()
+        [offset] = struct.unpack_from('<Q', data)
+        with open(file, 'r+b') as f:
+            f.seek(offset)
+            f.write(data[struct.calcsize('<Q'):])
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        os.remove(journal)
+
+    def new_axioms(self, elements):
+        # the file declares its prefixes already, and they cannot follow axioms
+        return super().new_axioms([element for element in elements if element.tag != 'Prefix'])
+
+    def tell(self):
+        # bytes added to the file so far
+        return self.size if self.file.closed else self.file.tell() - self.offset
+
+    def close(self):
+        self.flush()
+        self.size = self.file.tell() - self.offset
+        self.file.write(self.tail)
+        self.file.truncate()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.remove(self.journal)
+
+    def rollback(self):
+        # leaves the file as it was before the merge
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.journal):
+            self.restore(self.target, self.journal)
+
+
+class OntologyFragment(AxiomSink):
+    # serializes axioms into memory exactly as OntologyStream would write them to the file;
+    # with a key function (AxiomSet.key) every axiom is kept apart with its key, so the stream
+    # can leave out the duplicates
+    def __init__(self, element: ET.Element, key=None):
+        super().__init__(element, io.BytesIO())
+        self.count()
+        self.key = key
+        self.pieces = []
+
+    def write_axiom(self, element: ET.Element):
+        if self.key is not None:
+            self.pieces.append((self.key(element), element.tag, self.file.tell()))
+        super().write_axiom(element)
+
+    def getvalue(self):
+        self.flush()
+        data = self.file.getvalue()
+        if self.key is None:
+            return data
+
+        ends = [start for _, _, start in self.pieces[1:]] + [len(data)]
+        return [(key, tag, data[start:end]) for (key, tag, start), end in zip(self.pieces, ends)]
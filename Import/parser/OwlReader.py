@@ -0,0 +1,72 @@
+import re
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin
+
+from Entities import Ontology
+
+OWL = '{http://www.w3.org/2002/07/owl#}'
+XML_BASE = '{http://www.w3.org/XML/1998/namespace}base'
+SCHEME = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*:')
+
+
+class OwlReader:
+    def __init__(self, file: str = None):
+        self.file = file
+        self.prefixes = dict(Ontology.PREFIXES)
+        self.base = Ontology.NAMESPACES['xml:base']
+        # attributes of the root element (ontologyIRI, versionIRI), known once the first axiom was read
+        self.attributes = dict()
+
+    @staticmethod
+    def name(element: ET.Element):
+        return element.tag[len(OWL):] if element.tag.startswith(OWL) else element.tag
+
+    def axioms(self):
+        # yields the top-level elements of an OWL/XML file one at a time; each element is
+        # dropped from the tree once the caller moves on, so memory stays flat
+        root = None
+        depth = 0
+        for event, element in ET.iterparse(self.file, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                    self.base = element.get(XML_BASE, self.base)
+                    self.attributes = dict(element.attrib)
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth == 1:
+                if element.tag == OWL + 'Prefix':
+                    self.prefixes[element.get('name') or 'base'] = element.get('IRI')
+                yield element
+                del root[:]
+
+    def expand(self, iri: str):
+        if iri.startswith('#'):
+            return self.base + iri
+        if SCHEME.match(iri) is None:
+            # other relative IRIs (/COMFOCUS_..., OWLObjectProperty_...) are resolved like URLs
+            return urljoin(self.base, iri)
+        return iri
+
+    def expand_abbreviated(self, abbreviated_iri: str):
+        prefix, _, name = abbreviated_iri.partition(':')
+        namespace = self.prefixes.get(prefix or 'base')
+        if namespace is None:
+            return abbreviated_iri
+        return namespace + name
+
+    def iri(self, element: ET.Element):
+        # full IRI of an entity element (Class, NamedIndividual, ...) or of an IRI/AbbreviatedIRI element,
+        # with or without the OWL namespace
+        name = self.name(element)
+        if name == 'IRI':
+            return self.expand(element.text.strip())
+        if name == 'AbbreviatedIRI':
+            return self.expand_abbreviated(element.text.strip())
+        if 'IRI' in element.attrib:
+            return self.expand(element.get('IRI'))
+        if 'abbreviatedIRI' in element.attrib:
+            return self.expand_abbreviated(element.get('abbreviatedIRI'))
+        return None
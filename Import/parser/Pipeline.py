@@ -1,78 +1,248 @@
+from contextlib import nullcontext
+
+from AxiomSet import AxiomSet
 from Entities import Ontology
+from IdAllocator import IdAllocator
+from ImportManifest import ImportManifest
+from Metrics import Metrics
+from OntologyIndex import OntologyIndex
+from RdfStream import RdfStream
+from ReferenceResolver import resolve, resolve_all, UnresolvedReferenceError
 from CsvParser import HarmonisedMeasureParser, HarmonisedQuestionareComponentParser, \
     QualityParser, ClassificationParser, SingleChoiceQuestionParser, OpenQuestionParser, MatrixQuestionParser, \
-    MatrixStatementParser
+    MatrixStatementParser, CsvDispatcher
 from XmlWriter import HarmonisedMeasureXmlWriter, QualityXmlWriter, \
-    HarmonisedQuestionarieComponentXmlWriter, QuestionXmlWriter, ClassificationXmlWriter, MatrixStatementXmlWriter
+    HarmonisedQuestionarieComponentXmlWriter, QuestionXmlWriter, ClassificationXmlWriter, MatrixStatementXmlWriter, \
+    MatrixStatementBatchXmlWriter, DisjointStatementsXmlWriter, XmlWriterPool
 
 HARMONISED_COMPONENT_METADATA_FILE = r'path\to\csv\file'
 HARMONISED_COMPONENT_FILE = r'path\to\csv\file'
 CLASSIFICATION_FILE = r'path\to\csv\file'
 ITEMS_FILE = r'path\to\csv\file'
 
-OUTPUT_FILE = r'path\to\xml\file\'
+BASE_ONTOLOGY_FILE = r'path\to\owl\file'
+# a .nt or .ttl file is written as N-Triples or Turtle instead of OWL/XML
+OUTPUT_FILE = r'path\to\xml\file'
+# hashes and IRIs of the rows imported so far; rows that did not change since are not written again
+MANIFEST_FILE = r'path\to\json\file'
+
+# add the new axioms to BASE_ONTOLOGY_FILE itself instead of writing OUTPUT_FILE
+MERGE = False
+
+# write the rows of each CSV in batches as they are read instead of reading all the files first, so
+# the memory used does not grow with the number of questions and statements (see run_streaming)
+STREAM = False
+
+# number of processes writing axioms in parallel, 0 writes them in this process
+WORKERS = 0
+
+# one individual per classification instance label (e.g. "agree"), shared by all classifications
+# that list it and by the base ontology, instead of one per classification
+SHARE_INSTANCES = False
+
+# leave out axioms that are already in the base ontology or were written before in this run; this
+# makes the write stages about twice as slow, so it is off unless the CSVs repeat existing rows
+DEDUPLICATE = False
+
+# per-stage timings and counts are written to METRICS_FILE (JSON) when it is set, and a cProfile
+# dump of the slowest stage to PROFILE_FILE
+METRICS_FILE = None
+PROFILE_FILE = None
+
+
+def no_stage(name: str):
+    return nullcontext()
+
+
+def source_parsers(base: Ontology, shared_instances: bool = False):
+    # the parsers of each CSV file, in the order their entities are written
+    return {
+        'metadata': [
+            HarmonisedMeasureParser(id_columns=['Harmonised measure'], ontology=base),
+            QualityParser(id_columns=['Quality'], ontology=base),
+            HarmonisedQuestionareComponentParser(id_columns=['ID'], ontology=base)],
+        'classifications': [
+            ClassificationParser(id_columns=['ID'], ontology=base, shared=shared_instances)],
+        'components': [
+            SingleChoiceQuestionParser(
+                id_columns=['Annotation: Label', 'Annotation: hadQuestion', 'Linked classification ID'],
+                ontology=base),
+            OpenQuestionParser(
+                id_columns=['Annotation: Label', 'Annotation: hadQuestion', 'Linked classification ID'],
+                ontology=base),
+            MatrixQuestionParser(
+                id_columns=['Annotation: Label'],
+                ontology=base)],
+        'items': [
+            MatrixStatementParser(
+                id_columns=['Question name', 'Item name', 'Item label'],
+                ontology=base)]}
+
+
+def writer_jobs():
+    # the writers of an import in the order they run: (name, CSV file, position of its parser among
+    # those of the file in source_parsers, writer, linked entities -> job whose entities they are)
+    return [
+        ('measures', 'metadata', 0, HarmonisedMeasureXmlWriter, dict()),
+        ('qualities', 'metadata', 1, QualityXmlWriter, dict()),
+        ('components', 'metadata', 2, HarmonisedQuestionarieComponentXmlWriter, {
+            'measures': 'measures',
+            'qualities': 'qualities'}),
+        ('classifications', 'classifications', 0, ClassificationXmlWriter, dict()),
+        ('single choice questions', 'components', 0, QuestionXmlWriter, {
+            'components': 'components',
+            'classifications': 'classifications'}),
+        ('open questions', 'components', 1, QuestionXmlWriter, {
+            'components': 'components',
+            'classifications': 'classifications'}),
+        ('matrix questions', 'components', 2, QuestionXmlWriter, {
+            'components': 'components',
+            'classifications': 'classifications'}),
+        ('statements', 'items', 0, MatrixStatementXmlWriter, {
+            'questions': 'matrix questions'})]
+
+
+def run(base: Ontology, writers: XmlWriterPool, metadata_file: str, component_file: str,
+        classification_file: str, items_file: str, stage=no_stage, shared_instances: bool = False):
+    # stage(name) wraps every read and write step, see Metrics and the benchmark runner
+    parsers = source_parsers(base, shared_instances)
+
+    read = dict()  # CSV file -> entities of each of its parsers
+
+    # the metadata file is read once for measures, qualities and components
+    with stage('read metadata'):
+        read['metadata'] = CsvDispatcher(parsers['metadata']).read(metadata_file)
+
+    with stage('read classifications'):
+        read['classifications'] = CsvDispatcher(parsers['classifications']).read(classification_file)
+
+    # the component file is read once for single choice, open and matrix questions
+    with stage('read questions'):
+        read['components'] = CsvDispatcher(parsers['components']).read(component_file)
+
+    with stage('read statements'):
+        read['items'] = CsvDispatcher(parsers['items']).read(items_file)
+
+    job_entities = {name: read[source][position] for name, source, position, _, _ in writer_jobs()}
+    jobs = [(name, writer_class, job_entities[name], {linked: job_entities[job] for linked, job in links.items()})
+            for name, _, _, writer_class, links in writer_jobs()]
+
+    # every cross-reference is checked before the first axiom is written
+    with stage('resolve references'):
+        references = resolve_all([job[1:] for job in jobs])
+
+    for (name, writer_class, entities, _), resolved in zip(jobs, references):
+        with stage('write ' + name):
+            writers.write(writer_class, entities, resolved)
+
+
+def run_streaming(base: Ontology, writers: XmlWriterPool, metadata_file: str, component_file: str,
+                  classification_file: str, items_file: str, stage=no_stage, shared_instances: bool = False):
+    # Writes the same axioms as run(), in the same order and with the same ids, but every parser
+    # reads its file on its own (so the metadata and component files are read three times) and its
+    # entities are written batch by batch as they are read. Only the IRIs of the entities that are
+    # referred to are kept, by key, and the IRIs of the statements of each matrix question for their
+    # DisjointClasses. Classifications are read whole since their rows are merged by key.
+    # References are checked batch by batch, so a missing one is only reported at the end, after
+    # the rest has been written.
+    iris = {'measures': dict(), 'qualities': dict(), 'components': dict(), 'classifications': dict(),
+            'questions': dict()}
+    unresolved = []
+    question_statements = dict()
+    written = set()
+
+    def write(writer_class, entities: dict, linked: str = None):
+        references = resolve(writer_class, entities, iris, unresolved)
+        if linked is not None:
+            iris[linked].update((key, entity.iri) for key, entity in entities.items())
+        # entities with a missing reference are left out
+        entities = {key: entity for key, entity in entities.items() if None not in references.get(key, ())}
+        writers.write(writer_class, entities, references)
+        writers.drain()
+
+    parsers = source_parsers(base, shared_instances)
+    jobs = [
+        ('measures', parsers['metadata'][0], metadata_file, HarmonisedMeasureXmlWriter, 'measures'),
+        ('qualities', parsers['metadata'][1], metadata_file, QualityXmlWriter, 'qualities'),
+        ('components', parsers['metadata'][2], metadata_file, HarmonisedQuestionarieComponentXmlWriter, 'components'),
+        ('classifications', parsers['classifications'][0], classification_file, ClassificationXmlWriter,
+         'classifications'),
+        ('single choice questions', parsers['components'][0], component_file, QuestionXmlWriter, None),
+        ('open questions', parsers['components'][1], component_file, QuestionXmlWriter, None),
+        ('matrix questions', parsers['components'][2], component_file, QuestionXmlWriter, 'questions'),
+        ('statements', parsers['items'][0], items_file, MatrixStatementBatchXmlWriter, None)]
+
+    for name, parser, file, writer_class, linked in jobs:
+        with stage('stream ' + name):
+            if isinstance(parser, ClassificationParser):
+                write(writer_class, parser.read(file), linked)
+                continue
+
+            for entities in parser.stream(file):
+                if writer_class is MatrixStatementBatchXmlWriter:
+                    [batch_statements, batch_written] = MatrixStatementXmlWriter.group(entities)
+                    for question, statements in batch_statements.items():
+                        question_statements.setdefault(question, []).extend(statements)
+                    written.update(batch_written)
+                write(writer_class, entities, linked)
+
+    with stage('write disjoint statements'):
+        writers.write(DisjointStatementsXmlWriter, MatrixStatementXmlWriter.changed(question_statements, written),
+                      dict())
+
+    if unresolved:
+        raise UnresolvedReferenceError(unresolved)
+
+
+def import_files(base: Ontology, output: str, metadata_file: str, component_file: str, classification_file: str,
+                 items_file: str, axioms=None, merge: bool = False, workers: int = 0, stream: bool = False,
+                 shared_instances: bool = False, metrics_file: str = None, profile_file: str = None):
+    # one import against a base whose index, allocator and manifest are set; axioms is a function
+    # giving the AxiomSet to deduplicate against, or None to write every axiom
+    if merge:
+        [ontology, tree] = base.merge(output)
+    elif output.endswith(RdfStream.extensions):
+        [ontology, tree] = base.open(output, stream=RdfStream)
+    else:
+        [ontology, tree] = base.open(output)
+    writers = XmlWriterPool(ontology, tree, workers=workers)
+
+    stage = no_stage
+    if metrics_file is not None:
+        base.metrics = Metrics(tree, profile=profile_file is not None)
+        stage = base.metrics.stage
+
+    try:
+        if axioms is not None:
+            with stage('load base axioms'):
+                tree.deduplicate(axioms())
+
+        run_ = run_streaming if stream else run
+        run_(base, writers, metadata_file, component_file, classification_file, items_file,
+             stage=stage, shared_instances=shared_instances)
+
+        # with workers > 0 the axioms are only added to the output here
+        with stage('write ontology'):
+            writers.close()
+            base.close()
+    except BaseException:
+        # the output (or with merge, the file merged into) stays as it was
+        tree.rollback()
+        raise
+    if base.metrics is not None:
+        base.metrics.save(metrics_file, profile_file)
+
 
 if __name__ == '__main__':
     base = Ontology()
-    [ontology, tree] = base.get_ontology()
-
-    parser = HarmonisedMeasureParser(id_columns=['Harmonised measure'], ontology=base)
-    writer = HarmonisedMeasureXmlWriter(ontology, tree)
-    measures = parser.read(HARMONISED_COMPONENT_METADATA_FILE)
-    writer.write(measures, dict())
-
-    parser = QualityParser(id_columns=['Quality'], ontology=base)
-    writer = QualityXmlWriter(ontology, tree)
-    qualities = parser.read(HARMONISED_COMPONENT_METADATA_FILE)
-    writer.write(qualities, dict())
-
-    parser = HarmonisedQuestionareComponentParser(id_columns=['ID'], ontology=base)
-    writer = HarmonisedQuestionarieComponentXmlWriter(ontology, tree)
-    components = parser.read(HARMONISED_COMPONENT_METADATA_FILE)
-    writer.write(components, {
-        'measures': measures,
-        'qualities': qualities})
-
-    parser = ClassificationParser(id_columns=['ID'], ontology=base)
-    writer = ClassificationXmlWriter(ontology, tree)
-    classifications = parser.read(CLASSIFICATION_FILE)
-    writer.write(classifications, {
-        'qualities': qualities,
-        'components': components})
-
-    parser = SingleChoiceQuestionParser(
-        id_columns=['Annotation: Label', 'Annotation: hadQuestion', 'Linked classification ID'],
-        ontology=base)
-    writer = QuestionXmlWriter(ontology, tree)
-    questions = parser.read(HARMONISED_COMPONENT_FILE)
-    writer.write(questions, {
-        'components': components,
-        'classifications': classifications})
-
-    parser = OpenQuestionParser(
-        id_columns=['Annotation: Label', 'Annotation: hadQuestion', 'Linked classification ID'],
-        ontology=base)
-    writer = QuestionXmlWriter(ontology, tree)
-    questions = parser.read(HARMONISED_COMPONENT_FILE)
-    writer.write(questions, {
-        'components': components,
-        'classifications': classifications})
-
-    parser = MatrixQuestionParser(
-        id_columns=['Annotation: Label'],
-        ontology=base)
-    writer = QuestionXmlWriter(ontology, tree)
-    questions = parser.read(HARMONISED_COMPONENT_FILE)
-    writer.write(questions, {
-        'components': components,
-        'classifications': classifications})
-
-    parser = MatrixStatementParser(
-        id_columns=['Question name', 'Item name', 'Item label'],
-        ontology=base)
-    writer = MatrixStatementXmlWriter(ontology, tree)
-    statements = parser.read(ITEMS_FILE)
-    writer.write(statements, {
-        'questions': questions})
-
-    base.write(OUTPUT_FILE)
+    base.index = OntologyIndex.load(BASE_ONTOLOGY_FILE)
+    base.allocator = IdAllocator.load(BASE_ONTOLOGY_FILE)
+    base.manifest = ImportManifest.load(MANIFEST_FILE)
+
+    import_files(base, BASE_ONTOLOGY_FILE if MERGE else OUTPUT_FILE,
+                 HARMONISED_COMPONENT_METADATA_FILE, HARMONISED_COMPONENT_FILE, CLASSIFICATION_FILE, ITEMS_FILE,
+                 axioms=(lambda: AxiomSet.load(BASE_ONTOLOGY_FILE)) if DEDUPLICATE else None,
+                 merge=MERGE, workers=WORKERS, stream=STREAM, shared_instances=SHARE_INSTANCES,
+                 metrics_file=METRICS_FILE, profile_file=PROFILE_FILE)
+    base.allocator.save()
+    base.manifest.save()
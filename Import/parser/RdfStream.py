@@ -0,0 +1,532 @@
+import argparse
+import os
+import re
+import xml.etree.ElementTree as ET
+from collections import Counter, namedtuple
+
+from Entities import Ontology
+from OntologyStream import OntologyTree, RenderedAxiom, pending
+from OwlReader import OwlReader
+
+RDF = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+RDFS = 'http://www.w3.org/2000/01/rdf-schema#'
+OWL = 'http://www.w3.org/2002/07/owl#'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+TYPE = RDF + 'type'
+
+# a literal term; datatype and language are None when absent
+Literal = namedtuple('Literal', ['text', 'datatype', 'language'])
+
+# rdf:type of each kind of declared entity
+DECLARATIONS = {'Class': OWL + 'Class', 'ObjectProperty': OWL + 'ObjectProperty',
+                'DataProperty': OWL + 'DatatypeProperty', 'AnnotationProperty': OWL + 'AnnotationProperty',
+                'NamedIndividual': OWL + 'NamedIndividual', 'Datatype': RDFS + 'Datatype'}
+
+# property characteristics are an rdf:type of the property
+CHARACTERISTICS = {'FunctionalObjectProperty': OWL + 'FunctionalProperty',
+                   'FunctionalDataProperty': OWL + 'FunctionalProperty',
+                   'InverseFunctionalObjectProperty': OWL + 'InverseFunctionalProperty',
+                   'ReflexiveObjectProperty': OWL + 'ReflexiveProperty',
+                   'IrreflexiveObjectProperty': OWL + 'IrreflexiveProperty',
+                   'SymmetricObjectProperty': OWL + 'SymmetricProperty',
+                   'AsymmetricObjectProperty': OWL + 'AsymmetricProperty',
+                   'TransitiveObjectProperty': OWL + 'TransitiveProperty'}
+
+# restriction kind -> predicate of its filler
+RESTRICTIONS = {'SomeValuesFrom': OWL + 'someValuesFrom', 'AllValuesFrom': OWL + 'allValuesFrom',
+                'HasValue': OWL + 'hasValue'}
+
+# cardinality kind -> (unqualified, qualified) predicate
+CARDINALITIES = {'Exact': (OWL + 'cardinality', OWL + 'qualifiedCardinality'),
+                 'Min': (OWL + 'minCardinality', OWL + 'minQualifiedCardinality'),
+                 'Max': (OWL + 'maxCardinality', OWL + 'maxQualifiedCardinality')}
+
+# literals of these datatypes are written as plain strings, which RDF 1.1 treats as the same
+PLAIN_DATATYPES = {RDF + 'PlainLiteral', XSD + 'string'}
+
+IRI_ESCAPES = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+STRING_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r'})
+LOCAL_NAME = re.compile(r'[A-Za-z0-9_](?:[A-Za-z0-9_.-]*[A-Za-z0-9_-])?')
+
+
+class UnmappedError(ValueError):
+    pass
+
+
+class RdfMapper:
+    # Maps OWL/XML axioms, read from a file or built by the XmlWriters, to RDF triples following the
+    # OWL 2 mapping to RDF graphs (https://www.w3.org/TR/owl2-mapping-to-rdf/). A term is a full IRI,
+    # a blank node ('_:b1') or a Literal. Axioms the mapping does not cover (HasKey, SWRL rules, ...)
+    # are left out and counted in skipped.
+
+    def __init__(self, reader: OwlReader):
+        self.reader = reader
+        self.ontology = None
+        self.blank_nodes = 0
+        self.count = 0
+        self.skipped = Counter()
+        self.axioms = {
+            'Declaration': self.declaration,
+            'SubClassOf': self.sub_class_of,
+            'EquivalentClasses': self.equivalent_classes,
+            'DisjointClasses': self.disjoint_classes,
+            'ClassAssertion': self.class_assertion,
+            'ObjectPropertyAssertion': self.object_property_assertion,
+            'DataPropertyAssertion': self.data_property_assertion,
+            'AnnotationAssertion': self.annotation_assertion,
+            'SubObjectPropertyOf': self.sub_property_of,
+            'SubDataPropertyOf': self.sub_property_of,
+            'SubAnnotationPropertyOf': self.sub_property_of,
+            'ObjectPropertyDomain': self.domain,
+            'DataPropertyDomain': self.domain,
+            'AnnotationPropertyDomain': self.domain,
+            'ObjectPropertyRange': self.range,
+            'DataPropertyRange': self.range,
+            'AnnotationPropertyRange': self.range,
+            'InverseObjectProperties': self.inverse_object_properties,
+            'EquivalentObjectProperties': self.equivalent_properties,
+            'EquivalentDataProperties': self.equivalent_properties,
+            'DisjointObjectProperties': self.disjoint_properties,
+            'DisjointDataProperties': self.disjoint_properties,
+            'DatatypeDefinition': self.datatype_definition,
+            'SameIndividual': self.same_individual,
+            'DifferentIndividuals': self.different_individuals,
+            'Import': self.import_,
+            'Annotation': self.ontology_annotation}
+        self.axioms.update((name, self.characteristic) for name in CHARACTERISTICS)
+
+    def blank(self):
+        self.blank_nodes += 1
+        return f'_:b{self.blank_nodes}'
+
+    def header(self):
+        # the ontology itself, from the attributes of the root element
+        attributes = self.reader.attributes
+        self.ontology = attributes.get('ontologyIRI') or self.blank()
+        triples = [(self.ontology, TYPE, OWL + 'Ontology')]
+        if attributes.get('versionIRI'):
+            triples.append((self.ontology, OWL + 'versionIRI', attributes['versionIRI']))
+        self.count += len(triples)
+        return triples
+
+    def triples(self, element: ET.Element):
+        # triples of a top-level element; Prefix elements only affect how the file is written
+        name = self.reader.name(element)
+        if name == 'Prefix':
+            return []
+
+        annotations = [child for child in element if self.reader.name(child) == 'Annotation']
+        operands = [child for child in element if self.reader.name(child) != 'Annotation']
+        triples = []
+        try:
+            if name not in self.axioms:
+                raise UnmappedError(name)
+            for main in self.axioms[name](element, operands, annotations, triples):
+                triples.append(main)
+                if annotations:
+                    # an annotated axiom is reified
+                    node = self.blank()
+                    triples += [(node, TYPE, OWL + 'Axiom'), (node, OWL + 'annotatedSource', main[0]),
+                                (node, OWL + 'annotatedProperty', main[1]), (node, OWL + 'annotatedTarget', main[2])]
+                    self.annotate(node, annotations, triples)
+        except (UnmappedError, IndexError):
+            self.skipped[name] += 1
+            return []
+
+        self.count += len(triples)
+        return triples
+
+    # terms
+
+    def iri(self, element: ET.Element):
+        iri = self.reader.iri(element)
+        if iri is None:
+            raise UnmappedError(self.reader.name(element))
+        return iri
+
+    @staticmethod
+    def anonymous(element: ET.Element):
+        # node ids are kept apart from the blank nodes made here ('_:b...')
+        return '_:n' + re.sub(r'[^A-Za-z0-9]', '', element.get('nodeID'))
+
+    def literal(self, element: ET.Element):
+        if self.reader.name(element) != 'Literal':
+            raise UnmappedError(self.reader.name(element))
+        datatype = element.get('datatypeIRI')
+        if datatype is not None:
+            datatype = self.reader.expand(datatype)
+        # the writers set xml:lang without its namespace
+        language = element.get(XML_LANG) or element.get('xml:lang') or None
+        return Literal(element.text or '', None if datatype in PLAIN_DATATYPES else datatype, language)
+
+    def individual(self, element: ET.Element):
+        if self.reader.name(element) == 'AnonymousIndividual':
+            return self.anonymous(element)
+        return self.iri(element)
+
+    def annotation_value(self, element: ET.Element):
+        # annotation subjects and values are IRIs, anonymous individuals or (values only) literals
+        name = self.reader.name(element)
+        if name == 'Literal':
+            return self.literal(element)
+        if name == 'AnonymousIndividual':
+            return self.anonymous(element)
+        return self.iri(element)
+
+    def property(self, element: ET.Element, triples: list):
+        if self.reader.name(element) == 'ObjectInverseOf':
+            node = self.blank()
+            triples.append((node, OWL + 'inverseOf', self.iri(element[0])))
+            return node
+        return self.iri(element)
+
+    def collection(self, terms: list, triples: list):
+        # an rdf:List of the terms
+        head = RDF + 'nil'
+        for term in reversed(terms):
+            node = self.blank()
+            triples += [(node, RDF + 'first', term), (node, RDF + 'rest', head)]
+            head = node
+        return head
+
+    def class_expression(self, element: ET.Element, triples: list):
+        name = self.reader.name(element)
+        if name == 'Class':
+            return self.iri(element)
+
+        node = self.blank()
+        operands = list(element)
+        if name in ('ObjectIntersectionOf', 'ObjectUnionOf'):
+            predicate = OWL + ('intersectionOf' if name == 'ObjectIntersectionOf' else 'unionOf')
+            members = [self.class_expression(operand, triples) for operand in operands]
+            triples += [(node, TYPE, OWL + 'Class'), (node, predicate, self.collection(members, triples))]
+        elif name == 'ObjectComplementOf':
+            triples += [(node, TYPE, OWL + 'Class'),
+                        (node, OWL + 'complementOf', self.class_expression(operands[0], triples))]
+        elif name == 'ObjectOneOf':
+            members = [self.individual(operand) for operand in operands]
+            triples += [(node, TYPE, OWL + 'Class'), (node, OWL + 'oneOf', self.collection(members, triples))]
+        elif name.startswith(('Object', 'Data')):
+            self.restriction(name, element, operands, node, triples)
+        else:
+            raise UnmappedError(name)
+        return node
+
+    def restriction(self, name: str, element: ET.Element, operands: list, node: str, triples: list):
+        data = name.startswith('Data')
+        kind = name[len('Data' if data else 'Object'):]
+        # n-ary data restrictions (more than one data property) have no single onProperty
+        if data and len(operands) > 2:
+            raise UnmappedError(name)
+
+        triples += [(node, TYPE, OWL + 'Restriction'), (node, OWL + 'onProperty', self.property(operands[0], triples))]
+        if kind == 'HasValue':
+            value = self.literal(operands[1]) if data else self.individual(operands[1])
+            triples.append((node, RESTRICTIONS[kind], value))
+        elif kind in RESTRICTIONS:
+            filler = self.data_range(operands[1], triples) if data else self.class_expression(operands[1], triples)
+            triples.append((node, RESTRICTIONS[kind], filler))
+        elif kind == 'HasSelf':
+            triples.append((node, OWL + 'hasSelf', Literal('true', XSD + 'boolean', None)))
+        elif kind.endswith('Cardinality') and kind[:-len('Cardinality')] in CARDINALITIES:
+            [unqualified, qualified] = CARDINALITIES[kind[:-len('Cardinality')]]
+            cardinality = Literal(element.get('cardinality'), XSD + 'nonNegativeInteger', None)
+            if len(operands) > 1:
+                filler = self.data_range(operands[1], triples) if data else self.class_expression(operands[1], triples)
+                triples += [(node, qualified, cardinality),
+                            (node, OWL + ('onDataRange' if data else 'onClass'), filler)]
+            else:
+                triples.append((node, unqualified, cardinality))
+        else:
+            raise UnmappedError(name)
+
+    def data_range(self, element: ET.Element, triples: list):
+        name = self.reader.name(element)
+        if name == 'Datatype':
+            return self.iri(element)
+
+        node = self.blank()
+        operands = list(element)
+        if name in ('DataIntersectionOf', 'DataUnionOf'):
+            predicate = OWL + ('intersectionOf' if name == 'DataIntersectionOf' else 'unionOf')
+            members = [self.data_range(operand, triples) for operand in operands]
+            triples += [(node, TYPE, RDFS + 'Datatype'), (node, predicate, self.collection(members, triples))]
+        elif name == 'DataComplementOf':
+            triples += [(node, TYPE, RDFS + 'Datatype'),
+                        (node, OWL + 'datatypeComplementOf', self.data_range(operands[0], triples))]
+        elif name == 'DataOneOf':
+            members = [self.literal(operand) for operand in operands]
+            triples += [(node, TYPE, RDFS + 'Datatype'), (node, OWL + 'oneOf', self.collection(members, triples))]
+        else:
+            raise UnmappedError(name)
+        return node
+
+    def annotate(self, node: str, annotations: list, triples: list):
+        for annotation in annotations:
+            operands = [child for child in annotation if self.reader.name(child) != 'Annotation']
+            triples.append((node, self.iri(operands[0]), self.annotation_value(operands[1])))
+
+    def all_different(self, kind: str, members: list, annotations: list, triples: list):
+        # n-ary disjointness is a blank node with its members; axiom annotations go on that node
+        node = self.blank()
+        triples += [(node, TYPE, OWL + kind), (node, OWL + 'members', self.collection(members, triples))]
+        self.annotate(node, annotations, triples)
+        return []
+
+    # axioms; each returns the triples that stand for the axiom itself, other triples (restrictions,
+    # lists) are added to triples
+
+    def declaration(self, element, operands, annotations, triples):
+        name = self.reader.name(operands[0])
+        if name not in DECLARATIONS:
+            raise UnmappedError(name)
+        return [(self.iri(operands[0]), TYPE, DECLARATIONS[name])]
+
+    def sub_class_of(self, element, operands, annotations, triples):
+        return [(self.class_expression(operands[0], triples), RDFS + 'subClassOf',
+                 self.class_expression(operands[1], triples))]
+
+    def equivalent_classes(self, element, operands, annotations, triples):
+        first = self.class_expression(operands[0], triples)
+        return [(first, OWL + 'equivalentClass', self.class_expression(operand, triples)) for operand in operands[1:]]
+
+    def disjoint_classes(self, element, operands, annotations, triples):
+        members = [self.class_expression(operand, triples) for operand in operands]
+        if len(members) == 2:
+            return [(members[0], OWL + 'disjointWith', members[1])]
+        return self.all_different('AllDisjointClasses', members, annotations, triples)
+
+    def class_assertion(self, element, operands, annotations, triples):
+        return [(self.individual(operands[1]), TYPE, self.class_expression(operands[0], triples))]
+
+    def object_property_assertion(self, element, operands, annotations, triples):
+        [property_, subject, object_] = operands
+        if self.reader.name(property_) == 'ObjectInverseOf':
+            [property_, subject, object_] = [property_[0], object_, subject]
+        return [(self.individual(subject), self.iri(property_), self.individual(object_))]
+
+    def data_property_assertion(self, element, operands, annotations, triples):
+        return [(self.individual(operands[1]), self.iri(operands[0]), self.literal(operands[2]))]
+
+    def annotation_assertion(self, element, operands, annotations, triples):
+        return [(self.annotation_value(operands[1]), self.iri(operands[0]), self.annotation_value(operands[2]))]
+
+    def sub_property_of(self, element, operands, annotations, triples):
+        if self.reader.name(operands[0]) == 'ObjectPropertyChain':
+            chain = [self.property(operand, triples) for operand in operands[0]]
+            return [(self.property(operands[1], triples), OWL + 'propertyChainAxiom', self.collection(chain, triples))]
+        return [(self.property(operands[0], triples), RDFS + 'subPropertyOf', self.property(operands[1], triples))]
+
+    def domain_or_range(self, element, operands, triples):
+        name = self.reader.name(element)
+        if name.startswith('Object'):
+            value = self.class_expression(operands[1], triples)
+        elif name.startswith('Data') and name.endswith('Range'):
+            value = self.data_range(operands[1], triples)
+        elif name.startswith('Data'):
+            value = self.class_expression(operands[1], triples)
+        else:
+            value = self.iri(operands[1])
+        return self.property(operands[0], triples), value
+
+    def domain(self, element, operands, annotations, triples):
+        [property_, value] = self.domain_or_range(element, operands, triples)
+        return [(property_, RDFS + 'domain', value)]
+
+    def range(self, element, operands, annotations, triples):
+        [property_, value] = self.domain_or_range(element, operands, triples)
+        return [(property_, RDFS + 'range', value)]
+
+    def inverse_object_properties(self, element, operands, annotations, triples):
+        return [(self.property(operands[0], triples), OWL + 'inverseOf', self.property(operands[1], triples))]
+
+    def equivalent_properties(self, element, operands, annotations, triples):
+        first = self.property(operands[0], triples)
+        return [(first, OWL + 'equivalentProperty', self.property(operand, triples)) for operand in operands[1:]]
+
+    def disjoint_properties(self, element, operands, annotations, triples):
+        members = [self.property(operand, triples) for operand in operands]
+        if len(members) == 2:
+            return [(members[0], OWL + 'propertyDisjointWith', members[1])]
+        return self.all_different('AllDisjointProperties', members, annotations, triples)
+
+    def characteristic(self, element, operands, annotations, triples):
+        return [(self.property(operands[0], triples), TYPE, CHARACTERISTICS[self.reader.name(element)])]
+
+    def datatype_definition(self, element, operands, annotations, triples):
+        return [(self.iri(operands[0]), OWL + 'equivalentClass', self.data_range(operands[1], triples))]
+
+    def same_individual(self, element, operands, annotations, triples):
+        first = self.individual(operands[0])
+        return [(first, OWL + 'sameAs', self.individual(operand)) for operand in operands[1:]]
+
+    def different_individuals(self, element, operands, annotations, triples):
+        members = [self.individual(operand) for operand in operands]
+        if len(members) == 2:
+            return [(members[0], OWL + 'differentFrom', members[1])]
+        return self.all_different('AllDifferent', members, annotations, triples)
+
+    def import_(self, element, operands, annotations, triples):
+        return [(self.ontology, OWL + 'imports', self.reader.expand(element.text.strip()))]
+
+    def ontology_annotation(self, element, operands, annotations, triples):
+        return [(self.ontology, self.iri(operands[0]), self.annotation_value(operands[1]))]
+
+
+class NTriples:
+    # one triple per line, every IRI in full
+    def __init__(self, file):
+        self.file = file
+
+    def iri(self, iri: str):
+        return '<' + IRI_ESCAPES.sub(lambda match: f'\\u{ord(match.group()):04X}', iri) + '>'
+
+    def term(self, term):
+        if isinstance(term, Literal):
+            text = '"' + term.text.translate(STRING_ESCAPES) + '"'
+            if term.language is not None:
+                return f'{text}@{term.language}'
+            if term.datatype is not None:
+                return f'{text}^^{self.iri(term.datatype)}'
+            return text
+        if term.startswith('_:'):
+            return term
+        return self.iri(term)
+
+    def start(self):
+        pass
+
+    def write(self, triples: list):
+        self.file.write(''.join(f'{self.term(subject)} {self.term(predicate)} {self.term(object_)} .\n'
+                                for subject, predicate, object_ in triples).encode('utf-8'))
+
+    def end(self):
+        pass
+
+
+class Turtle(NTriples):
+    # IRIs in the namespaces of Ontology.PREFIXES are written as prefixed names, and consecutive
+    # triples about the same subject share it
+    def __init__(self, file, prefixes: dict = None):
+        super().__init__(file)
+        self.prefixes = dict()
+        for name, namespace in (prefixes or Ontology.PREFIXES).items():
+            self.prefixes.setdefault(namespace, '' if name == 'base' else name)
+        self.subject = None
+
+    def iri(self, iri: str):
+        split = max(iri.rfind('#'), iri.rfind('/')) + 1
+        prefix = self.prefixes.get(iri[:split])
+        if prefix is not None and LOCAL_NAME.fullmatch(iri, split):
+            return f'{prefix}:{iri[split:]}'
+        return super().iri(iri)
+
+    def start(self):
+        self.file.write(''.join(f'@prefix {prefix}: {NTriples.iri(self, namespace)} .\n'
+                                for namespace, prefix in self.prefixes.items()).encode('utf-8') + b'\n')
+
+    def write(self, triples: list):
+        pieces = []
+        for subject, predicate, object_ in triples:
+            predicate = 'a' if predicate == TYPE else self.term(predicate)
+            if subject == self.subject:
+                pieces.append(f' ;\n    {predicate} {self.term(object_)}')
+                continue
+            if self.subject is not None:
+                pieces.append(' .\n')
+            pieces.append(f'{self.term(subject)} {predicate} {self.term(object_)}')
+            self.subject = subject
+        self.file.write(''.join(pieces).encode('utf-8'))
+
+    def end(self):
+        if self.subject is not None:
+            self.file.write(b' .\n')
+
+
+def serializer(file, name: str):
+    # Turtle for .ttl files, N-Triples otherwise
+    return Turtle(file) if name.endswith('.ttl') else NTriples(file)
+
+
+class RdfStream(OntologyTree):
+    # Writes the axioms the XmlWriters add as RDF instead of OWL/XML, as they are flushed: N-Triples,
+    # or Turtle when the file name ends with .ttl. Opened with Ontology.open(file, stream=RdfStream).
+    extensions = ('.nt', '.ttl')
+
+    def __init__(self, element: ET.Element, file: str):
+        super().__init__(element)
+        self.target = file
+        self.file = open(pending(file), 'wb')
+        reader = OwlReader()
+        reader.attributes = dict(element.attrib)
+        self.mapper = RdfMapper(reader)
+        self.serializer = serializer(self.file, file)
+        self.serializer.start()
+        self.serializer.write(self.mapper.header())
+
+    def tell(self):
+        return self.size if self.file.closed else self.file.tell()
+
+    def write_elements(self, elements):
+        if self.counts is not None:
+            self.counts.update(element.tag for element in elements)
+        for element in elements:
+            if isinstance(element, RenderedAxiom):
+                element = element.element()
+            self.serializer.write(self.mapper.triples(element))
+
+    def flush(self):
+        root = self.getroot()
+        self.write_elements(self.new_axioms(root))
+        del root[:]
+
+    def write_fragment(self, fragment, counts: Counter = None):
+        # the axioms serialized by the workers (see OntologyFragment) are parsed back
+        self.flush()
+        if isinstance(fragment, list):
+            fragment = b''.join(data for key, tag, data in fragment if self.axioms.add_key(key, tag))
+        self.write_elements(list(ET.fromstring(b'<Ontology>' + fragment + b'</Ontology>')))
+
+    def close(self):
+        self.flush()
+        self.serializer.end()
+        self.size = self.file.tell()
+        self.file.close()
+        os.replace(pending(self.target), self.target)
+
+    def rollback(self):
+        self.file.close()
+        if os.path.exists(pending(self.target)):
+            os.remove(pending(self.target))
+
+
+def convert(owl_file: str, rdf_file: str):
+    # streams an OWL/XML file to N-Triples or Turtle one axiom at a time and returns the RdfMapper,
+    # which counted the triples written and the axioms left out
+    reader = OwlReader(owl_file)
+    mapper = RdfMapper(reader)
+    with open(rdf_file, 'wb') as f:
+        output = serializer(f, rdf_file)
+        output.start()
+        for element in reader.axioms():
+            if mapper.ontology is None:
+                # the root element is read together with the first axiom
+                output.write(mapper.header())
+            output.write(mapper.triples(element))
+        output.end()
+
+    return mapper
+
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description='Convert an OWL/XML file to N-Triples (.nt) or Turtle (.ttl).')
+    arguments.add_argument('owl')
+    arguments.add_argument('rdf')
+    args = arguments.parse_args()
+
+    mapper = convert(args.owl, args.rdf)
+    print(f'{mapper.count} triples written')
+    for name, count in mapper.skipped.most_common():
+        print(f'  {count} {name} axioms have no RDF mapping and were left out')
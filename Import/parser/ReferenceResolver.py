@@ -0,0 +1,48 @@
+class UnresolvedReferenceError(LookupError):
+    def __init__(self, unresolved: list):
+        super().__init__(f'{len(unresolved)} unresolved reference(s):\n' + '\n'.join(unresolved))
+        self.unresolved = unresolved
+
+
+def resolve(writer_class, entities: dict, linked_entities: dict, unresolved: list):
+    # Looks up the IRIs of the entities referenced by each entity the writer will write,
+    # in the order of writer_class.references, and returns them as entity key -> tuple of IRIs.
+    # References that cannot be found are appended to unresolved instead of raising.
+    references = dict()
+    if not writer_class.references:
+        return references
+
+    # the same value is usually referenced by many entities, so each one is looked up once
+    iris = {name: dict() for _, name in writer_class.references}
+    for key, entity in entities.items():
+        if entity.added:
+            continue
+
+        resolved = []
+        for attribute, name in writer_class.references:
+            value = getattr(entity, attribute)
+            iri = iris[name].get(value)
+            if iri is None:
+                target = linked_entities[name].get(value)
+                if target is None:
+                    unresolved.append(f'{type(entity).__name__} {entity.label!r}: '
+                                      f'{attribute} {value!r} is not one of the {name}')
+                else:
+                    # streamed imports only keep the IRIs of the linked entities
+                    iri = iris[name][value] = target if isinstance(target, str) else target.iri
+            resolved.append(iri)
+        references[key] = tuple(resolved)
+
+    return references
+
+
+def resolve_all(jobs: list):
+    # resolves the references of every (writer class, entities, linked entities) job before
+    # anything is written, and reports all the missing ones together
+    unresolved = []
+    references = [resolve(writer_class, entities, linked_entities, unresolved)
+                  for writer_class, entities, linked_entities in jobs]
+    if unresolved:
+        raise UnresolvedReferenceError(unresolved)
+
+    return references
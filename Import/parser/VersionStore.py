@@ -0,0 +1,342 @@
+import argparse
+import glob
+import json
+import lzma
+import os
+import struct
+import xml.etree.ElementTree as ET
+import zlib
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate
+
+from OntologyDiff import OntologyDiff, IGNORED
+from OntologySnapshot import OntologySnapshot
+from OwlReader import OwlReader, OWL
+
+MAGIC = b'COMFOCUS-VERSIONS-1'
+HASH_SIZE = 16
+# axioms are compressed together in blocks of about this many bytes
+BLOCK_SIZE = 256 * 1024
+
+CODECS = {'zlib': (lambda data: zlib.compress(data, 9), zlib.decompress),
+          'lzma': (lambda data: lzma.compress(data, preset=6), lzma.decompress)}
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+FOLDERS = [os.path.join(ROOT, 'Old versions'), os.path.join(ROOT, 'Current ontology version')]
+STORE = os.path.join(ROOT, 'Version store')
+
+
+class VersionStore:
+    # Keeps versions of the ontology as lists of references to their axioms. Every distinct axiom
+    # (by its canonical hash, see OntologyDiff) is stored once, as OWL/XML with full IRIs, in
+    # compressed blocks appended to axioms.pack; a new version only adds the axioms that no earlier
+    # version had. store.index holds the blocks, the sizes of the axioms and, per version, its root
+    # attributes, prefixes and axiom numbers. It is replaced as a whole after the pack was written,
+    # so a failed add() leaves the store as it was. The hashes are only needed to add versions and
+    # are cached in axioms.hashes, which can be rebuilt from the pack.
+
+    def __init__(self, folder: str, codec: str = 'zlib'):
+        self.folder = folder
+        self.codec = codec
+        self.pack_size = 0
+        self.offsets = array('Q')  # block -> offset in the pack
+        self.firsts = array('I')  # block -> number of its first axiom
+        self.hashes = None  # axiom number -> hash, see load_hashes()
+        self.lengths = array('I')  # axiom number -> size of its OWL/XML
+        self.starts = array('I')  # axiom number -> offset in its block
+        self.numbers = dict()  # hash -> axiom number
+        self.versions = dict()  # name -> {'source', 'sha256', 'attributes', 'prefixes', 'axioms'}
+        self.refs = dict()  # name -> axiom numbers
+        self.block = lru_cache(maxsize=64)(self.read_block)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.folder, 'store.index')
+
+    @property
+    def pack_path(self):
+        return os.path.join(self.folder, 'axioms.pack')
+
+    @property
+    def hashes_path(self):
+        return os.path.join(self.folder, 'axioms.hashes')
+
+    @classmethod
+    def open(cls, folder: str, codec: str = 'zlib'):
+        # the codec only applies to a new store, an existing one keeps its own
+        store = cls(folder, codec)
+        if os.path.exists(store.index_path):
+            store.read_index()
+        return store
+
+    def read_index(self):
+        with open(self.index_path, 'rb') as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{self.index_path} is not a version store index')
+        offset = len(MAGIC)
+
+        codec, self.pack_size, block_count, axiom_count, version_count = struct.unpack_from('<BQIII', data, offset)
+        offset += struct.calcsize('<BQIII')
+        self.codec = list(CODECS)[codec]
+
+        for values, count in ((self.offsets, block_count), (self.firsts, block_count)):
+            values.frombytes(data[offset:offset + count * values.itemsize])
+            offset += count * values.itemsize
+        [size] = struct.unpack_from('<I', data, offset)
+        self.lengths.frombytes(zlib.decompress(data[offset + 4:offset + 4 + size]))
+        offset += 4 + size
+        self.index_starts()
+
+        for _ in range(version_count):
+            header_size, refs_size = struct.unpack_from('<II', data, offset)
+            offset += 8
+            version = json.loads(data[offset:offset + header_size])
+            offset += header_size
+            self.versions[version['name']] = version
+            self.refs[version['name']] = self.decode_refs(data[offset:offset + refs_size])
+            offset += refs_size
+
+    @staticmethod
+    def encode_refs(refs: array):
+        # the axioms of a version mostly come in runs of consecutive numbers, so the differences
+        # between neighbours compress far better than the numbers
+        deltas = array('i', (number - previous for previous, number in zip([0] + list(refs), refs)))
+        return zlib.compress(deltas.tobytes(), 9)
+
+    @staticmethod
+    def decode_refs(data: bytes):
+        deltas = array('i')
+        deltas.frombytes(zlib.decompress(data))
+        return array('I', accumulate(deltas))
+
+    def load_hashes(self):
+        # hashes of the axioms from axioms.hashes, and those missing there from the pack
+        hashes = []
+        if os.path.exists(self.hashes_path):
+            with open(self.hashes_path, 'rb') as f:
+                data = f.read(len(self.lengths) * HASH_SIZE)
+            hashes = [data[index:index + HASH_SIZE] for index in range(0, len(data), HASH_SIZE)]
+
+        if len(hashes) < len(self.lengths):
+            # stored axioms have full IRIs, so they hash the same with any base
+            reader = OwlReader()
+            hashes.extend(OntologyDiff.hash(OntologyDiff.canonical(reader, ET.fromstring(self.axiom(number))))
+                          for number in range(len(hashes), len(self.lengths)))
+            self.save_hashes(hashes)
+
+        self.hashes = hashes
+        self.numbers = {hash_: number for number, hash_ in enumerate(hashes)}
+
+    def save_hashes(self, hashes: list):
+        try:
+            with open(self.hashes_path, 'wb') as f:
+                f.write(b''.join(hashes))
+        except OSError:
+            pass
+
+    def write_index(self):
+        header = struct.pack('<BQIII', list(CODECS).index(self.codec), self.pack_size, len(self.offsets),
+                             len(self.lengths), len(self.versions))
+        lengths = zlib.compress(self.lengths.tobytes(), 9)
+        temporary = self.index_path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(MAGIC + header)
+            f.write(self.offsets.tobytes())
+            f.write(self.firsts.tobytes())
+            f.write(struct.pack('<I', len(lengths)) + lengths)
+            for name, version in self.versions.items():
+                data = json.dumps(version, ensure_ascii=False).encode('utf-8')
+                refs = self.encode_refs(self.refs[name])
+                f.write(struct.pack('<II', len(data), len(refs)))
+                f.write(data)
+                f.write(refs)
+        os.replace(temporary, self.index_path)
+
+    def index_starts(self):
+        self.starts = array('I', bytes(4 * len(self.lengths)))
+        for block, first in enumerate(self.firsts):
+            end = self.firsts[block + 1] if block + 1 < len(self.firsts) else len(self.lengths)
+            start = 0
+            for number in range(first, end):
+                self.starts[number] = start
+                start += self.lengths[number]
+
+    @staticmethod
+    def normalize(reader: OwlReader, element: ET.Element):
+        # a copy of an axiom without namespaces and with full IRIs, so it reads the same whatever
+        # the base and prefixes of the version it is written to
+        name = reader.name(element)
+        attributes = {key: value for key, value in element.attrib.items() if key not in ('IRI', 'abbreviatedIRI')}
+        if name in ('IRI', 'AbbreviatedIRI'):
+            copy = ET.Element('IRI', attributes)
+            copy.text = reader.iri(element)
+            return copy
+
+        if 'IRI' in element.attrib or 'abbreviatedIRI' in element.attrib:
+            attributes = {'IRI': reader.iri(element), **attributes}
+        copy = ET.Element(name, attributes)
+        copy.text = element.text if not len(element) else None
+        copy.extend(VersionStore.normalize(reader, child) for child in element)
+        return copy
+
+    def add(self, file: str, name: str = None):
+        # stores the version in file under name (by default its file name); returns False when
+        # the same file is already stored under that name
+        name = name or os.path.basename(file)
+        sha256 = OntologySnapshot.digest(file).hex()
+        if name in self.versions:
+            if self.versions[name]['sha256'] == sha256:
+                return False
+            raise ValueError(f'a different version is already stored as {name!r}')
+
+        os.makedirs(self.folder, exist_ok=True)
+        if self.hashes is None:
+            self.load_hashes()
+        compress = CODECS[self.codec][0]
+        reader = OwlReader(file)
+        prefixes = []
+        refs = array('I')
+        hashes = dict()  # hash -> number of the axioms new in this version
+        lengths = array('I')
+        offsets = array('Q')
+        firsts = array('I')
+        pending = []
+        with open(self.pack_path, 'ab') as pack:
+            # leaves out the blocks of an add() that did not finish
+            pack.truncate(self.pack_size)
+            pack.seek(self.pack_size)
+
+            def flush():
+                offsets.append(pack.tell())
+                firsts.append(len(self.hashes) + len(hashes) - len(pending))
+                pack.write(compress(b''.join(pending)))
+                pending.clear()
+
+            size = 0
+            for element in reader.axioms():
+                if element.tag in IGNORED:
+                    prefixes.append([element.get('name', ''), element.get('IRI')])
+                    continue
+
+                hash_ = OntologyDiff.hash(OntologyDiff.canonical(reader, element))
+                number = self.numbers.get(hash_)
+                if number is None:
+                    number = hashes.get(hash_)
+                if number is None:
+                    number = hashes[hash_] = len(self.hashes) + len(hashes)
+                    data = ET.tostring(self.normalize(reader, element), encoding='utf-8')
+                    pending.append(data)
+                    lengths.append(len(data))
+                    size += len(data)
+                    if size >= BLOCK_SIZE:
+                        flush()
+                        size = 0
+                refs.append(number)
+
+            if pending:
+                flush()
+            pack.flush()
+            os.fsync(pack.fileno())
+            pack_size = pack.tell()
+
+        self.pack_size = pack_size
+        self.offsets.extend(offsets)
+        self.firsts.extend(firsts)
+        self.lengths.extend(lengths)
+        self.hashes.extend(hashes)
+        self.numbers.update(hashes)
+        self.index_starts()
+        self.save_hashes(self.hashes)
+        self.versions[name] = {'name': name, 'source': os.path.basename(file), 'sha256': sha256,
+                               'attributes': reader.attributes, 'prefixes': prefixes,
+                               'axioms': len(refs), 'new': len(hashes)}
+        self.refs[name] = refs
+        self.write_index()
+        return True
+
+    def read_block(self, block: int):
+        end = self.offsets[block + 1] if block + 1 < len(self.offsets) else self.pack_size
+        with open(self.pack_path, 'rb') as f:
+            f.seek(self.offsets[block])
+            return CODECS[self.codec][1](f.read(end - self.offsets[block]))
+
+    def axiom(self, number: int):
+        # OWL/XML of an axiom
+        data = self.block(bisect_right(self.firsts, number) - 1)
+        start = self.starts[number]
+        return data[start:start + self.lengths[number]]
+
+    def stream(self, name: str):
+        # the version as OWL/XML, piece by piece; its axioms are in their original order, with full IRIs
+        version = self.versions[name]
+        root = ET.Element('Ontology', {'xmlns': OWL[1:-1], **version['attributes']})
+        yield b'<?xml version="1.0"?>\n'
+        yield ET.tostring(root)[:-len(b' />')] + b'>'
+        for prefix, iri in version['prefixes']:
+            yield b'\n    ' + ET.tostring(ET.Element('Prefix', {'name': prefix, 'IRI': iri}))
+        for number in self.refs[name]:
+            yield b'\n    ' + self.axiom(number)
+        yield b'\n</Ontology>\n'
+
+    def write(self, name: str, file: str):
+        with open(file, 'wb') as f:
+            f.writelines(self.stream(name))
+
+    def diff(self, old: str, new: str):
+        # numbers of the axioms removed and added between two versions, without reading either
+        old_numbers = set(self.refs[old])
+        new_numbers = set(self.refs[new])
+        return sorted(old_numbers - new_numbers), sorted(new_numbers - old_numbers)
+
+    def containing(self, number: int):
+        # names of the versions that have an axiom
+        return [name for name, refs in self.refs.items() if number in refs]
+
+    def size(self):
+        return self.pack_size + os.path.getsize(self.index_path)
+
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description='Store ontology versions as references to their distinct axioms.')
+    arguments.add_argument('--store', default=STORE, help='folder of the version store')
+    commands = arguments.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='add .owl files (by default those of the version folders)')
+    add.add_argument('files', nargs='*')
+    add.add_argument('--codec', choices=list(CODECS), default='zlib', help='compression of a new store')
+    commands.add_parser('list', help='list the stored versions')
+    extract = commands.add_parser('extract', help='write a stored version as OWL/XML')
+    extract.add_argument('name')
+    extract.add_argument('file')
+    diff = commands.add_parser('diff', help='print the axioms removed and added between two versions')
+    diff.add_argument('old')
+    diff.add_argument('new')
+    args = arguments.parse_args()
+
+    store = VersionStore.open(args.store, getattr(args, 'codec', 'zlib'))
+    if args.command == 'add':
+        files = args.files or [file for folder in FOLDERS for file in sorted(glob.glob(os.path.join(folder, '*.owl')))]
+        for file in files:
+            if store.add(file):
+                version = store.versions[os.path.basename(file)]
+                print(f'added: {file} ({version["axioms"]} axioms, {version["new"]} new)')
+            else:
+                print(f'up to date: {file}')
+        print(f'{len(store.versions)} versions, {len(store.lengths)} distinct axioms, {store.size()} bytes')
+
+    elif args.command == 'list':
+        for name, version in store.versions.items():
+            print(f'{name}: {version["axioms"]} axioms, {version["new"]} new')
+
+    elif args.command == 'extract':
+        store.write(args.name, args.file)
+
+    elif args.command == 'diff':
+        [removed, added] = store.diff(args.old, args.new)
+        for number in removed:
+            print(f'- {store.axiom(number).decode("utf-8")}')
+        for number in added:
+            print(f'+ {store.axiom(number).decode("utf-8")}')
+        print(f'{len(added)} axioms added, {len(removed)} removed')
@@ -0,0 +1,167 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+import traceback
+
+from BatchImport import WarmBase, load_jobs
+from CsvParser import CsvDispatcher
+from Entities import start_run
+from IdAllocator import IdAllocator
+from ImportManifest import ImportManifest
+from OntologyStream import OntologyStream
+from Pipeline import source_parsers, writer_jobs
+from RdfStream import RdfStream
+from ReferenceResolver import resolve_all
+from XmlWriter import write_fragment
+
+INTERVAL = 0.25
+
+
+class StableIris(ImportManifest):
+    # Remembers the IRI of every row like ImportManifest, but never reports a row as unchanged:
+    # every regeneration writes the whole output, with the rows keeping the IRIs they had.
+    def get(self, namespace: str, key: str):
+        entry = super().get(namespace, key)
+        return None if entry is None else [None, *entry[1:]]
+
+
+class ImportWatcher:
+    # Keeps the base ontology and the entities of the last import in memory, polls the CSVs
+    # (modification time first, then their content hash) and, when one changed, reads that file
+    # again and writes the output again. Only the writer jobs whose entities or references changed
+    # are run again; the others are written from the axioms they serialized before.
+
+    def __init__(self, warm: WarmBase, job: dict):
+        self.warm = warm
+        self.job = job
+        self.base = warm.ontology()
+        self.base.manifest = StableIris.load(job['manifest']) if job['manifest'] else StableIris()
+        self.files = {source: job[source] for source in ('metadata', 'classifications', 'components', 'items')}
+        self.seen = dict()  # CSV file -> (mtime_ns, size) when it was last polled
+        self.digests = dict()  # CSV file -> sha256 of the content that was imported
+        self.entities = dict()  # job -> entities
+        self.references = dict()  # job -> references
+        self.fragments = dict()  # job -> serialized axioms
+        self.unread = set(self.files)  # CSVs that changed and were not read yet
+        self.unwritten = set()  # CSVs read since the output was last written
+        self.saved = None  # high-water mark of the ids when the manifest was last saved
+
+    @staticmethod
+    def digest(file: str):
+        with open(file, 'rb') as f:
+            return hashlib.file_digest(f, 'sha256').digest()
+
+    def poll(self):
+        # the CSVs whose content changed since they were imported, once they are no longer being
+        # written (their size and modification time are the same as at the previous poll)
+        changed = []
+        for source, file in self.files.items():
+            try:
+                stat = os.stat(file)
+            except FileNotFoundError:
+                # some editors save by replacing the file
+                continue
+            seen = (stat.st_mtime_ns, stat.st_size)
+            settled = self.seen.get(file, seen) == seen
+            self.seen[file] = seen
+            if settled:
+                digest = self.digest(file)
+                if self.digests.get(file) != digest:
+                    self.digests[file] = digest
+                    changed.append(source)
+        return changed
+
+    def read(self, source: str):
+        parsers = source_parsers(self.base, self.job['share_instances'])[source]
+        entities = CsvDispatcher(parsers).read(self.files[source])
+        for name, source_, position, _, _ in writer_jobs():
+            if source_ == source:
+                self.entities[name] = entities[position]
+
+    def regenerate(self, sources: list, date: str = None):
+        # reads the changed CSVs, runs the writers affected and writes the output; returns the
+        # names of the jobs that were run again. When it fails, what was read is kept and the
+        # rest is done with the next change. Every regeneration is a run of its own with its own
+        # dc:date (see start_run); the jobs that are not run again keep the axioms they were
+        # written with, and so their date.
+        start_run(date)
+        self.unread.update(sources)
+        for source in self.files:
+            if source in self.unread:
+                self.read(source)
+                self.unread.discard(source)
+                self.unwritten.add(source)
+
+        references = resolve_all([(writer_class, self.entities[name],
+                                   {linked: self.entities[job] for linked, job in links.items()})
+                                  for name, _, _, writer_class, links in writer_jobs()])
+        rerun = []
+        for (name, source, _, writer_class, _), resolved in zip(writer_jobs(), references):
+            if source in self.unwritten or self.references.get(name) != resolved:
+                self.fragments[name] = write_fragment(writer_class, self.entities[name], resolved,
+                                                      self.job['deduplicate'])
+                self.references[name] = resolved
+                rerun.append(name)
+
+        self.write()
+        self.unwritten.clear()
+        # the manifest only changes when new rows got an IRI
+        if self.warm.allocator.high_water_mark != self.saved:
+            self.warm.allocator.save()
+            self.base.manifest.save()
+            self.saved = self.warm.allocator.high_water_mark
+        return rerun
+
+    def write(self):
+        # the stream replaces the output once it is complete; it takes the prefixes out of the
+        # ontology element it writes, so every file gets an ontology of its own
+        output = self.job['output']
+        [_, tree] = self.warm.ontology().open(output, stream=RdfStream if output.endswith(RdfStream.extensions)
+                                              else OntologyStream)
+        try:
+            if self.job['deduplicate']:
+                tree.deduplicate(self.warm.base_axioms())
+            for name, _, _, _, _ in writer_jobs():
+                tree.write_fragment(*self.fragments[name])
+            tree.close()
+        except BaseException:
+            tree.rollback()
+            raise
+
+    def watch(self, interval: float = INTERVAL):
+        # the first poll finds every file changed, which is the first import
+        while True:
+            sources = self.poll()
+            if sources:
+                start = time.perf_counter()
+                try:
+                    rerun = self.regenerate(sources)
+                    print(f'{", ".join(sources)} changed: wrote {", ".join(rerun)} '
+                          f'in {time.perf_counter() - start:.2f} s')
+                except Exception:
+                    # the output stays as it was until the files change again
+                    print(traceback.format_exc(), file=sys.stderr)
+            time.sleep(interval)
+
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description='Import a job of a job manifest again whenever its CSVs change.')
+    arguments.add_argument('jobs', help='JSON job manifest, see BatchImport.py')
+    arguments.add_argument('name', help='name of the job to watch')
+    arguments.add_argument('--base', help='base ontology, instead of the one in the job manifest')
+    arguments.add_argument('--interval', type=float, default=INTERVAL, help='seconds between two polls')
+    args = arguments.parse_args()
+
+    [base_file, jobs] = load_jobs(args.jobs, args.base)
+    job = next((job for job in jobs if job['name'] == args.name), None)
+    if job is None:
+        sys.exit(f'no job {args.name!r} in {args.jobs}')
+
+    watcher = ImportWatcher(WarmBase(base_file, IdAllocator.load(base_file)), job)
+    print(f'watching {", ".join(watcher.files.values())}, writing {job["output"]}')
+    try:
+        watcher.watch(args.interval)
+    except KeyboardInterrupt:
+        pass
@@ -1,421 +1,418 @@
 import xml.etree.ElementTree as ET
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+
+from AxiomSet import AxiomSet
+from Entities import Entity, start_run
+from OntologyStream import OntologyFragment, AxiomTemplate, RenderedAxiom
+
+
+# the axioms as ElementTree elements; templates are compiled from these, so both give the same XML
+
+def build_declaration(parent_node: ET.Element, iri: str, class_: bool) -> ET.Element:
+    declaration = ET.SubElement(parent_node, 'Declaration')
+    if class_:
+        ET.SubElement(declaration, 'Class', {'IRI': iri})
+    else:
+        ET.SubElement(declaration, 'NamedIndividual', {'IRI': iri})
+    return declaration
+
+
+def build_subclass(parent_node: ET.Element, parent_iri: str, child_iri: str) -> ET.Element:
+    subclass = ET.SubElement(parent_node, 'SubClassOf')
+    ET.SubElement(subclass, 'Class', {'IRI': child_iri})
+    ET.SubElement(subclass, 'Class', {'IRI': parent_iri})
+    return subclass
+
+
+def build_disjoint_classes(parent_node: ET.Element, iri_list: list) -> ET.Element:
+    subclass = ET.SubElement(parent_node, 'DisjointClasses')
+    for iri in iri_list:
+        ET.SubElement(subclass, 'Class', {'IRI': iri})
+    return subclass
+
+
+def build_subclass_some_values(parent_node: ET.Element, parent_iri: str, object_property_iri: str, child_iri: str,
+                               some: bool = True) -> ET.Element:
+    subclass = ET.SubElement(parent_node, 'SubClassOf')
+    ET.SubElement(subclass, 'Class', {'IRI': child_iri})
+    object_ = ET.SubElement(subclass, 'ObjectSomeValuesFrom' if some else 'ObjectAllValuesFrom')
+    ET.SubElement(object_, 'ObjectProperty', {'IRI': object_property_iri})
+    ET.SubElement(object_, 'Class', {'IRI': parent_iri})
+    return subclass
+
+
+def build_subclass_exact_cardinality(parent_node: ET.Element,
+                                     parent_iri: str, object_property_iri: str, child_iri: str,
+                                     property_attributes: dict) -> ET.Element:
+    subclass = ET.SubElement(parent_node, 'SubClassOf')
+    ET.SubElement(subclass, 'Class', {'IRI': child_iri})
+    object_ = ET.SubElement(subclass, 'ObjectExactCardinality', property_attributes)
+    ET.SubElement(object_, 'ObjectProperty', {'IRI': object_property_iri})
+    ET.SubElement(object_, 'Class', {'IRI': parent_iri})
+    return subclass
+
+
+def build_literal_property(parent_node: ET.Element, iri: str, property_value: str,
+                           property_attributes: dict, property_type: dict) -> ET.Element:
+    annotation_assertion = ET.SubElement(parent_node, 'AnnotationAssertion')
+    ET.SubElement(annotation_assertion, 'AnnotationProperty',
+                  property_attributes)
+    iri_element = ET.SubElement(annotation_assertion, 'IRI')
+    iri_element.text = iri
+    literal = ET.SubElement(annotation_assertion, 'Literal', property_type)
+    literal.text = property_value
+    return annotation_assertion
+
+
+def build_object_property(parent_node: ET.Element, iri: str, property_value: str,
+                          property_attributes: dict) -> ET.Element:
+    annotation_assertion = ET.SubElement(parent_node, 'AnnotationAssertion')
+    ET.SubElement(annotation_assertion, 'AnnotationProperty',
+                  property_attributes)
+    iri_element = ET.SubElement(annotation_assertion, 'IRI')
+    iri_element.text = iri
+    iri_element = ET.SubElement(annotation_assertion, 'IRI')
+    iri_element.text = property_value
+    return annotation_assertion
+
+
+def build_instance(parent_node: ET.Element, parent_iri: str,
+                   named_individual_iri: str) -> ET.Element:
+    subclass = ET.SubElement(parent_node, 'ClassAssertion')
+    ET.SubElement(subclass, 'Class', {'IRI': parent_iri})
+    ET.SubElement(subclass, 'NamedIndividual', {'IRI': named_individual_iri})
+    return subclass
+
+
+TEMPLATES = dict()
+
+
+def template(build, slots: int, **options) -> AxiomTemplate:
+    # compiles build once per combination of options; its first `slots` arguments are filled in per axiom
+    key = (build,) + tuple((name, tuple(value.items()) if isinstance(value, dict) else value)
+                           for name, value in options.items())
+    compiled = TEMPLATES.get(key)
+    if compiled is None:
+        compiled = TEMPLATES[key] = AxiomTemplate(lambda parent_node, *values: build(parent_node, *values, **options),
+                                                  slots)
+    return compiled
+
+
+DECLARE_CLASS = template(build_declaration, 1, class_=True)  # iri
+DECLARE_INDIVIDUAL = template(build_declaration, 1, class_=False)  # iri
+SUBCLASS = template(build_subclass, 2)  # parent_iri, child_iri
+SOME_VALUES = template(build_subclass_some_values, 3, some=True)  # parent_iri, object_property_iri, child_iri
+ALL_VALUES = template(build_subclass_some_values, 3, some=False)  # parent_iri, object_property_iri, child_iri
+EXACTLY_ONE = template(build_subclass_exact_cardinality, 3,  # parent_iri, object_property_iri, child_iri
+                       property_attributes={'cardinality': '1'})
+INSTANCE = template(build_instance, 2)  # parent_iri, named_individual_iri
+
+# annotations: iri, value
+LABEL = template(build_literal_property, 2,
+                 property_attributes={'abbreviatedIRI': 'rdfs:label'},
+                 property_type={'xml:lang': 'en'})
+CREATOR = template(build_object_property, 2,
+                   property_attributes={'abbreviatedIRI': 'dc:creator'})
+DATE = template(build_literal_property, 2,
+                property_attributes={'abbreviatedIRI': 'dc:date'},
+                property_type={'datatypeIRI': 'http://www.w3.org/2001/XMLSchema#dateTime'})
+DEFINITION = template(build_literal_property, 2,
+                      property_attributes={'abbreviatedIRI': 'obo:IAO_0000115'},
+                      property_type=dict())
+DESCRIPTION = template(build_literal_property, 2,
+                       property_attributes={'abbreviatedIRI': 'dc:description'},
+                       property_type=dict())
+THEORETICAL_BACKGROUND = template(build_literal_property, 2,
+                                  property_attributes={'IRI': '#theoretical_background'},
+                                  property_type={'xml:lang': 'en'})
+HAS_QUESTION = template(build_literal_property, 2,
+                        property_attributes={'IRI': '#hasQuestion'},
+                        property_type={'xml:lang': 'en'})
+
+
+def add_axiom(parent_node: ET.Element, template_: AxiomTemplate, *values) -> ET.Element:
+    axiom = RenderedAxiom(template_, values)
+    parent_node.append(axiom)
+    return axiom
 
 
 class XmlWriter(ABC):
+    # (entity attribute, linked entities) pairs whose IRIs ReferenceResolver looks up before
+    # writing; write() gets them as references[key], in this order
+    references = ()
+
     def __init__(self, ontology, tree):
         self.ontology = ontology
         self.tree = tree
 
+    def add(self, template_: AxiomTemplate, *values):
+        self.ontology.append(RenderedAxiom(template_, values))
+
+    def add_entity(self, entity):
+        # declaration, label, creator and date shared by every written class
+        self.add(DECLARE_CLASS, entity.iri)
+        self.add(LABEL, entity.iri, entity.label)
+        self.add(CREATOR, entity.iri, entity.creator)
+        self.add(DATE, entity.iri, entity.date)
+
     @staticmethod
     def add_declaration(parent_node: ET.Element, iri: str, class_: bool) -> ET.Element:
-        declaration = ET.SubElement(parent_node, 'Declaration')
-        if class_:
-            ET.SubElement(declaration, 'Class', {'IRI': iri})
-        else:
-            ET.SubElement(declaration, 'NamedIndividual', {'IRI': iri})
-        return declaration
+        return add_axiom(parent_node, DECLARE_CLASS if class_ else DECLARE_INDIVIDUAL, iri)
 
     @staticmethod
     def add_subclass(parent_node: ET.Element, parent_iri: str, child_iri: str) -> ET.Element:
-        subclass = ET.SubElement(parent_node, 'SubClassOf')
-        ET.SubElement(subclass, 'Class', {'IRI': child_iri})
-        ET.SubElement(subclass, 'Class', {'IRI': parent_iri})
-        return subclass
+        return add_axiom(parent_node, SUBCLASS, parent_iri, child_iri)
 
     @staticmethod
     def add_disjoint_classes(parent_node: ET.Element, iri_list: list) -> ET.Element:
-        subclass = ET.SubElement(parent_node, 'DisjointClasses')
-        for iri in iri_list:
-            ET.SubElement(subclass, 'Class', {'IRI': iri})
-        return subclass
+        # the number of classes varies, so this one is not a template
+        return build_disjoint_classes(parent_node, iri_list)
 
     @staticmethod
     def add_subclass_some_values(parent_node: ET.Element, parent_iri: str, object_property_iri: str, child_iri: str,
                                  some: bool = True):
-        subclass = ET.SubElement(parent_node, 'SubClassOf')
-        ET.SubElement(subclass, 'Class', {'IRI': child_iri})
-        object_ = ET.SubElement(subclass, 'ObjectSomeValuesFrom' if some else 'ObjectAllValuesFrom')
-        ET.SubElement(object_, 'ObjectProperty', {'IRI': object_property_iri})
-        ET.SubElement(object_, 'Class', {'IRI': parent_iri})
-        return subclass
+        return add_axiom(parent_node, SOME_VALUES if some else ALL_VALUES, parent_iri, object_property_iri, child_iri)
 
     @staticmethod
     def add_subclass_exact_cardinality(parent_node: ET.Element,
                                        parent_iri: str, object_property_iri: str, child_iri: str,
                                        property_attributes: dict):
-        subclass = ET.SubElement(parent_node, 'SubClassOf')
-        ET.SubElement(subclass, 'Class', {'IRI': child_iri})
-        object_ = ET.SubElement(subclass, 'ObjectExactCardinality', property_attributes)
-        ET.SubElement(object_, 'ObjectProperty', {'IRI': object_property_iri})
-        ET.SubElement(object_, 'Class', {'IRI': parent_iri})
-        return subclass
+        return add_axiom(parent_node,
+                         template(build_subclass_exact_cardinality, 3, property_attributes=property_attributes),
+                         parent_iri, object_property_iri, child_iri)
 
     @staticmethod
     def add_literal_property(parent_node: ET.Element, iri: str,
                              property_attributes: dict,
                              property_type: dict, property_value: str):
-        annotation_assertion = ET.SubElement(parent_node, 'AnnotationAssertion')
-        ET.SubElement(annotation_assertion, 'AnnotationProperty',
-                      property_attributes)
-        iri_element = ET.SubElement(annotation_assertion, 'IRI')
-        iri_element.text = iri
-        if property_type.items() is None:
-            literal = ET.SubElement(annotation_assertion, 'Literal')
-        else:
-            literal = ET.SubElement(annotation_assertion, 'Literal', property_type)
-        literal.text = property_value
-        return annotation_assertion
+        return add_axiom(parent_node,
+                         template(build_literal_property, 2,
+                                  property_attributes=property_attributes, property_type=property_type),
+                         iri, property_value)
 
     @staticmethod
     def add_object_property(parent_node: ET.Element, iri: str,
                             property_attributes: dict,
                             property_value: str):
-        annotation_assertion = ET.SubElement(parent_node, 'AnnotationAssertion')
-        ET.SubElement(annotation_assertion, 'AnnotationProperty',
-                      property_attributes)
-        iri_element = ET.SubElement(annotation_assertion, 'IRI')
-        iri_element.text = iri
-        iri_element = ET.SubElement(annotation_assertion, 'IRI')
-        iri_element.text = property_value
-        return annotation_assertion
+        return add_axiom(parent_node,
+                         template(build_object_property, 2, property_attributes=property_attributes),
+                         iri, property_value)
 
     @staticmethod
     def add_instance(parent_node: ET.Element, parent_iri: str,
                      named_individual_iri: str):
-        subclass = ET.SubElement(parent_node, 'ClassAssertion')
-        ET.SubElement(subclass, 'Class', {'IRI': parent_iri})
-        ET.SubElement(subclass, 'NamedIndividual', {'IRI': named_individual_iri})
+        return add_axiom(parent_node, INSTANCE, parent_iri, named_individual_iri)
+
+    def flush(self):
+        self.tree.flush()
 
     @abstractmethod
-    def write(self, entities: dict, linked_entities: dict):
+    def write(self, entities: dict, references: dict):
         raise NotImplementedError()
 
 
 class HarmonisedMeasureXmlWriter(XmlWriter):
-    def write(self, entities, linked_entities):
+    def write(self, entities, references):
         for key in entities:
             entity = entities[key]
             if entity.added:
                 continue
 
-            declaration = self.add_declaration(self.ontology, entity.iri, class_=True)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "rdfs:label"},
-                property_type={'xml:lang': "en"},
-                property_value=entity.label)
+            self.add_entity(entity)
+            self.add(SUBCLASS, entity.parent_iri, entity.iri)
+            self.add(ALL_VALUES,
+                     entity.iri,
+                     entity.base_iri + "00000000000000000333",
+                     entity.base_iri + "00000000000000000549")  # harmonised questionarie component class
 
-            self.add_object_property(
-                parent_node=self.ontology, iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:creator"},
-                property_value=entity.creator)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:date"},
-                property_type={'datatypeIRI': "http://www.w3.org/2001/XMLSchema#dateTime"},
-                property_value=entity.date)
-
-            self.add_subclass(parent_node=self.ontology,
-                              parent_iri=entity.parent_iri,
-                              child_iri=entity.iri)
-
-            self.add_subclass_some_values(
-                parent_node=self.ontology,
-                parent_iri=entity.iri,
-                object_property_iri=entity.base_iri + "00000000000000000333",
-                child_iri=entity.base_iri + "00000000000000000549",  # harmonised questionarie component class
-                some=False)
-
-            ET.indent(self.ontology, '    ')
-            ET.indent(declaration, '    ')
+            self.flush()
 
 
 class QualityXmlWriter(XmlWriter):
-    def write(self, entities, linked_entities):
+    def write(self, entities, references):
         for key in entities:
             entity = entities[key]
             if entity.added:
                 continue
 
-            declaration = self.add_declaration(self.ontology, entity.iri, class_=True)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "rdfs:label"},
-                property_type={'xml:lang': "en"},
-                property_value=entity.label)
-
-            self.add_object_property(
-                parent_node=self.ontology, iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:creator"},
-                property_value=entity.creator)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:date"},
-                property_type={'datatypeIRI': "http://www.w3.org/2001/XMLSchema#dateTime"},
-                property_value=entity.date)
-
-            self.add_subclass(parent_node=self.ontology,
-                              parent_iri=entity.parent_iri,
-                              child_iri=entity.iri)
+            self.add_entity(entity)
+            self.add(SUBCLASS, entity.parent_iri, entity.iri)
 
-            ET.indent(self.ontology, '    ')
-            ET.indent(declaration, '    ')
+            self.flush()
 
 
 class HarmonisedQuestionarieComponentXmlWriter(XmlWriter):
+    references = (('harmonised_measure', 'measures'), ('quality', 'qualities'))
 
-    def write(self, entities, linked_entities):
+    def write(self, entities, references):
         for key in entities:
             entity = entities[key]
             if entity.added:
                 continue
-                
-            declaration = self.add_declaration(self.ontology, entity.iri, class_=True)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "rdfs:label"},
-                property_type={'xml:lang': "en"},
-                property_value=entity.label)
-
-            self.add_object_property(
-                parent_node=self.ontology, iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:creator"},
-                property_value=entity.creator)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:date"},
-                property_type={'datatypeIRI': "http://www.w3.org/2001/XMLSchema#dateTime"},
-                property_value=entity.date)
 
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'IRI': "#theoretical_background"},
-                property_type={'xml:lang': "en"},
-                property_value=entity.theoretical_background)
+            [measure_iri, quality_iri] = references[key]
 
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "obo:IAO_0000115"},
-                property_type=dict(),
-                property_value=entity.definition)
-
-            self.add_subclass(
-                parent_node=self.ontology,
-                parent_iri=entity.parent_iri,
-                child_iri=entity.iri)
-
-            self.add_subclass_some_values(
-                parent_node=self.ontology,
-                parent_iri=linked_entities['measures'][entity.harmonised_measure].iri,
-                object_property_iri=entity.base_iri + "00000000000000000350",
-                child_iri=entity.iri,
-                some=True)
+            self.add_entity(entity)
+            self.add(THEORETICAL_BACKGROUND, entity.iri, entity.theoretical_background)
+            self.add(DEFINITION, entity.iri, entity.definition)
+            self.add(SUBCLASS, entity.parent_iri, entity.iri)
+            self.add(SOME_VALUES, measure_iri, entity.base_iri + "00000000000000000350", entity.iri)
 
             # link between qualities and harmonised questionarie components
-            self.add_subclass_some_values(
-                parent_node=self.ontology,
-                parent_iri=entity.iri,
-                object_property_iri="#OWLObjectProperty_aebfc327_8e90_47ec_afa4_23b12c522631",
-                child_iri=linked_entities['qualities'][entity.quality].iri,
-                some=True)
+            self.add(SOME_VALUES, entity.iri, "#OWLObjectProperty_aebfc327_8e90_47ec_afa4_23b12c522631", quality_iri)
 
-            ET.indent(self.ontology, '    ')
-            ET.indent(declaration, '    ')
+            self.flush()
 
 
 class QuestionXmlWriter(XmlWriter):
+    references = (('harmonised_component', 'components'), ('linked_classification', 'classifications'))
 
-    def write(self, entities, linked_entities):
+    def write(self, entities, references):
         for key in entities:
             entity = entities[key]
             if entity.added:
                 continue
 
-            declaration = self.add_declaration(self.ontology, entity.iri, class_=True)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "rdfs:label"},
-                property_type={'xml:lang': "en"},
-                property_value=entity.label)
-
-            self.add_object_property(
-                parent_node=self.ontology, iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:creator"},
-                property_value=entity.creator)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:date"},
-                property_type={'datatypeIRI': "http://www.w3.org/2001/XMLSchema#dateTime"},
-                property_value=entity.date)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'IRI': "#hasQuestion"},
-                property_type={'xml:lang': "en"},
-                property_value=entity.has_question)
+            [component_iri, classification_iri] = references[key]
 
-            self.add_subclass(
-                parent_node=self.ontology,
-                parent_iri=entity.parent_iri,
-                child_iri=entity.iri)
-
-            self.add_subclass_some_values(
-                parent_node=self.ontology,
-                parent_iri=linked_entities['components'][entity.harmonised_component].iri,
-                object_property_iri=entity.base_iri + "00000000000000000350",
-                child_iri=entity.iri,
-                some=True)
+            self.add_entity(entity)
+            self.add(HAS_QUESTION, entity.iri, entity.has_question)
+            self.add(SUBCLASS, entity.parent_iri, entity.iri)
+            self.add(SOME_VALUES, component_iri, entity.base_iri + "00000000000000000350", entity.iri)
 
             # object properties is the answer of and is answered by
-            self.add_subclass_exact_cardinality(
-                parent_node=self.ontology,
-                parent_iri=linked_entities['classifications'][entity.linked_classification].iri,
-                object_property_iri=entity.base_iri + "00000000000000000362",
-                child_iri=entity.iri,
-                property_attributes={"cardinality": "1"})
+            self.add(EXACTLY_ONE, classification_iri, entity.base_iri + "00000000000000000362", entity.iri)
+            self.add(EXACTLY_ONE, entity.iri, entity.base_iri + "00000000000000000543", classification_iri)
 
-            self.add_subclass_exact_cardinality(
-                parent_node=self.ontology,
-                parent_iri=entity.iri,
-                object_property_iri=entity.base_iri + "00000000000000000543",
-                child_iri=linked_entities['classifications'][entity.linked_classification].iri,
-                property_attributes={"cardinality": "1"})
-
-            ET.indent(self.ontology, '    ')
-            ET.indent(declaration, '    ')
+            self.flush()
 
 
 class MatrixStatementXmlWriter(XmlWriter):
+    references = (('matrix_question', 'questions'),)
+
+    def write(self, entities, references):
+        self.write_statements(entities, references)
+        self.write_disjoint(self.changed(*self.group(entities)))
 
-    def write(self, entities, linked_entities):
+    @staticmethod
+    def group(entities):
+        # IRIs of all the statements by matrix question, whether they are written or not, and the
+        # questions with a statement to write
         question_statements = dict()
+        written = set()
+        for entity in entities.values():
+            question_statements.setdefault(entity.matrix_question, []).append(entity.iri)
+            if not entity.added:
+                written.add(entity.matrix_question)
+        return question_statements, written
+
+    @staticmethod
+    def changed(question_statements: dict, written: set):
+        # a question with a new or changed statement gets its DisjointClasses again, with all its
+        # statements (unchanged ones keep their IRI, see ImportManifest), the others none
+        return {question: iris for question, iris in question_statements.items() if question in written}
+
+    def write_statements(self, entities, references):
         for key in entities:
             entity = entities[key]
             if entity.added:
                 continue
 
-            if entity.matrix_question in question_statements.keys():
-                values = question_statements[entity.matrix_question]
-                values.append(entity.iri)
-                question_statements[entity.matrix_question] = values
-            else:
-                values = [entity.iri]
-                question_statements[entity.matrix_question] = values
+            self.add_entity(entity)
+            self.add(DESCRIPTION, entity.iri, entity.description)
+            self.add(SUBCLASS, references[key][0], entity.iri)
 
-            declaration = self.add_declaration(self.ontology, entity.iri, class_=True)
+            self.flush()
 
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "rdfs:label"},
-                property_type={'xml:lang': "en"},
-                property_value=entity.label)
-
-            self.add_object_property(
+    def write_disjoint(self, question_statements):
+        for question in question_statements:
+            self.add_disjoint_classes(
                 parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:creator"},
-                property_value=entity.creator)
+                iri_list=question_statements[question]
+            )
+            self.flush()
 
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:date"},
-                property_type={'datatypeIRI': "http://www.w3.org/2001/XMLSchema#dateTime"},
-                property_value=entity.date)
 
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:description"},
-                property_type=dict(),
-                property_value=entity.description)
+class MatrixStatementBatchXmlWriter(MatrixStatementXmlWriter):
+    # a streamed import writes its statements batch by batch and the statements of a question
+    # can be in several batches, so their DisjointClasses are left to DisjointStatementsXmlWriter
+    def write(self, entities, references):
+        self.write_statements(entities, references)
 
-            self.add_subclass(
-                parent_node=self.ontology,
-                parent_iri=linked_entities['questions'][entity.matrix_question].iri,
-                child_iri=entity.iri)
 
-            ET.indent(declaration, '    ')
+class DisjointStatementsXmlWriter(MatrixStatementXmlWriter):
+    # entities are the IRIs of the statements by matrix question, see MatrixStatementXmlWriter.changed
+    references = ()
 
-        for question in question_statements:
-            self.add_disjoint_classes(
-                parent_node=self.ontology,
-                iri_list=question_statements[question]
-            )
-        ET.indent(self.ontology, '    ')
+    def write(self, entities, references):
+        self.write_disjoint(entities)
 
 
 class ClassificationXmlWriter(XmlWriter):
 
-    def write(self, entities, linked_entities):
+    def write(self, entities, references):
+        declared = set()
         for key in entities:
             entity = entities[key]
             if entity.added:
                 continue
 
-            declaration = self.add_declaration(self.ontology, entity.iri, class_=True)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "rdfs:label"},
-                property_type={'xml:lang': "en"},
-                property_value=entity.label)
-
-            self.add_object_property(
-                parent_node=self.ontology, iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:creator"},
-                property_value=entity.creator)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "dc:date"},
-                property_type={'datatypeIRI': "http://www.w3.org/2001/XMLSchema#dateTime"},
-                property_value=entity.date)
-
-            self.add_literal_property(
-                parent_node=self.ontology,
-                iri=entity.iri,
-                property_attributes={'abbreviatedIRI': "obo:IAO_0000115"},
-                property_type=dict(),
-                property_value=entity.definition)
-
-            self.add_subclass(
-                parent_node=self.ontology,
-                parent_iri=entity.parent_iri,
-                child_iri=entity.iri)
+            self.add_entity(entity)
+            self.add(DEFINITION, entity.iri, entity.definition)
+            self.add(SUBCLASS, entity.parent_iri, entity.iri)
 
             for individual in entity.individuals:
-                self.add_declaration(self.ontology, individual.iri, class_=False)
-                self.add_literal_property(
-                    parent_node=self.ontology,
-                    iri=individual.iri,
-                    property_attributes={'abbreviatedIRI': "rdfs:label"},
-                    property_type={'xml:lang': "en"},
-                    property_value=individual.label)
-                self.add_instance(self.ontology, individual.parent_iri, individual.iri)
-
-            ET.indent(self.ontology, '    ')
-            ET.indent(declaration, '    ')
+                # instances shared by several classifications are declared once
+                if not individual.added and individual.iri not in declared:
+                    declared.add(individual.iri)
+                    self.add(DECLARE_INDIVIDUAL, individual.iri)
+                    self.add(LABEL, individual.iri, individual.label)
+                self.add(INSTANCE, entity.iri, individual.iri)
+
+            self.flush()
+
+
+def write_fragment(writer_class, entities: dict, references: dict, deduplicate: bool = False):
+    # runs one writer against an empty ontology and returns its serialized axioms and their counts by tag
+    # (with deduplicate, the axioms one by one with their keys)
+    ontology = ET.Element('Ontology')
+    tree = OntologyFragment(ontology, key=AxiomSet().key if deduplicate else None)
+    writer_class(ontology, tree).write(entities, references)
+    return tree.getvalue(), tree.counts
+
+
+class XmlWriterPool:
+    # Runs writers in worker processes once the ids of their entities are assigned. Fragments
+    # are added to the output in the order the writers were submitted, so the result is the
+    # same as running them one after another. With workers=0 the writers run in this process.
+    def __init__(self, ontology, tree, workers: int = 0):
+        self.ontology = ontology
+        self.tree = tree
+        self.executor = None
+        if workers > 0:
+            # workers write the same dc:date as this process
+            self.executor = ProcessPoolExecutor(workers, initializer=start_run, initargs=(Entity.date,))
+        self.fragments = []
+        self.workers = workers
+
+    def write(self, writer_class, entities: dict, references: dict):
+        if self.executor is None:
+            writer_class(self.ontology, self.tree).write(entities, references)
+        else:
+            self.fragments.append(self.executor.submit(write_fragment, writer_class, entities, references,
+                                                       self.tree.axioms is not None))
+
+    def drain(self, pending: int = None):
+        # adds the fragments that are done to the output, in order, and waits for the oldest ones
+        # while more than pending (by default two per worker) are left
+        if pending is None:
+            pending = 2 * self.workers
+        while self.fragments and (len(self.fragments) > pending or self.fragments[0].done()):
+            self.tree.write_fragment(*self.fragments.pop(0).result())
+
+    def close(self):
+        self.drain(0)
+
+        if self.executor is not None:
+            self.executor.shutdown()
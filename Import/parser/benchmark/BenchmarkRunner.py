@@ -0,0 +1,216 @@
+import argparse
+import csv
+import gc
+import glob
+import hashlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+
+from AxiomSet import AxiomSet
+from Entities import Ontology
+from IdAllocator import IdAllocator
+from OntologyIndex import OntologyIndex
+from Pipeline import run, run_streaming
+from XmlWriter import XmlWriterPool
+from benchmark.CsvGenerator import CsvGenerator
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..')
+BASE_ONTOLOGY_FILE = (sorted(glob.glob(os.path.join(ROOT, 'Current ontology version', '*.owl'))) or [None])[-1]
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+SIZES = [1000, 10000, 100000, 1000000]
+
+# a stage regresses when it is slower than baseline * seconds + min_seconds (with the baseline
+# scaled to this machine, see calibrate) or uses more than baseline * peak_bytes of memory
+THRESHOLDS = {'seconds': 1.5, 'min_seconds': 0.05, 'peak_bytes': 1.25}
+
+
+class StageRecorder:
+    # Times every pipeline stage, or records its peak traced memory when memory=True.
+    # Memory is measured in a separate pass because tracemalloc slows everything down.
+
+    def __init__(self, results: dict, memory: bool = False):
+        self.results = results
+        self.memory = memory
+
+    @contextmanager
+    def stage(self, name: str):
+        if self.memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+
+        result = self.results.setdefault(name, dict())
+        if self.memory:
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        else:
+            result['seconds'] = round(seconds, 4)
+
+
+def calibrate(repeat: int = 20):
+    # Seconds (best of repeat) of a fixed workload like the pipeline's (CSV rows, elements serialized,
+    # hashes) that uses none of its code. The baseline stores the calibration of the machine it was
+    # recorded on, and --check scales its timings by how much slower or faster this one runs it.
+    # The garbage collector is off, or the objects left by earlier runs would slow it down.
+    rows = [[f'row {index}', f'label {index % 97}', 'x' * (index % 50)] for index in range(5000)]
+    times = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            text = io.StringIO()
+            csv.writer(text).writerows(rows)
+            root = ET.Element('Ontology')
+            for row in csv.reader(io.StringIO(text.getvalue())):
+                ET.SubElement(ET.SubElement(root, 'Declaration'), 'Class', {'IRI': '#' + row[0]}).text = row[1]
+            hashlib.sha1(ET.tostring(root)).digest()
+            times.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return round(min(times), 4)
+
+
+def run_pipeline(files: dict, output: str, base_file: str, recorder: StageRecorder, buffered: bool,
+                 merge: bool = False, stream: bool = False, deduplicate: bool = False):
+    if merge:
+        # the axioms are merged into a copy of the base ontology, which is left as it is
+        shutil.copyfile(base_file, output)
+
+    base = Ontology()
+    with recorder.stage('load base ontology'):
+        base.index = OntologyIndex.load(base_file)
+        # the allocator is not saved, so benchmarks never move the ids of real imports
+        base.allocator = IdAllocator.load(base_file)
+
+    if buffered:
+        [ontology, tree] = base.get_ontology()
+    elif merge:
+        [ontology, tree] = base.merge(output)
+    else:
+        [ontology, tree] = base.open(output)
+    # off by default, as DEDUPLICATE in Pipeline.py
+    if deduplicate:
+        with recorder.stage('load base axioms'):
+            tree.deduplicate(AxiomSet.load(base_file))
+    writers = XmlWriterPool(ontology, tree)
+
+    run_ = run_streaming if stream else run
+    run_(base, writers, files['metadata'], files['components'], files['classifications'], files['items'],
+         stage=recorder.stage)
+
+    with recorder.stage('write ontology'):
+        writers.close()
+        if buffered:
+            base.write(output)
+        else:
+            base.close()
+
+
+def benchmark(rows: int, base_file: str, memory: bool = True, buffered: bool = False, merge: bool = False,
+              stream: bool = False, deduplicate: bool = False):
+    results = dict()
+    with tempfile.TemporaryDirectory() as folder:
+        files = CsvGenerator(rows).write(folder)
+        output = os.path.join(folder, 'output.owl')
+
+        start = time.perf_counter()
+        run_pipeline(files, output, base_file, StageRecorder(results), buffered, merge, stream, deduplicate)
+        results['total'] = {'seconds': round(time.perf_counter() - start, 4)}
+
+        if memory:
+            tracemalloc.start()
+            try:
+                run_pipeline(files, output, base_file, StageRecorder(results, memory=True), buffered, merge,
+                             stream, deduplicate)
+                results['total']['peak_bytes'] = max(result['peak_bytes'] for result in results.values()
+                                                     if 'peak_bytes' in result)
+            finally:
+                tracemalloc.stop()
+
+    return results
+
+
+def compare(results: dict, baseline: dict, calibration: float):
+    thresholds = baseline.get('thresholds', THRESHOLDS)
+    # a baseline recorded on a machine twice as fast is doubled
+    scale = calibration / baseline['calibration'] if baseline.get('calibration') else 1.0
+    regressions = []
+    for size, stages in results.items():
+        for name, measured in stages.items():
+            expected = baseline.get('results', dict()).get(size, dict()).get(name)
+            if expected is None:
+                continue
+
+            if 'seconds' in measured and 'seconds' in expected:
+                limit = expected['seconds'] * scale * thresholds['seconds'] + thresholds['min_seconds']
+                if measured['seconds'] > limit:
+                    regressions.append(f'{size} rows, {name}: {measured["seconds"]:.3f} s > {limit:.3f} s')
+
+            if 'peak_bytes' in measured and 'peak_bytes' in expected:
+                limit = expected['peak_bytes'] * thresholds['peak_bytes']
+                if measured['peak_bytes'] > limit:
+                    regressions.append(f'{size} rows, {name}: {measured["peak_bytes"]} B > {limit:.0f} B')
+
+    return regressions
+
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description='Time the import pipeline on synthetic CSVs.')
+    arguments.add_argument('--sizes', type=int, nargs='+', default=SIZES[:2],
+                           help=f'numbers of questions to generate (up to {SIZES[-1]})')
+    arguments.add_argument('--base', default=BASE_ONTOLOGY_FILE, help='base ontology the rows are imported into')
+    arguments.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    arguments.add_argument('--buffered', action='store_true',
+                           help='build the whole tree and write it with Ontology.write instead of streaming')
+    arguments.add_argument('--merge', action='store_true',
+                           help='merge the axioms into a copy of the base ontology instead of writing a new file')
+    arguments.add_argument('--stream', action='store_true',
+                           help='write the rows in batches as they are read, see Pipeline.run_streaming')
+    arguments.add_argument('--deduplicate', action='store_true',
+                           help='leave out the axioms already in the base ontology, see DEDUPLICATE in Pipeline.py')
+    arguments.add_argument('--report', help='write the results to this JSON file')
+    arguments.add_argument('--check', action='store_true',
+                           help='fail when a stage is slower or uses more memory than the baseline')
+    arguments.add_argument('--update', action='store_true', help='store the results as the new baseline')
+    args = arguments.parse_args()
+
+    # the load of the machine changes during a run, so it is calibrated between the sizes
+    calibrations = [calibrate()]
+    results = dict()
+    for size in args.sizes:
+        results[str(size)] = benchmark(size, args.base, memory=not args.no_memory, buffered=args.buffered,
+                                       merge=args.merge, stream=args.stream, deduplicate=args.deduplicate)
+        calibrations.append(calibrate())
+        for name, result in results[str(size)].items():
+            seconds = f'{result["seconds"]:9.3f} s' if 'seconds' in result else ' ' * 11
+            memory = f'{result["peak_bytes"] / 2 ** 20:9.1f} MiB' if 'peak_bytes' in result else ''
+            print(f'{size:>8} {name:<32}{seconds}{memory}')
+
+    calibration = statistics.median(calibrations)
+    print(f'calibration {calibration:.3f} s')
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1)
+
+    if args.update:
+        with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+            json.dump({'thresholds': THRESHOLDS, 'calibration': calibration, 'results': results}, f, indent=1)
+
+    if args.check:
+        with open(BASELINE_FILE, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), calibration)
+        for regression in regressions:
+            print(f'regression: {regression}')
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,111 @@
+import argparse
+import csv
+import os
+import random
+
+METADATA_COLUMNS = ['ID', 'Harmonised measure', 'Quality', 'harmonised questionare Component',
+                    'Theoretical background', 'Definition']
+CLASSIFICATION_COLUMNS = ['ID', 'Classification', 'Definiton within a specific classification', 'Instances: ']
+COMPONENT_COLUMNS = ['Annotation: Label', 'Annotation: hadQuestion', 'Linked classification ID', 'Question',
+                     'ComponentId']
+ITEMS_COLUMNS = ['Question name', 'Item name', 'Item label', 'ComponentId']
+
+QUESTION_TYPES = ['Single choice', 'Single choice', 'Open', 'Matrix', 'Bipolar', 'Multiple choice']
+INSTANCES = ['never', 'rarely', 'sometimes', 'often', 'always', 'Strongly agree', 'Agree ', 'Neutral',
+             'Disagree', 'Strongly disagree', 'Yes', 'No', "I don't know"]
+WORDS = ['food', 'consumer', 'trust', 'quality', 'price', 'health', 'taste', 'label', 'organic', 'local',
+         'fresh', 'brand', 'habit', 'choice', 'risk', 'safety', 'origin', 'meal', 'diet', 'purchase']
+
+FILES = {'metadata': 'metadata.csv',
+         'classifications': 'classifications.csv',
+         'components': 'components.csv',
+         'items': 'items.csv'}
+
+
+class CsvGenerator:
+    # Writes the four harmonisation CSVs the pipeline reads. `rows` is the number of questions
+    # in the component file; the other files are scaled from it roughly as in the real exports.
+
+    def __init__(self, rows: int, seed: int = 0):
+        self.rows = rows
+        self.random = random.Random(seed)
+
+    def text(self, words: int):
+        return ' '.join(self.random.choice(WORDS) for _ in range(words))
+
+    def write(self, folder: str):
+        os.makedirs(folder, exist_ok=True)
+        files = {name: os.path.join(folder, file) for name, file in FILES.items()}
+
+        components = self.write_metadata(files['metadata'])
+        classifications = self.write_classifications(files['classifications'])
+        questions = self.write_components(files['components'], components, classifications)
+        self.write_items(files['items'], questions)
+
+        return files
+
+    def write_metadata(self, file: str):
+        measures = [f'{self.text(2).title()} Measure {index}' for index in range(max(3, self.rows // 200))]
+        qualities = [f'{self.text(1)} quality {index}' for index in range(max(3, self.rows // 100))]
+        components = []
+        with open(file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(METADATA_COLUMNS)
+            for index in range(max(5, self.rows // 20)):
+                # a few rows belong to the informed consent, which the parsers leave out
+                measure = 'InformedConsent' if index % 50 == 49 else self.random.choice(measures)
+                if measure != 'InformedConsent':
+                    components.append(str(index))
+                writer.writerow([str(index), measure, ' ' + self.random.choice(qualities) + ' ',
+                                 f'{self.text(3)} component {index}',
+                                 f'{self.text(12)}.\n{self.text(8)} & "{self.text(2)}"',
+                                 f'{self.text(10)} <{index}>'])
+        return components
+
+    def write_classifications(self, file: str):
+        classifications = [str(1000 + index) for index in range(max(3, self.rows // 50))]
+        with open(file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CLASSIFICATION_COLUMNS)
+            # open questions link to the 'open' classification
+            for classification in classifications + ['open']:
+                label = f'{self.text(2)} scale {classification}'
+                definition = self.text(8)
+                for instance in self.random.sample(INSTANCES, self.random.randrange(2, 7)):
+                    writer.writerow([classification, label, definition, instance])
+        return classifications
+
+    def write_components(self, file: str, components: list, classifications: list):
+        questions = []
+        with open(file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COMPONENT_COLUMNS)
+            for index in range(self.rows):
+                question_type = self.random.choice(QUESTION_TYPES)
+                # component 209 is skipped by the parsers
+                component = '209' if index % 100 == 99 else self.random.choice(components)
+                classification = 'open' if question_type == 'Open' else self.random.choice(classifications)
+                label = f'Q{index}_{self.random.choice(WORDS)}'
+                if question_type == 'Matrix':
+                    questions.append((label, component))
+                writer.writerow([label, f'How {self.text(6)}?', classification, question_type, component])
+        return questions
+
+    def write_items(self, file: str, questions: list):
+        with open(file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(ITEMS_COLUMNS)
+            for label, component in questions:
+                for index in range(self.random.randrange(2, 8)):
+                    writer.writerow([label, f'{self.text(7)} {index}', f'{label}_{index}', component])
+
+
+if __name__ == '__main__':
+    arguments = argparse.ArgumentParser(description='Write synthetic harmonisation CSVs.')
+    arguments.add_argument('folder')
+    arguments.add_argument('--rows', type=int, default=1000, help='number of questions in the component file')
+    arguments.add_argument('--seed', type=int, default=0)
+    args = arguments.parse_args()
+
+    for name, file in CsvGenerator(args.rows, args.seed).write(args.folder).items():
+        print(f'{name}: {file}')
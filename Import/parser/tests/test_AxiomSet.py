@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+
+from AxiomSet import AxiomSet
+
+ONTOLOGY = '''<?xml version="1.0"?>
+<Ontology xmlns="http://www.w3.org/2002/07/owl#" xml:base="http://example.org/">
+    <Declaration>
+        <Class IRI="#a"/>
+    </Declaration>
+    <Declaration>
+        <Class IRI="#b"/>
+    </Declaration>
+    <SubClassOf>
+        <Class IRI="#b"/>
+        <Class IRI="#a"/>
+    </SubClassOf>
+</Ontology>'''
+
+
+class AxiomSetTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.file = os.path.join(folder.name, 'ontology.owl')
+        with open(self.file, 'w') as f:
+            f.write(ONTOLOGY)
+
+    def test_cache(self):
+        hashes = AxiomSet.load(self.file).hashes
+        self.assertEqual(len(hashes), 3)
+        self.assertTrue(os.path.exists(AxiomSet.path(self.file)))
+        self.assertEqual(AxiomSet.load(self.file).hashes, hashes)
+
+    def test_truncated_cache(self):
+        # a cache cut short, even within a hash, is rebuilt rather than seeding part of the hashes
+        hashes = AxiomSet.load(self.file).hashes
+        with open(AxiomSet.path(self.file), 'rb') as f:
+            data = f.read()
+        for size in (len(data) - 1, len(data) - 5):
+            with self.subTest(size=size):
+                with open(AxiomSet.path(self.file), 'wb') as f:
+                    f.write(data[:size])
+                self.assertEqual(AxiomSet.load(self.file).hashes, hashes)
+                self.assertEqual(os.path.getsize(AxiomSet.path(self.file)), len(data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import unittest
+
+from BatchImport import load_jobs, run_jobs
+from Entities import Entity, start_run
+from IdAllocator import IdAllocator, ID_PATTERN, RESERVED
+from benchmark.CsvGenerator import CsvGenerator
+
+BASE = '<?xml version="1.0"?>\n<Ontology xmlns="http://www.w3.org/2002/07/owl#"/>'
+ROWS = 20
+
+
+class BatchImportTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.addCleanup(start_run, Entity.date)
+        start_run('2024-01-01T00:00:00Z')
+        self.folder = folder.name
+
+        with open(os.path.join(self.folder, 'base.owl'), 'w') as f:
+            f.write(BASE)
+        self.files = {name: CsvGenerator(ROWS, seed=seed).write(os.path.join(self.folder, name))
+                      for seed, name in enumerate(['a', 'b'])}
+
+    def job(self, name: str, **options):
+        job = {key: os.path.relpath(file, self.folder) for key, file in self.files[name].items()}
+        return {'name': name, **job, 'output': name + '.owl', **options}
+
+    def write_jobs(self, jobs: list, base: str = 'base.owl'):
+        file = os.path.join(self.folder, 'jobs.json')
+        with open(file, 'w', encoding='utf-8') as f:
+            json.dump({'base': base, 'jobs': jobs}, f)
+        return file
+
+    def output(self, name: str):
+        with open(os.path.join(self.folder, name + '.owl'), 'rb') as f:
+            return f.read()
+
+    def ids(self, name: str):
+        # the ids the output declares or refers to, leaving out the reserved ones
+        ids = {int(match.group(1) or match.group(2)) for match in ID_PATTERN.finditer(self.output(name))}
+        return {id_ for id_ in ids if id_ > RESERVED}
+
+    def test_malformed(self):
+        file = os.path.join(self.folder, 'jobs.json')
+        with open(file, 'w', encoding='utf-8') as f:
+            f.write('{"base": "base.owl", "jobs": [')
+        with self.assertRaises(ValueError):
+            load_jobs(file)
+
+        missing = self.job('a')
+        del missing['items']
+        for jobs in ([missing],
+                     # two jobs writing one file
+                     [self.job('a'), self.job('b', output='a.owl')],
+                     # a job writing the base ontology
+                     [self.job('a', output='base.owl')]):
+            with self.subTest(jobs=jobs):
+                with self.assertRaises(ValueError):
+                    load_jobs(self.write_jobs(jobs))
+
+    def test_ids(self):
+        # both jobs lease ids from the one counter of the base, with or without worker processes
+        for workers in (0, 2):
+            with self.subTest(workers=workers):
+                [base, jobs] = load_jobs(self.write_jobs([self.job('a'), self.job('b')]))
+                high_water_mark = IdAllocator.load(base).high_water_mark
+                results = list(run_jobs(base, jobs, workers))
+                self.assertEqual([error for _, _, error in results], [None, None])
+
+                ids = [self.ids(name) for name in ('a', 'b')]
+                self.assertTrue(ids[0] and ids[1])
+                self.assertFalse(ids[0] & ids[1])
+                # the next run starts after every id handed out here
+                self.assertGreater(min(ids[0] | ids[1]), high_water_mark)
+                self.assertGreaterEqual(IdAllocator.load(base).high_water_mark, max(ids[0] | ids[1]))
+
+    def test_failed_job(self):
+        with open(os.path.join(self.folder, 'b.owl'), 'w') as f:
+            f.write('previous output')
+        # the statements are read last, after the other entities of the streamed job were written
+        with open(self.files['b']['items'], 'w', encoding='utf-8') as f:
+            f.write('Question name,Item name\n')
+
+        [base, jobs] = load_jobs(self.write_jobs([self.job('a'), self.job('b', stream=True)]))
+        [[_, _, error_a], [_, _, error_b]] = run_jobs(base, jobs)
+        self.assertIsNone(error_a)
+        self.assertIn('KeyError', error_b)
+        self.assertEqual(self.output('b'), b'previous output')
+        self.assertNotIn('b.owl.tmp', os.listdir(self.folder))
+
+
+if __name__ == '__main__':
+    unittest.main()
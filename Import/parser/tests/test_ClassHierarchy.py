@@ -0,0 +1,37 @@
+import unittest
+
+from ClassHierarchy import ClassHierarchy
+
+# a diamond under a, a class with two roots, and a cycle
+PARENTS = {'b': ['a'], 'c': ['a'], 'd': ['b', 'c'], 'e': ['d', 'x'], 'p': ['q'], 'q': ['p']}
+
+
+class ClassHierarchyTest(unittest.TestCase):
+    def check(self, hierarchy: ClassHierarchy):
+        self.assertEqual(sorted(hierarchy.ancestors('e')), ['a', 'b', 'c', 'd', 'x'])
+        self.assertEqual(sorted(hierarchy.ancestors('d')), ['a', 'b', 'c'])
+        self.assertEqual(hierarchy.ancestors('a'), [])
+        self.assertEqual(sorted(hierarchy.descendants('a')), ['b', 'c', 'd', 'e'])
+        self.assertEqual(hierarchy.descendants('x'), ['e'])
+        self.assertEqual(hierarchy.descendants('e'), [])
+        self.assertEqual(hierarchy.ancestors('unknown'), [])
+
+        self.assertTrue(hierarchy.is_subclass('e', 'a'))
+        self.assertTrue(hierarchy.is_subclass('a', 'a'))
+        self.assertFalse(hierarchy.is_subclass('a', 'e'))
+        self.assertFalse(hierarchy.is_subclass('b', 'c'))
+        self.assertFalse(hierarchy.is_subclass('b', 'unknown'))
+
+        # the cycle is cut, but both classes are still known
+        self.assertTrue(hierarchy.is_subclass('p', 'q') or hierarchy.is_subclass('q', 'p'))
+
+    def test_from_parents(self):
+        self.check(ClassHierarchy.from_parents(PARENTS))
+
+    def test_from_closure(self):
+        # the closure as stored in the snapshot gives the same hierarchy back
+        self.check(ClassHierarchy.from_closure(ClassHierarchy.from_parents(PARENTS).closure()))
+
+
+if __name__ == '__main__':
+    unittest.main()
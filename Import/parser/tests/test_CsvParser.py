@@ -0,0 +1,91 @@
+import csv
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+from CsvParser import ClassificationParser
+from Entities import Ontology
+from IdAllocator import IdAllocator
+from OntologyIndex import OntologyIndex
+from XmlWriter import ClassificationXmlWriter, write_fragment
+from benchmark.CsvGenerator import CLASSIFICATION_COLUMNS
+
+# "neutral" is already an individual of the base ontology
+BASE = '''<?xml version="1.0"?>
+<Ontology xmlns="http://www.w3.org/2002/07/owl#" xml:base="http://example.org/base">
+    <Declaration>
+        <NamedIndividual IRI="#neutral"/>
+    </Declaration>
+    <AnnotationAssertion>
+        <AnnotationProperty abbreviatedIRI="rdfs:label"/>
+        <IRI>#neutral</IRI>
+        <Literal>Neutral</Literal>
+    </AnnotationAssertion>
+</Ontology>'''
+
+# two classifications listing the same labels, written differently
+ROWS = [['1', 'Agreement', 'how much', 'Agree'],
+        ['1', 'Agreement', 'how much', 'Neutral'],
+        ['1', 'Agreement', 'how much', 'Disagree'],
+        ['2', 'Approval', 'how well', ' agree '],
+        ['2', 'Approval', 'how well', 'neutral']]
+
+NEUTRAL = 'http://example.org/base#neutral'
+
+
+class SharedInstancesTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+
+        base_file = os.path.join(folder.name, 'base.owl')
+        with open(base_file, 'w') as f:
+            f.write(BASE)
+        self.ontology = Ontology()
+        self.ontology.index = OntologyIndex.load(base_file, snapshot=False)
+        self.ontology.allocator = IdAllocator()
+
+        self.file = os.path.join(folder.name, 'classifications.csv')
+        with open(self.file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(CLASSIFICATION_COLUMNS)
+            writer.writerows(ROWS)
+
+    def write(self):
+        entities = ClassificationParser(id_columns=['ID'], ontology=self.ontology, shared=True).read(self.file)
+        [data, _] = write_fragment(ClassificationXmlWriter, entities, {})
+        return entities, list(ET.fromstring(b'<Ontology>' + data + b'</Ontology>'))
+
+    def test_one_individual_per_label(self):
+        [entities, axioms] = self.write()
+        agree = entities['1'].individuals[0]
+        self.assertIs(entities['2'].individuals[0], agree)
+
+        declared = Counter(axiom[0].get('IRI') for axiom in axioms
+                           if axiom.tag == 'Declaration' and axiom[0].tag == 'NamedIndividual')
+        # agree and disagree are declared once each, neutral not at all
+        self.assertEqual(declared, {agree.iri: 1, entities['1'].individuals[2].iri: 1})
+
+    def test_class_assertions(self):
+        [entities, axioms] = self.write()
+        assertions = Counter((axiom[0].get('IRI'), axiom[1].get('IRI')) for axiom in axioms
+                             if axiom.tag == 'ClassAssertion')
+        # one ClassAssertion per classification listing the individual
+        expected = Counter((entity.iri, individual.iri) for entity in entities.values()
+                           for individual in entity.individuals)
+        self.assertEqual(assertions, expected)
+        self.assertEqual(sum(assertions.values()), len(ROWS))
+
+    def test_base_individual(self):
+        [entities, axioms] = self.write()
+        # the individual of the base ontology is asserted into both classifications under its own IRI
+        for key in ['1', '2']:
+            self.assertEqual(entities[key].individuals[1].iri, NEUTRAL)
+        self.assertNotIn(NEUTRAL, [axiom[0].get('IRI') for axiom in axioms if axiom.tag == 'Declaration'])
+        self.assertNotIn(NEUTRAL, [axiom[1].text for axiom in axioms if axiom.tag == 'AnnotationAssertion'])
+
+
+if __name__ == '__main__':
+    unittest.main()
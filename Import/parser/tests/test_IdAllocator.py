@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+
+from Entities import Ontology
+from IdAllocator import IdAllocator, RESERVED
+from ImportManifest import ImportManifest
+
+BASE_IRI = 'http://www.semanticweb.org/bkorousicseljak/ontologies/2023/5/Comfocus_v1/COMFOCUS_'
+BASE = f'''<?xml version="1.0"?>
+<Ontology xmlns="http://www.w3.org/2002/07/owl#">
+    <Declaration>
+        <Class IRI="{BASE_IRI}00000000000000000549"/>
+    </Declaration>
+    <Declaration>
+        <Class IRI="{BASE_IRI}00000000000000000900"/>
+    </Declaration>
+    <Declaration>
+        <NamedIndividual IRI="#OWLNamedIndividual_950"/>
+    </Declaration>
+</Ontology>'''
+
+
+class IdAllocatorTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+
+    def write(self, name: str, content: str):
+        file = os.path.join(self.folder, name)
+        with open(file, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return file
+
+    def test_reserved(self):
+        # the ids of the core classes and properties are never leased, even without a base
+        self.assertEqual(IdAllocator().lease(3), range(RESERVED + 1, RESERVED + 4))
+        file = self.write('empty.owl', '<Ontology/>')
+        self.assertEqual(IdAllocator.load(file).lease(1).start, RESERVED + 1)
+
+    def test_base(self):
+        # class and instance ids share one counter
+        file = self.write('base.owl', BASE)
+        allocator = IdAllocator.load(file)
+        self.assertEqual(allocator.lease(2), range(951, 953))
+
+        # a saved high-water mark is used as long as the file did not change
+        allocator.save()
+        self.assertEqual(IdAllocator.load(file).lease(1).start, 953)
+
+        # and is never gone below once it did
+        self.write('base.owl', '<Ontology/>')
+        self.assertEqual(IdAllocator.load(file).lease(1).start, 953)
+
+    def test_manifest(self):
+        # ids of the IRIs in a manifest are not leased, even when the allocator does not know of them
+        manifest = ImportManifest(self.write('manifest.json', '{}'))
+        manifest.set('MatrixStatementParser', 'key', None, BASE_IRI + '00000000000000001200')
+        manifest.save()
+
+        base = Ontology()
+        base.allocator = IdAllocator()
+        base.manifest = ImportManifest.load(manifest.file)
+        self.assertEqual(base.lease(1).start, 1201)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import csv
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from Entities import Ontology, Entity, start_run
+from IdAllocator import IdAllocator
+from ImportManifest import ImportManifest, ChangedRowsError
+from OntologyIndex import OntologyIndex
+from Pipeline import import_files
+from benchmark.CsvGenerator import CsvGenerator
+
+BASE = '<?xml version="1.0"?>\n<Ontology xmlns="http://www.w3.org/2002/07/owl#"/>'
+OWL = '{http://www.w3.org/2002/07/owl#}'
+
+
+class ImportManifestTest(unittest.TestCase):
+    # the same CSVs imported again with the manifest of the first import
+
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.addCleanup(start_run, Entity.date)
+        self.folder = folder.name
+
+        self.base_file = os.path.join(self.folder, 'base.owl')
+        with open(self.base_file, 'w') as f:
+            f.write(BASE)
+        self.files = CsvGenerator(20).write(self.folder)
+        self.manifest_file = os.path.join(self.folder, 'manifest.json')
+        self.allocator = IdAllocator()
+
+    def import_files(self, merge: bool = False):
+        # returns the top-level axioms written and the IRIs of the statements by key; a merge
+        # goes into the base ontology
+        base = Ontology()
+        base.index = OntologyIndex.load(self.base_file, snapshot=False)
+        base.allocator = self.allocator
+        base.manifest = ImportManifest.load(self.manifest_file)
+        output = self.base_file if merge else os.path.join(self.folder, 'output.owl')
+        import_files(base, output, self.files['metadata'], self.files['components'], self.files['classifications'],
+                     self.files['items'], merge=merge)
+        base.manifest.save()
+
+        axioms = [element for element in ET.parse(output).getroot() if element.tag != OWL + 'Prefix']
+        statements = {key: iri for key, [_, iri] in base.manifest.entries['MatrixStatementParser'].items()}
+        return axioms, statements
+
+    @staticmethod
+    def declared(axioms):
+        return {axiom[0].get('IRI') for axiom in axioms if axiom.tag == OWL + 'Declaration'}
+
+    def test_unchanged(self):
+        [axioms, statements] = self.import_files()
+        self.assertTrue(axioms)
+        high_water_mark = self.allocator.high_water_mark
+
+        [axioms, again] = self.import_files()
+        self.assertEqual(axioms, [])
+        self.assertEqual(again, statements)
+        self.assertEqual(self.allocator.high_water_mark, high_water_mark)
+
+    def change_statement(self):
+        # a changed component id changes the hash of the first statement, not its key; returns the rows
+        with open(self.files['items'], encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f))
+        rows[1][3] = rows[1][3] + '0'
+        with open(self.files['items'], 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerows(rows)
+        return rows
+
+    def test_changed(self):
+        [_, statements] = self.import_files()
+
+        rows = self.change_statement()
+        key = '_'.join(rows[1][:3])
+        question = ['_'.join(row[:3]) for row in rows[1:] if row[0] == rows[1][0]]
+
+        [axioms, again] = self.import_files()
+        self.assertEqual(again, statements)
+        # only the changed statement is written again, with its IRI
+        self.assertEqual(self.declared(axioms), {statements[key]})
+        # and the DisjointClasses of its question, with all its statements
+        [disjoint] = [axiom for axiom in axioms if axiom.tag == OWL + 'DisjointClasses']
+        self.assertEqual([element.get('IRI') for element in disjoint], [statements[key_] for key_ in question])
+
+    def test_changed_merge(self):
+        # a changed row would be written next to its old axioms, so a merge refuses it and leaves
+        # the file as it was
+        with open(self.base_file, 'w') as f:
+            f.write(BASE.replace('/>', '>\n</Ontology>'))
+        self.import_files(merge=True)
+        with open(self.base_file, 'rb') as f:
+            merged = f.read()
+        self.import_files(merge=True)
+        with open(self.base_file, 'rb') as f:
+            self.assertEqual(f.read(), merged)
+
+        rows = self.change_statement()
+        with self.assertRaises(ChangedRowsError) as raised:
+            self.import_files(merge=True)
+        self.assertEqual(raised.exception.changed, [f"MatrixStatementParser {'_'.join(rows[1][:3])!r}"])
+        with open(self.base_file, 'rb') as f:
+            self.assertEqual(f.read(), merged)
+
+
+if __name__ == '__main__':
+    unittest.main()
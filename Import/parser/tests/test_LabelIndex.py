@@ -0,0 +1,61 @@
+import unittest
+
+from LabelIndex import LabelIndex, CHUNK, route
+from OntologyIndex import OntologyIndex
+
+WORDS = ['diet', 'food', 'trust', 'price']
+
+
+class LabelIndexTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # enough labels per word for the frequent word sets and several chunks
+        index = OntologyIndex()
+        for number in range(4 * CHUNK):
+            label = f'{WORDS[number % 4]} {WORDS[number // 4 % 4]} {number}'
+            index.labels.setdefault(label, []).append(f'#c{number}')
+            index.types[f'#c{number}'] = 'Class'
+        cls.index = LabelIndex(index)
+
+    def labels(self, query: str, limit: int):
+        return [result['label'] for result in self.index.complete(query, limit)]
+
+    def test_prefix_first(self):
+        # labels starting with the query come first, then those containing its words, in label order
+        self.assertEqual(self.labels('food diet 1', 3), ['food diet 1', 'food diet 1009', 'food diet 113'])
+        self.assertEqual(self.labels('diet food 3', 3), ['diet food 308', 'diet food 324', 'diet food 340'])
+        self.assertEqual(self.labels('food 1', 4), ['diet food 100', 'diet food 1012', 'diet food 116',
+                                                    'diet food 132'])
+
+    def test_words(self):
+        # all the words, the last one as the beginning of a word, anywhere in the label
+        labels = self.labels('trust 9', 4 * CHUNK)
+        self.assertTrue(labels)
+        self.assertEqual(labels, sorted(label for label in self.index.labels
+                                        if 'trust' in label.split() and label.split()[2].startswith('9')))
+
+    def test_limit(self):
+        # a limited completion is the beginning of the complete one
+        for query in ('diet', 'diet 9', 'trust food 1', 'price 10', 'food diet trust 5', 'pr', 'diet 99999'):
+            everything = self.labels(query, 4 * CHUNK)
+            with self.subTest(query=query):
+                for limit in (1, 3, 10):
+                    self.assertEqual(self.labels(query, limit), everything[:limit])
+
+    def test_matching_is_lazy(self):
+        # the matches come in label order and only as they are taken
+        matches = self.index.matching(['diet'], '1')
+        first = [next(matches) for _ in range(3)]
+        self.assertEqual(first, sorted(first))
+        self.assertEqual([self.index.labels[position] for position in first],
+                         ['diet diet 1008', 'diet diet 112', 'diet diet 128'])
+
+    def test_route(self):
+        [status, body] = route(self.index, 'GET', '/complete?q=diet%209&limit=2')
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body['results']), 2)
+        self.assertEqual(route(self.index, 'GET', '/exact?q=FOOD%20DIET%201')[1]['results'][0]['iri'], '#c1')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import json
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from collections import Counter
+
+from Entities import Ontology, Entity, start_run
+from IdAllocator import IdAllocator
+from OntologyIndex import OntologyIndex
+from Pipeline import import_files, writer_jobs
+from benchmark.CsvGenerator import CsvGenerator
+
+BASE = '<?xml version="1.0"?>\n<Ontology xmlns="http://www.w3.org/2002/07/owl#"/>'
+DATE = '2024-01-01T00:00:00Z'
+ROWS = 20
+
+READ_STAGES = ['read metadata', 'read classifications', 'read questions', 'read statements']
+STREAM_STAGES = ['stream measures', 'stream qualities', 'stream components', 'stream classifications',
+                 'stream single choice questions', 'stream open questions', 'stream matrix questions',
+                 'stream statements', 'write disjoint statements', 'write ontology']
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.addCleanup(start_run, Entity.date)
+        self.folder = folder.name
+
+        self.base_file = os.path.join(self.folder, 'base.owl')
+        with open(self.base_file, 'w') as f:
+            f.write(BASE)
+        self.files = CsvGenerator(ROWS).write(self.folder)
+
+    def import_files(self, **options):
+        # returns the saved report and the top-level elements of the output by tag
+        start_run(DATE)
+        base = Ontology()
+        base.index = OntologyIndex.load(self.base_file, snapshot=False)
+        base.allocator = IdAllocator()
+        output = os.path.join(self.folder, 'output.owl')
+        metrics_file = os.path.join(self.folder, 'metrics.json')
+        import_files(base, output, self.files['metadata'], self.files['components'], self.files['classifications'],
+                     self.files['items'], metrics_file=metrics_file, **options)
+
+        with open(metrics_file, encoding='utf-8') as f:
+            report = json.load(f)
+        return report, Counter(element.tag.rpartition('}')[2] for element in ET.parse(output).getroot())
+
+    def test_report(self):
+        stages = {'run': READ_STAGES + ['resolve references'] + ['write ' + job[0] for job in writer_jobs()] +
+                         ['write ontology'],
+                  'stream': STREAM_STAGES}
+        for mode, names in stages.items():
+            with self.subTest(mode=mode):
+                [report, axioms] = self.import_files(stream=mode == 'stream')
+                self.assertEqual(report['date'], Entity.date)
+                self.assertEqual(report['date'], DATE)
+
+                self.assertEqual([stage['name'] for stage in report['stages']], names)
+                for stage in report['stages']:
+                    self.assertIsInstance(stage['seconds'], float)
+                    self.assertGreaterEqual(stage['seconds'], 0)
+                    for count in ('rows', 'bytes'):
+                        self.assertIsInstance(stage[count], int)
+                    self.assertIsInstance(stage['axioms'], dict)
+                self.assertAlmostEqual(report['seconds'], sum(stage['seconds'] for stage in report['stages']),
+                                       places=5)
+
+                # the totals are the sums of the stages, and every parser adds its entities
+                self.assertEqual(report['rows'], sum(stage['rows'] for stage in report['stages']))
+                self.assertGreater(report['rows'], 0)
+                parsers = Counter()
+                for stage in report['stages']:
+                    for parser, counts in stage['parsers'].items():
+                        parsers[parser] += counts['entities']
+                self.assertEqual(len(parsers), 8)
+                self.assertTrue(all(parsers.values()))
+
+                # the axioms by kind (and the prefixes) are those in the output
+                self.assertEqual(report['axioms'], dict(axioms))
+                self.assertEqual(Counter(report['axioms']),
+                                 sum((Counter(stage['axioms']) for stage in report['stages']), Counter()))
+                self.assertLessEqual(report['bytes'], os.path.getsize(os.path.join(self.folder, 'output.owl')))
+
+
+if __name__ == '__main__':
+    unittest.main()
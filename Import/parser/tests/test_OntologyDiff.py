@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+from OntologyDiff import OntologyDiff
+
+OLD = '''<?xml version="1.0"?>
+<Ontology xmlns="http://www.w3.org/2002/07/owl#" xml:base="http://example.org/">
+    <Prefix name="rdfs" IRI="http://www.w3.org/2000/01/rdf-schema#"/>
+    <Declaration>
+        <Class IRI="#a"/>
+    </Declaration>
+    <Declaration>
+        <Class IRI="#b"/>
+    </Declaration>
+    <SubClassOf>
+        <Class IRI="#b"/>
+        <Class IRI="#a"/>
+    </SubClassOf>
+    <DisjointClasses>
+        <Class IRI="#a"/>
+        <Class IRI="#b"/>
+    </DisjointClasses>
+    <AnnotationAssertion>
+        <AnnotationProperty abbreviatedIRI="rdfs:label"/>
+        <IRI>#b</IRI>
+        <Literal>b</Literal>
+    </AnnotationAssertion>
+</Ontology>'''
+
+# the same ontology written another way (prefixes, operand order, full and abbreviated IRIs),
+# with the SubClassOf removed, the label of b changed and c added
+NEW = '''<?xml version="1.0"?>
+<Ontology xmlns="http://www.w3.org/2002/07/owl#" xml:base="http://example.org/">
+    <Prefix name="ex" IRI="http://example.org/#"/>
+    <Declaration>
+        <Class abbreviatedIRI="ex:a"/>
+    </Declaration>
+    <Declaration>
+        <Class IRI="http://example.org/#b"/>
+    </Declaration>
+    <Declaration>
+        <Class IRI="#c"/>
+    </Declaration>
+    <DisjointClasses>
+        <Class IRI="#b"/>
+        <Class IRI="#a"/>
+    </DisjointClasses>
+    <AnnotationAssertion>
+        <AnnotationProperty IRI="http://www.w3.org/2000/01/rdf-schema#label"/>
+        <IRI>#b</IRI>
+        <Literal>B</Literal>
+    </AnnotationAssertion>
+</Ontology>'''
+
+
+class OntologyDiffTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.files = []
+        for name, content in (('old.owl', OLD), ('new.owl', NEW)):
+            self.files.append(os.path.join(folder.name, name))
+            with open(self.files[-1], 'w') as f:
+                f.write(content)
+
+    def test_same(self):
+        self.assertEqual(OntologyDiff(self.files[0], self.files[0]).diff(), dict())
+
+    def test_diff(self):
+        # changes are grouped by the entity the axioms are about, in the order of their files
+        changes = OntologyDiff(*self.files).diff()
+        self.assertEqual(list(changes), ['http://example.org/#b', 'http://example.org/#c'])
+        self.assertEqual(changes['http://example.org/#b'], {
+            'added': ['AnnotationAssertion(AnnotationProperty(<http://www.w3.org/2000/01/rdf-schema#label>) '
+                      '<http://example.org/#b> Literal("B"))'],
+            'removed': ['SubClassOf(Class(<http://example.org/#b>) Class(<http://example.org/#a>))',
+                        'AnnotationAssertion(AnnotationProperty(<http://www.w3.org/2000/01/rdf-schema#label>) '
+                        '<http://example.org/#b> Literal("b"))']})
+        self.assertEqual(changes['http://example.org/#c'],
+                         {'added': ['Declaration(Class(<http://example.org/#c>))'], 'removed': []})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from OntologyStream import OntologyMerge
+
+OWL = '{http://www.w3.org/2002/07/owl#}'
+ONTOLOGY = b'''<?xml version="1.0"?>
+<Ontology xmlns="http://www.w3.org/2002/07/owl#">
+    <Declaration>
+        <Class IRI="#a"/>
+    </Declaration>
+</Ontology>
+'''
+
+
+class OntologyMergeTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.file = os.path.join(folder.name, 'ontology.owl')
+
+    def write(self, data: bytes):
+        with open(self.file, 'wb') as f:
+            f.write(data)
+
+    def read(self):
+        with open(self.file, 'rb') as f:
+            return f.read()
+
+    def merge(self, label: str):
+        # a merge that wrote one axiom, declaring label, to the file
+        merge = OntologyMerge(ET.Element('Ontology'), self.file)
+        declaration = ET.SubElement(merge.getroot(), 'Declaration')
+        ET.SubElement(declaration, 'Class', {'IRI': '#' + label})
+        merge.flush()
+        merge.file.flush()
+        return merge
+
+    def declared(self):
+        return [element[0].get('IRI') for element in ET.parse(self.file).getroot()
+                if element.tag == OWL + 'Declaration']
+
+    def test_close(self):
+        self.write(ONTOLOGY)
+        self.merge('b').close()
+        self.assertEqual(self.declared(), ['#a', '#b'])
+        self.assertFalse(os.path.exists(self.file + OntologyMerge.extension))
+
+    def test_rollback(self):
+        self.write(ONTOLOGY)
+        merge = self.merge('b')
+        self.assertNotEqual(self.read(), ONTOLOGY)
+        merge.rollback()
+        self.assertEqual(self.read(), ONTOLOGY)
+        self.assertFalse(os.path.exists(self.file + OntologyMerge.extension))
+
+    def test_failed_merge(self):
+        # a run that stopped without rolling back leaves its journal, the next merge restores the file first
+        self.write(ONTOLOGY)
+        self.merge('b').file.close()
+        self.assertTrue(os.path.exists(self.file + OntologyMerge.extension))
+
+        self.merge('c').close()
+        self.assertEqual(self.declared(), ['#a', '#c'])
+
+    def test_trailing_content(self):
+        self.write(ONTOLOGY + b'<!-- Generated by the OWL API -->\n')
+        self.merge('b').close()
+        self.assertEqual(self.declared(), ['#a', '#b'])
+        self.assertTrue(self.read().endswith(b'</Ontology>\n<!-- Generated by the OWL API -->\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import os
+import tempfile
+import unittest
+
+from OntologySnapshot import OntologySnapshot
+
+TABLES = {'base': [('base', 'http://example.org/')],
+          'closure': [(f'#c{index}', f'#c{index // 2}') for index in range(1, 40)]}
+
+
+class OntologySnapshotTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.file = os.path.join(folder.name, 'ontology.owl')
+        with open(self.file, 'w') as f:
+            f.write('<Ontology/>')
+
+    def test_round_trip(self):
+        OntologySnapshot.write(self.file, TABLES)
+        self.assertEqual(OntologySnapshot.read(self.file), TABLES)
+        # no temporary file is left next to it
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.file))), ['ontology.owl', 'ontology.owl.snapshot'])
+
+    def test_truncated(self):
+        # a snapshot cut short anywhere is stale, it never gives back part of the tables
+        OntologySnapshot.write(self.file, TABLES)
+        with open(OntologySnapshot.path(self.file), 'rb') as f:
+            data = f.read()
+        for size in (len(data) // 2, len(data) - 8, len(data) - 1):
+            with self.subTest(size=size):
+                with open(OntologySnapshot.path(self.file), 'wb') as f:
+                    f.write(data[:size])
+                self.assertIsNone(OntologySnapshot.read(self.file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+import xml.etree.ElementTree as ET
+
+from OntologyStream import escape_text, escape_attribute
+from XmlWriter import DECLARE_CLASS, SUBCLASS, LABEL, DEFINITION, HAS_QUESTION, EXACTLY_ONE
+
+# everything ElementTree escapes in text or attributes, and text it writes as character references
+VALUE = 'a & b < c > d "e" \'f\'\r\ng\th, é ü 中 \U0001F600'
+
+
+class EscapeTest(unittest.TestCase):
+    # templates are filled in without ElementTree, so their output is pinned to ET.tostring()
+
+    def test_escape(self):
+        element = ET.Element('e', {'a': VALUE})
+        element.text = VALUE
+        self.assertEqual(ET.tostring(element, encoding='unicode'),
+                         f'<e a="{escape_attribute(VALUE)}">{escape_text(VALUE)}</e>')
+
+    def test_templates(self):
+        for template, values in ((DECLARE_CLASS, (VALUE,)),
+                                 (SUBCLASS, (VALUE, 'http://example.org/' + VALUE)),
+                                 (LABEL, (VALUE, VALUE)),
+                                 (DEFINITION, ('http://example.org/x', VALUE)),
+                                 (HAS_QUESTION, (VALUE, VALUE + VALUE)),
+                                 (EXACTLY_ONE, (VALUE, 'http://example.org/p', VALUE))):
+            with self.subTest(template=template.tag):
+                self.assertEqual(template.render(values), template.render_element(values))
+
+
+if __name__ == '__main__':
+    unittest.main()
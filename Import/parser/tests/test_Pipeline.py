@@ -0,0 +1,121 @@
+import csv
+import os
+import tempfile
+import unittest
+
+from Entities import Ontology, Entity, start_run
+from IdAllocator import IdAllocator
+from OntologyIndex import OntologyIndex
+from Pipeline import import_files, run, run_streaming
+from ReferenceResolver import UnresolvedReferenceError
+from benchmark.CsvGenerator import CsvGenerator
+
+BASE = '<?xml version="1.0"?>\n<Ontology xmlns="http://www.w3.org/2002/07/owl#"/>'
+DATE = '2024-01-01T00:00:00Z'
+# what the baseline writer (one ElementTree, indented once and written at the end) writes for
+# CsvGenerator(ROWS) against BASE on DATE; every way of writing the import has to match it
+EXPECTED = os.path.join(os.path.dirname(__file__), 'data', 'import.owl')
+ROWS = 20
+
+
+class ImportFilesTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.addCleanup(start_run, Entity.date)
+        self.folder = folder.name
+
+        self.base_file = os.path.join(self.folder, 'base.owl')
+        with open(self.base_file, 'w') as f:
+            f.write(BASE)
+        self.files = CsvGenerator(ROWS).write(self.folder)
+
+    def import_files(self, **options):
+        start_run(DATE)
+        base = Ontology()
+        base.index = OntologyIndex.load(self.base_file, snapshot=False)
+        base.allocator = IdAllocator()
+        output = os.path.join(self.folder, 'output.owl')
+        import_files(base, output, self.files['metadata'], self.files['components'], self.files['classifications'],
+                     self.files['items'], **options)
+        with open(output, 'rb') as f:
+            return f.read()
+
+    def test_output(self):
+        with open(EXPECTED, 'rb') as f:
+            expected = f.read()
+        for options in ({}, {'stream': True}, {'workers': 2}, {'stream': True, 'workers': 2},
+                        {'metrics_file': os.path.join(self.folder, 'metrics.json')}):
+            with self.subTest(**options):
+                self.assertEqual(self.import_files(**options), expected)
+
+
+class Writers:
+    # stands in for XmlWriterPool and keeps the labels of the entities each writer got (the disjoint
+    # statements are lists of IRIs)
+    def __init__(self):
+        self.written = []
+
+    def write(self, writer_class, entities: dict, references: dict):
+        self.written.append((writer_class.__name__,
+                             {entity.label for entity in entities.values() if not isinstance(entity, list)}))
+
+    def drain(self):
+        pass
+
+
+class ReferencesTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.addCleanup(start_run, Entity.date)
+        start_run(DATE)
+
+        base_file = os.path.join(folder.name, 'base.owl')
+        with open(base_file, 'w') as f:
+            f.write(BASE)
+        self.base = Ontology()
+        self.base.index = OntologyIndex.load(base_file, snapshot=False)
+        self.base.allocator = IdAllocator()
+        self.files = CsvGenerator(ROWS).write(folder.name)
+
+        # one single choice question links to a missing classification, another to a missing component
+        with open(self.files['components'], encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+        [first, second] = [row for row in rows if row[3] == 'Single choice'][:2]
+        first[2] = 'missing classification'
+        second[4] = 'missing component'
+        self.missing = {first[0].lower(), second[0].lower()}
+        with open(self.files['components'], 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerows(rows)
+
+    def run_(self, run_):
+        writers = Writers()
+        with self.assertRaises(UnresolvedReferenceError) as raised:
+            run_(self.base, writers, self.files['metadata'], self.files['components'], self.files['classifications'],
+                 self.files['items'])
+        return writers.written, raised.exception.unresolved
+
+    def test_run(self):
+        [written, unresolved] = self.run_(run)
+        # every missing reference is reported, before anything is written
+        self.assertEqual(written, [])
+        self.assertEqual(len(unresolved), 2)
+        self.assertIn("linked_classification 'missing classification' is not one of the classifications",
+                      '\n'.join(unresolved))
+        self.assertIn("harmonised_component 'missing component' is not one of the components", '\n'.join(unresolved))
+        for label in self.missing:
+            self.assertIn(repr(label), '\n'.join(unresolved))
+
+    def test_run_streaming(self):
+        [written, unresolved] = self.run_(run_streaming)
+        self.assertEqual(len(unresolved), 2)
+        # the rest is written, down to the last step, without the questions that have a missing reference
+        self.assertEqual(written[-1][0], 'DisjointStatementsXmlWriter')
+        questions = set().union(*[labels for name, labels in written if name == 'QuestionXmlWriter'])
+        self.assertTrue(questions)
+        self.assertFalse(questions & self.missing)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import tempfile
+import unittest
+
+from Entities import Ontology
+from RdfStream import convert
+
+NAMESPACE = Ontology.PREFIXES['base']
+BASE = NAMESPACE.rstrip('#')
+
+OWL_FILE = f'''<?xml version="1.0"?>
+<Ontology xmlns="http://www.w3.org/2002/07/owl#" xml:base="{BASE}" ontologyIRI="{BASE}">
+    <Prefix name="rdfs" IRI="http://www.w3.org/2000/01/rdf-schema#"/>
+    <Declaration>
+        <Class IRI="#Meal"/>
+    </Declaration>
+    <Declaration>
+        <ObjectProperty IRI="#hasPart"/>
+    </Declaration>
+    <SubClassOf>
+        <Class IRI="#Meal"/>
+        <ObjectSomeValuesFrom>
+            <ObjectProperty IRI="#hasPart"/>
+            <Class IRI="#Food"/>
+        </ObjectSomeValuesFrom>
+    </SubClassOf>
+    <SubClassOf>
+        <Class IRI="#Meal"/>
+        <ObjectAllValuesFrom>
+            <ObjectProperty IRI="#hasPart"/>
+            <Class IRI="#Food"/>
+        </ObjectAllValuesFrom>
+    </SubClassOf>
+    <SubClassOf>
+        <Class IRI="#Meal"/>
+        <ObjectExactCardinality cardinality="2">
+            <ObjectProperty IRI="#hasPart"/>
+            <Class IRI="#Food"/>
+        </ObjectExactCardinality>
+    </SubClassOf>
+    <ClassAssertion>
+        <Class IRI="#Meal"/>
+        <NamedIndividual IRI="#lunch"/>
+    </ClassAssertion>
+    <AnnotationAssertion>
+        <AnnotationProperty abbreviatedIRI="rdfs:label"/>
+        <IRI>#lunch</IRI>
+        <Literal xml:lang="en">Lunch "light"</Literal>
+    </AnnotationAssertion>
+    <AnnotationAssertion>
+        <AnnotationProperty abbreviatedIRI="rdfs:comment"/>
+        <IRI>#lunch</IRI>
+        <Literal datatypeIRI="http://www.w3.org/2001/XMLSchema#integer">3</Literal>
+    </AnnotationAssertion>
+    <AnnotationAssertion>
+        <AnnotationProperty abbreviatedIRI="rdfs:comment"/>
+        <IRI>http://example.org/other/thing</IRI>
+        <Literal datatypeIRI="http://www.w3.org/2001/XMLSchema#string">plain</Literal>
+    </AnnotationAssertion>
+    <HasKey>
+        <Class IRI="#Meal"/>
+        <ObjectProperty IRI="#hasPart"/>
+    </HasKey>
+</Ontology>'''
+
+RDF = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+RDFS = 'http://www.w3.org/2000/01/rdf-schema#'
+OWL = 'http://www.w3.org/2002/07/owl#'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+
+MEAL = f'<{NAMESPACE}Meal>'
+FOOD = f'<{NAMESPACE}Food>'
+HAS_PART = f'<{NAMESPACE}hasPart>'
+LUNCH = f'<{NAMESPACE}lunch>'
+TYPE = f'<{RDF}type>'
+SUB_CLASS_OF = f'<{RDFS}subClassOf>'
+
+# the OWL 2 mapping of OWL_FILE; blank nodes are numbered in the order the restrictions are read
+TRIPLES = [
+    (f'<{BASE}>', TYPE, f'<{OWL}Ontology>'),
+    (MEAL, TYPE, f'<{OWL}Class>'),
+    (HAS_PART, TYPE, f'<{OWL}ObjectProperty>'),
+    ('_:b1', TYPE, f'<{OWL}Restriction>'),
+    ('_:b1', f'<{OWL}onProperty>', HAS_PART),
+    ('_:b1', f'<{OWL}someValuesFrom>', FOOD),
+    (MEAL, SUB_CLASS_OF, '_:b1'),
+    ('_:b2', TYPE, f'<{OWL}Restriction>'),
+    ('_:b2', f'<{OWL}onProperty>', HAS_PART),
+    ('_:b2', f'<{OWL}allValuesFrom>', FOOD),
+    (MEAL, SUB_CLASS_OF, '_:b2'),
+    ('_:b3', TYPE, f'<{OWL}Restriction>'),
+    ('_:b3', f'<{OWL}onProperty>', HAS_PART),
+    ('_:b3', f'<{OWL}qualifiedCardinality>', f'"2"^^<{XSD}nonNegativeInteger>'),
+    ('_:b3', f'<{OWL}onClass>', FOOD),
+    (MEAL, SUB_CLASS_OF, '_:b3'),
+    (LUNCH, TYPE, MEAL),
+    (LUNCH, f'<{RDFS}label>', '"Lunch \\"light\\""@en'),
+    (LUNCH, f'<{RDFS}comment>', f'"3"^^<{XSD}integer>'),
+    ('<http://example.org/other/thing>', f'<{RDFS}comment>', '"plain"')]
+
+# the same triples in Turtle, after the @prefix lines
+TURTLE = f'''<{BASE}> a owl:Ontology .
+:Meal a owl:Class .
+:hasPart a owl:ObjectProperty .
+_:b1 a owl:Restriction ;
+    owl:onProperty :hasPart ;
+    owl:someValuesFrom :Food .
+:Meal rdfs:subClassOf _:b1 .
+_:b2 a owl:Restriction ;
+    owl:onProperty :hasPart ;
+    owl:allValuesFrom :Food .
+:Meal rdfs:subClassOf _:b2 .
+_:b3 a owl:Restriction ;
+    owl:onProperty :hasPart ;
+    owl:qualifiedCardinality "2"^^xsd:nonNegativeInteger ;
+    owl:onClass :Food .
+:Meal rdfs:subClassOf _:b3 .
+:lunch a :Meal ;
+    rdfs:label "Lunch \\"light\\""@en ;
+    rdfs:comment "3"^^xsd:integer .
+<http://example.org/other/thing> rdfs:comment "plain" .
+'''
+
+
+class RdfStreamTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        self.owl_file = os.path.join(self.folder, 'ontology.owl')
+        with open(self.owl_file, 'w', encoding='utf-8') as f:
+            f.write(OWL_FILE)
+
+    def convert(self, name: str):
+        file = os.path.join(self.folder, name)
+        mapper = convert(self.owl_file, file)
+        with open(file, encoding='utf-8') as f:
+            return mapper, f.read()
+
+    def test_n_triples(self):
+        [mapper, text] = self.convert('ontology.nt')
+        self.assertEqual(text, ''.join(f'{s} {p} {o} .\n' for s, p, o in TRIPLES))
+        self.assertEqual(mapper.count, len(TRIPLES))
+        # HasKey has no mapping here and is left out
+        self.assertEqual(mapper.skipped, {'HasKey': 1})
+
+    def test_turtle(self):
+        [mapper, text] = self.convert('ontology.ttl')
+        [prefixes, body] = text.split('\n\n', 1)
+        self.assertEqual(body, TURTLE)
+        self.assertEqual(mapper.count, len(TRIPLES))
+        # every prefix used in the body is declared, the base namespace as the empty prefix
+        for line in [f'@prefix : <{NAMESPACE}> .', f'@prefix owl: <{OWL}> .', f'@prefix rdfs: <{RDFS}> .',
+                     f'@prefix xsd: <{XSD}> .']:
+            self.assertIn(line, prefixes.splitlines())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+from OntologyDiff import OntologyDiff, IGNORED
+from OwlReader import OwlReader
+from VersionStore import VersionStore, CODECS
+
+HEADER = '''<?xml version="1.0"?>
+<Ontology xmlns="http://www.w3.org/2002/07/owl#" xml:base="http://example.org/" ontologyIRI="http://example.org/">
+    <Prefix name="rdfs" IRI="http://www.w3.org/2000/01/rdf-schema#"/>'''
+CLASS = '''
+    <Declaration>
+        <Class IRI="#c{0}"/>
+    </Declaration>
+    <AnnotationAssertion>
+        <AnnotationProperty abbreviatedIRI="rdfs:label"/>
+        <IRI>#c{0}</IRI>
+        <Literal xml:lang="en">class &amp; {1}</Literal>
+    </AnnotationAssertion>'''
+
+
+def classes(numbers, label: str = ''):
+    return ''.join(CLASS.format(number, label + str(number)) for number in numbers)
+
+
+class VersionStoreTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        self.folder = folder.name
+        # the second version drops 10 classes, relabels 5 and adds 20
+        self.files = []
+        for name, content in (('v1.owl', classes(range(100))),
+                              ('v2.owl', classes(range(10, 95)) + classes(range(95, 100), 'new ')
+                               + classes(range(100, 120)))):
+            self.files.append(os.path.join(self.folder, name))
+            with open(self.files[-1], 'w', encoding='utf-8') as f:
+                f.write(HEADER + content + '\n</Ontology>')
+
+    def store(self, codec: str):
+        # small blocks, so the versions span several of them
+        store = VersionStore.open(os.path.join(self.folder, codec), codec)
+        with mock.patch('VersionStore.BLOCK_SIZE', 1024):
+            for file in self.files:
+                self.assertTrue(store.add(file))
+            self.assertFalse(store.add(self.files[0]))
+        return store
+
+    def test_round_trip(self):
+        written = dict()
+        for codec in CODECS:
+            store = self.store(codec)
+            self.assertGreater(len(store.offsets), 2)
+            reopened = VersionStore.open(store.folder)
+            self.assertEqual(reopened.codec, codec)
+
+            # every axiom comes back as the bytes it was stored as
+            reader = OwlReader(self.files[1])
+            stored = [ET.tostring(VersionStore.normalize(reader, element), encoding='utf-8')
+                      for element in reader.axioms() if element.tag not in IGNORED]
+            self.assertEqual([reopened.axiom(number) for number in reopened.refs['v2.owl']], stored)
+
+            for name, file in zip(('v1.owl', 'v2.owl'), self.files):
+                with self.subTest(codec=codec, version=name):
+                    data = b''.join(store.stream(name))
+                    # the stored version reads back exactly, from a reopened store as well
+                    self.assertEqual(b''.join(reopened.stream(name)), data)
+                    written.setdefault(name, data)
+                    self.assertEqual(data, written[name])
+
+                    # and has the same axioms as its file
+                    extracted = os.path.join(self.folder, f'{codec}-{name}')
+                    reopened.write(name, extracted)
+                    self.assertEqual(OntologyDiff(file, extracted).diff(), dict())
+
+    def test_diff(self):
+        # the diff of two stored versions is the one of their files
+        store = self.store('zlib')
+        [removed, added] = store.diff('v1.owl', 'v2.owl')
+        changes = OntologyDiff(*self.files).diff().values()
+        self.assertEqual(len(removed), sum(len(change['removed']) for change in changes))
+        self.assertEqual(len(added), sum(len(change['added']) for change in changes))
+        self.assertEqual((len(removed), len(added)), (10 * 2 + 5, 5 + 20 * 2))
+        self.assertEqual(store.containing(added[0]), ['v2.owl'])
+
+
+if __name__ == '__main__':
+    unittest.main()
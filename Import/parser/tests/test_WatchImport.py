@@ -0,0 +1,89 @@
+import csv
+import os
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+
+from BatchImport import WarmBase
+from Entities import Entity, HarmonisedMeasure, start_run
+from IdAllocator import IdAllocator
+from WatchImport import ImportWatcher
+from benchmark.CsvGenerator import CsvGenerator
+
+OWL = '{http://www.w3.org/2002/07/owl#}'
+# a base ontology with the measure {label} of the CSVs
+BASE = '''<?xml version="1.0"?>
+<Ontology xmlns="http://www.w3.org/2002/07/owl#">
+    <Declaration>
+        <Class IRI="#existing"/>
+    </Declaration>
+    <SubClassOf>
+        <Class IRI="#existing"/>
+        <Class IRI="{parent}"/>
+    </SubClassOf>
+    <AnnotationAssertion>
+        <AnnotationProperty abbreviatedIRI="rdfs:label"/>
+        <IRI>#existing</IRI>
+        <Literal>{label}</Literal>
+    </AnnotationAssertion>
+</Ontology>'''
+
+
+class ImportWatcherTest(unittest.TestCase):
+    def setUp(self):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        # the watcher sets the date of the process, which the other tests share
+        self.addCleanup(start_run, Entity.date)
+
+        job = CsvGenerator(40).write(folder.name)
+        with open(job['metadata'], encoding='utf-8') as f:
+            self.measure = list(csv.DictReader(f))[0]['Harmonised measure']
+        base_file = os.path.join(folder.name, 'base.owl')
+        with open(base_file, 'w') as f:
+            f.write(BASE.format(parent=HarmonisedMeasure(None, '').parent_iri, label=self.measure))
+        job.update(output=os.path.join(folder.name, 'output.owl'), manifest=None, deduplicate=False,
+                   share_instances=False)
+        self.output = job['output']
+        self.watcher = ImportWatcher(WarmBase(base_file, IdAllocator.load(base_file)), job)
+
+    def read(self):
+        with open(self.output, encoding='utf-8') as f:
+            return f.read()
+
+    def declared(self):
+        return [axiom[0].get('IRI') for axiom in ET.parse(self.output).getroot() if axiom.tag == OWL + 'Declaration']
+
+    def test_base_entities(self):
+        # the measure already in the base is never declared again, however often the CSVs change
+        self.watcher.regenerate(self.watcher.poll())
+        declared = self.declared()
+        self.assertTrue(declared)
+        for _ in range(2):
+            self.watcher.regenerate(['metadata'])
+            self.assertEqual(self.declared(), declared)
+        existing = self.watcher.base.index.find(self.measure, HarmonisedMeasure(None, '').parent_iri)
+        self.assertIsNotNone(existing)
+        self.assertNotIn(existing, declared)
+
+    def test_date_per_regeneration(self):
+        self.watcher.regenerate(self.watcher.poll(), '2026-01-01T00:00:00Z')
+        self.assertIn('2026-01-01T00:00:00Z', self.read())
+
+        # the jobs run again are written with the date of the second regeneration
+        rerun = self.watcher.regenerate(['metadata'], '2026-01-02T00:00:00Z')
+        self.assertIn('measures', rerun)
+        output = self.read()
+        self.assertIn('2026-01-02T00:00:00Z', output)
+        self.assertEqual(Entity.date, '2026-01-02T00:00:00Z')
+
+    def test_date_without_date(self):
+        # without a date every regeneration takes the time it starts at
+        start_run('2000-01-01T00:00:00Z')
+        self.watcher.regenerate(self.watcher.poll())
+        self.assertNotEqual(Entity.date, '2000-01-01T00:00:00Z')
+        self.assertNotIn('2000-01-01T00:00:00Z', self.read())
+
+
+if __name__ == '__main__':
+    unittest.main()